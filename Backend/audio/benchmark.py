@@ -0,0 +1,200 @@
+"""
+Benchmarks for the audio pipeline on synthetic meeting audio.
+
+Usage: python audio/benchmark.py [minutes] [downmix hours]
+"""
+import os
+import sys
+import time
+import wave
+import resource
+import tempfile
+import multiprocessing
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio.synthetic import synthetic_meeting_audio
+from audio.vad import detect_speech, trim_silence
+from audio.flac import FlacStreamWriter, encode_flac, FLAC_AVAILABLE
+from audio.sources import SyntheticSource
+from audio.downmix import downmix_to_mono
+from record_meet import RecordingSession
+
+
+def write_wav(path, audio, sample_rate):
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1 if audio.ndim == 1 else audio.shape[1])
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(np.int16(np.clip(audio, -1, 1) * 32767).tobytes())
+
+
+def bench_vad(audio, sample_rate, workdir):
+    duration = len(audio) / sample_rate
+
+    start = time.perf_counter()
+    segments = detect_speech(audio, sample_rate)
+    detect_time = time.perf_counter() - start
+
+    source = os.path.join(workdir, "meeting.wav")
+    write_wav(source, audio, sample_rate)
+    start = time.perf_counter()
+    trimmed, segment_map = trim_silence(source)
+    trim_time = time.perf_counter() - start
+
+    kept = sum(int(e - s) for s, e in segments) / sample_rate
+    print("VAD silence trimming")
+    print(f"  segments kept:      {len(segment_map)}")
+    print(f"  audio kept:         {kept:.1f} s of {duration:.1f} s ({100 * kept / duration:.1f}%)")
+    print(f"  file size:          {os.path.getsize(source) / 1e6:.1f} MB -> {os.path.getsize(trimmed) / 1e6:.1f} MB")
+    print(f"  detect speed:       {duration / detect_time:.0f}x realtime")
+    print(f"  trim (read+write):  {duration / trim_time:.0f}x realtime")
+
+
+def bench_flac(audio, sample_rate, workdir):
+    print("FLAC encoding")
+    if not FLAC_AVAILABLE:
+        print("  skipped: ffmpeg not found (set FFMPEG_BINARY)")
+        return
+
+    duration = len(audio) / sample_rate
+    source = os.path.join(workdir, "flac_source.wav")
+    write_wav(source, audio, sample_rate)
+
+    start = time.perf_counter()
+    encoded = encode_flac(source)
+    file_time = time.perf_counter() - start
+
+    streamed = os.path.join(workdir, "streamed.flac")
+    block = 1024
+    start = time.perf_counter()
+    with FlacStreamWriter(streamed, sample_rate, 1) as writer:
+        for i in range(0, len(audio), block):
+            writer.write(audio[i:i + block, None])
+    stream_time = time.perf_counter() - start
+
+    wav_size = os.path.getsize(source)
+    flac_size = os.path.getsize(encoded)
+    print(f"  size:               {wav_size / 1e6:.1f} MB WAV -> {flac_size / 1e6:.1f} MB FLAC")
+    print(f"  compression ratio:  {wav_size / flac_size:.2f}x")
+    print(f"  file encode:        {duration / file_time:.0f}x realtime ({wav_size / 1e6 / file_time:.0f} MB/s)")
+    print(f"  streaming encode:   {duration / stream_time:.0f}x realtime")
+
+
+def bench_capture(duration, workdir):
+    """Full recorder pipeline: 48 kHz stereo source -> mono 16 kHz -> ring buffer -> WAV"""
+    source = SyntheticSource(duration, samplerate=48000, channels=2, speed=0)
+    session = RecordingSession(path=os.path.join(workdir, "capture.wav"), source=source)
+
+    start = time.perf_counter()
+    session.start()
+    while session.is_running:
+        time.sleep(0.01)
+    path = session.stop()
+    elapsed = time.perf_counter() - start
+
+    print("Capture pipeline (synthetic source, unpaced)")
+    print(f"  output:             {os.path.getsize(path) / 1e6:.1f} MB at {session.samplerate} Hz mono")
+    print(f"  dropped frames:     {session.dropped_frames}")
+    print(f"  speed:              {duration / elapsed:.0f}x realtime")
+
+
+def _hold_gil(seconds):
+    """Simulate blocking calls that hold the GIL (C loops that never yield)"""
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        sum(range(4 * 10 ** 7))
+
+
+def bench_isolation(seconds, workdir):
+    """Real-time capture while the parent process is busy holding the GIL"""
+    print(f"Capture under load ({seconds:.0f} s real time, parent holding the GIL)")
+    for out_of_process in (False, True):
+        source = SyntheticSource(None, samplerate=48000, channels=2, speed=1)
+        session = RecordingSession(path=os.path.join(workdir, f"load_{out_of_process}.wav"),
+                                   source=source, out_of_process=out_of_process)
+        session.start()
+        # Wait until capture is actually running (the child process needs a moment to start)
+        while session._ring.frames_written == 0:
+            time.sleep(0.01)
+        _hold_gil(seconds)
+        session.stop()
+        lost = session.source_lost_frames / source.samplerate
+        mode = "child process" if out_of_process else "thread"
+        print(f"  {mode + ':':19} {lost:.2f} s lost at the source, "
+              f"{session.dropped_frames} frames dropped in {session.overruns} ring overruns")
+
+
+def _write_stereo(path, hours, sample_rate):
+    """Multi-hour stereo WAV, written a minute at a time"""
+    minute, _ = synthetic_meeting_audio(60, sample_rate)
+    left = np.int16(np.clip(minute, -1, 1) * 32767)
+    block = np.stack([left, np.roll(left, 800)], axis=1).tobytes()
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(2)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        for _ in range(int(hours * 60)):
+            wf.writeframesraw(block)
+
+
+def _downmix_numpy(path):
+    downmix_to_mono(path, path[:-4] + "_numpy.wav")
+
+
+def _downmix_pydub(path):
+    from pydub import AudioSegment
+    AudioSegment.from_wav(path).set_channels(1).export(path[:-4] + "_pydub.wav", format="wav")
+
+
+def _timed(function, path, results):
+    start = time.perf_counter()
+    function(path)
+    # ru_maxrss is in kilobytes on Linux
+    results.put((time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def bench_downmix(hours, workdir):
+    """Stereo -> mono conversion of a long recording, each method in a fresh process"""
+    sample_rate = 16000
+    path = os.path.join(workdir, "stereo.wav")
+    _write_stereo(path, hours, sample_rate)
+    size = os.path.getsize(path) / 1e6
+    print(f"Stereo downmix ({hours:g} h at {sample_rate} Hz, {size:.0f} MB)")
+
+    context = multiprocessing.get_context("spawn")
+    for name, function in (("numpy (streaming)", _downmix_numpy), ("pydub", _downmix_pydub)):
+        results = context.Queue()
+        process = context.Process(target=_timed, args=(function, path, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            print(f"  {name + ':':19} failed (exit code {process.exitcode})")
+            continue
+        elapsed, peak_mb = results.get()
+        print(f"  {name + ':':19} {elapsed:.1f} s ({size / elapsed:.0f} MB/s), peak memory {peak_mb:.0f} MB")
+
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    downmix_hours = float(sys.argv[2]) if len(sys.argv) > 2 else 2
+    sample_rate = 16000
+    audio, spurts = synthetic_meeting_audio(minutes * 60, sample_rate)
+    speech = sum(e - s for s, e in spurts)
+    print(f"Synthetic meeting: {minutes:.0f} min at {sample_rate} Hz, {speech:.0f} s of speech\n")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        bench_vad(audio, sample_rate, workdir)
+        print()
+        bench_flac(audio, sample_rate, workdir)
+        print()
+        bench_capture(minutes * 60, workdir)
+        print()
+        bench_isolation(10, workdir)
+        print()
+        bench_downmix(downmix_hours, workdir)
+
+
+if __name__ == "__main__":
+    main()
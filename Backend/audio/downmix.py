@@ -0,0 +1,101 @@
+import os
+import wave
+import struct
+from collections import namedtuple
+import numpy as np
+
+# Frames read and averaged at a time; memory use does not depend on the file length
+BLOCK_FRAMES = 1 << 18
+
+WavInfo = namedtuple("WavInfo", "channels sample_rate sample_width frames data_offset")
+
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+_DTYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+
+def read_wav_info(file_path):
+    """
+    Read a PCM WAV file's format from its header without decoding any audio.
+
+    Also copes with the header of a recording that was never finalised
+    (data size 0 or larger than the file): the frame count is then taken
+    from the file size.
+    """
+    file_size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError(f"Not a WAV file: {file_path}")
+
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"No data chunk in {file_path}")
+            chunk_id, size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                fmt = f.read(size)
+                f.seek(size % 2, 1)
+            elif chunk_id == b"data":
+                data_offset = f.tell()
+                break
+            else:
+                # Chunks are word aligned
+                f.seek(size + size % 2, 1)
+
+    if fmt is None:
+        raise ValueError(f"No fmt chunk in {file_path}")
+    format_tag, channels, sample_rate, _, block_align, bits = struct.unpack("<HHIIHH", fmt[:16])
+    if format_tag == _WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        format_tag = struct.unpack("<H", fmt[24:26])[0]
+    sample_width = bits // 8
+    if format_tag != _WAVE_FORMAT_PCM or sample_width not in _DTYPES:
+        raise ValueError(f"Unsupported WAV format in {file_path} (format {format_tag:#x}, {bits} bits)")
+
+    available = file_size - data_offset
+    if size == 0 or size > available:
+        size = available
+    return WavInfo(channels, sample_rate, sample_width, size // block_align, data_offset)
+
+
+def downmix_to_mono(file_path, output_path=None, block_frames=BLOCK_FRAMES):
+    """
+    Average the channels of a PCM WAV file into a mono WAV, a block at a
+    time. Returns (output_path, WavInfo of the input).
+    """
+    info = read_wav_info(file_path)
+    if output_path is None:
+        output_path = os.path.splitext(file_path)[0] + "_mono.wav"
+
+    dtype = np.dtype(_DTYPES[info.sample_width]).newbyteorder("<")
+    frame_bytes = info.sample_width * info.channels
+    buffer = bytearray(block_frames * frame_bytes)
+    # Channel sums need headroom: int32 for 8/16-bit samples, int64 for 32-bit
+    total = np.empty(block_frames, dtype=np.int64 if info.sample_width == 4 else np.int32)
+
+    with open(file_path, "rb") as src, wave.open(output_path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(info.sample_width)
+        out.setframerate(info.sample_rate)
+        src.seek(info.data_offset)
+
+        remaining = info.frames
+        while remaining > 0:
+            frames = min(block_frames, remaining)
+            view = memoryview(buffer)[:frames * frame_bytes]
+            read = src.readinto(view)
+            frames = read // frame_bytes
+            if frames == 0:
+                break
+            block = np.frombuffer(buffer, dtype=dtype, count=frames * info.channels).reshape(frames, info.channels)
+            # Summing column by column is much faster than a mean over a short axis
+            mixed = total[:frames]
+            mixed[:] = block[:, 0]
+            for channel in range(1, info.channels):
+                mixed += block[:, channel]
+            mixed //= info.channels
+            out.writeframesraw(mixed.astype(dtype).tobytes())
+            remaining -= frames
+
+    return output_path, info
@@ -0,0 +1,107 @@
+import os
+import shutil
+import struct
+import subprocess
+import numpy as np
+
+# FLAC encoding is done by ffmpeg (already required by pydub)
+FFMPEG = os.getenv("FFMPEG_BINARY") or shutil.which("ffmpeg")
+FLAC_AVAILABLE = FFMPEG is not None
+
+# ffmpeg's FLAC compression level (0 = fastest, 12 = smallest)
+COMPRESSION_LEVEL = 5
+
+
+def _check_ffmpeg():
+    if not FLAC_AVAILABLE:
+        raise RuntimeError("ffmpeg not found; install it or set FFMPEG_BINARY to encode FLAC")
+
+
+class FlacStreamWriter:
+    """
+    Encode 16-bit PCM blocks to a FLAC file as they are captured.
+
+    Same interface as record_meet.WavStreamWriter: raw samples are piped to
+    an ffmpeg process, which writes the FLAC file and finalises its header
+    when the writer is closed.
+    """
+
+    def __init__(self, filename, samplerate, channels, compression_level=COMPRESSION_LEVEL):
+        _check_ffmpeg()
+        self.filename = filename
+        self.samplerate = samplerate
+        self.channels = channels
+        self.frames_written = 0
+        self._process = subprocess.Popen(
+            [FFMPEG, "-hide_banner", "-loglevel", "error", "-y",
+             "-f", "s16le", "-ar", str(samplerate), "-ac", str(channels), "-i", "pipe:0",
+             "-c:a", "flac", "-compression_level", str(compression_level), filename],
+            stdin=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+    def write(self, block):
+        """Write a float32 or int16 block of shape (frames, channels)"""
+        if block.dtype != np.int16:
+            block = np.int16(np.clip(block, -1.0, 1.0) * 32767)
+        self._process.stdin.write(np.ascontiguousarray(block).tobytes())
+        self.frames_written += len(block)
+
+    def close(self):
+        """Finish encoding and wait for ffmpeg to write the file"""
+        if self._process is not None:
+            self._process.stdin.close()
+            stderr = self._process.stderr.read()
+            if self._process.wait() != 0:
+                raise RuntimeError(f"ffmpeg failed to encode {self.filename}: {stderr.decode(errors='replace')}")
+            self._process = None
+        return self.filename
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def encode_flac(file_path, output_path=None, channels=None, compression_level=COMPRESSION_LEVEL):
+    """
+    Losslessly re-encode an audio file (WAV or FLAC) as FLAC and return the
+    new path. Pass channels=1 to downmix to mono at the same time.
+    """
+    _check_ffmpeg()
+    if output_path is None:
+        output_path = os.path.splitext(file_path)[0] + ".flac"
+    command = [FFMPEG, "-hide_banner", "-loglevel", "error", "-y", "-i", file_path]
+    if channels is not None:
+        command += ["-ac", str(channels)]
+    command += ["-c:a", "flac", "-compression_level", str(compression_level), output_path]
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to encode {file_path}: {result.stderr.decode(errors='replace')}")
+    return output_path
+
+
+def read_flac_info(file_path):
+    """Return (channels, sample_rate) from a FLAC file's STREAMINFO block"""
+    with open(file_path, "rb") as f:
+        header = f.read(4 + 4 + 18)
+    if header[:4] != b"fLaC" or header[4] & 0x7F != 0:
+        raise ValueError(f"Not a FLAC file: {file_path}")
+    # STREAMINFO: 20 bits sample rate, 3 bits (channels - 1), starting at byte 10
+    packed = struct.unpack(">I", header[8 + 10:8 + 14])[0]
+    sample_rate = packed >> 12
+    channels = ((packed >> 9) & 0x7) + 1
+    return channels, sample_rate
+
+
+def read_flac_duration(file_path):
+    """Length in seconds from a FLAC file's STREAMINFO block (None if the encoder left it out)"""
+    with open(file_path, "rb") as f:
+        header = f.read(4 + 4 + 18)
+    if header[:4] != b"fLaC" or header[4] & 0x7F != 0:
+        raise ValueError(f"Not a FLAC file: {file_path}")
+    sample_rate = struct.unpack(">I", header[8 + 10:8 + 14])[0] >> 12
+    # 36 bits of total samples at the end of the same 8 bytes
+    total_samples = struct.unpack(">Q", header[8 + 10:8 + 18])[0] & ((1 << 36) - 1)
+    return total_samples / sample_rate if total_samples else None
@@ -0,0 +1,91 @@
+from math import gcd
+import numpy as np
+
+
+class StreamingResampler:
+    """
+    Block-by-block polyphase resampler (e.g. 48 kHz capture -> 16 kHz speech).
+
+    Uses the same anti-aliasing filter as scipy.signal.resample_poly, but
+    keeps the filter history between calls so blocks of any size can be fed
+    as they are captured without clicks at block boundaries. The filter
+    delay is compensated, so output sample n lines up with input time
+    n / out_rate. Call flush() after the last block to get the tail.
+    """
+
+    def __init__(self, in_rate, out_rate, channels=1):
+        # scipy.signal takes about a second to import, so only when recording starts
+        from scipy.signal import firwin, upfirdn
+
+        self._upfirdn = upfirdn
+        g = gcd(in_rate, out_rate)
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.channels = channels
+        self.up = out_rate // g
+        self.down = in_rate // g
+
+        if self.up == self.down:
+            # Same rate: pass samples straight through
+            half_len, taps = 0, np.ones(1)
+        else:
+            half_len = 10 * max(self.up, self.down)
+            taps = firwin(2 * half_len + 1, 1.0 / max(self.up, self.down), window=("kaiser", 5.0))
+        self._taps = (taps * self.up).astype(np.float32)
+        self._delay = half_len
+        self._inv_up = pow(self.up, -1, self.down) if self.down > 1 else 0
+
+        # Input samples still needed by future outputs, and the input index of the first one
+        self._history = np.zeros((0, channels), dtype=np.float32)
+        self._history_start = 0
+        # Index (in the upsampled signal) of the next output sample
+        self._next = self._delay
+        self.frames_in = 0
+        self.frames_out = 0
+
+    def process(self, block):
+        """Resample a float block of shape (frames, channels); returns float32"""
+        block = np.asarray(block, dtype=np.float32).reshape(-1, self.channels)
+        self.frames_in += len(block)
+        return self._process(block)
+
+    def flush(self):
+        """Return the remaining output once the input has ended"""
+        pad = np.zeros((self._delay // self.up + self.down + 1, self.channels), dtype=np.float32)
+        out = self._process(pad)
+        expected = -(-self.frames_in * self.up // self.down)
+        remaining = max(0, expected - (self.frames_out - len(out)))
+        out = out[:remaining]
+        self.frames_out = expected
+        return out
+
+    def _process(self, block):
+        up, down = self.up, self.down
+        buf = np.concatenate((self._history, block)) if len(self._history) else block
+        start = self._history_start
+        end_up = (start + len(buf)) * up
+
+        # Outputs whose filter window ends inside the samples we have
+        count = max(0, -(-(end_up - self._next) // down))
+        if count == 0:
+            self._history, self._history_start = buf, start
+            return np.zeros((0, self.channels), dtype=np.float32)
+
+        # Prepend zeros (outside the filter support) so that the first output
+        # falls on a decimation phase of upfirdn's output grid
+        offset = (self._next - start * up) % down
+        pad = (-offset * self._inv_up) % down if down > 1 else 0
+        if pad:
+            buf = np.concatenate((np.zeros((pad, self.channels), dtype=np.float32), buf))
+            start -= pad
+        first = (self._next - start * up) // down
+
+        out = self._upfirdn(self._taps, buf, up, down, axis=0)[first:first + count]
+        self._next += count * down
+        self.frames_out += count
+
+        # Keep only the inputs the next output still depends on
+        keep_from = max(start, -(-(self._next - len(self._taps) + 1) // up))
+        self._history = buf[keep_from - start:]
+        self._history_start = keep_from
+        return out.astype(np.float32, copy=False)
@@ -0,0 +1,218 @@
+import time
+import wave
+import numpy as np
+
+from audio.synthetic import synthetic_meeting_audio
+
+
+class AudioSource:
+    """
+    Something the recorder can capture audio from.
+
+    Sources are created without touching any device or file; open() does
+    that, and close() releases it. read() returns float32 blocks of shape
+    (frames, channels) in [-1, 1] and an empty block once the source has
+    ended. Sources with realtime = False can be read faster than real time,
+    so the recorder waits for buffer space instead of dropping their audio.
+    lost_frames counts audio the source had to discard because it was not
+    read in time.
+    """
+
+    samplerate = None
+    channels = None
+    realtime = True
+    lost_frames = 0
+
+    def open(self):
+        return self
+
+    def read(self, num_frames):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def describe(self):
+        return type(self).__name__
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class _Pacer:
+    """
+    Sleep so that audio is delivered at `speed` times real time (0 = no pacing).
+
+    Like a sound card, a paced source only buffers max_lag seconds: if the
+    reader falls further behind, overflow() says how much audio to skip.
+    """
+
+    def __init__(self, samplerate, speed, max_lag=0.5):
+        self.samplerate = samplerate
+        self.speed = speed
+        self.max_lag = max_lag
+        self.frames = 0
+        self.started = None
+
+    def overflow(self):
+        if self.speed <= 0 or self.started is None:
+            return 0
+        behind = (time.monotonic() - self.started) * self.samplerate * self.speed - self.frames
+        if behind <= self.max_lag * self.samplerate * self.speed:
+            return 0
+        self.frames += int(behind)
+        return int(behind)
+
+    def wait(self, frames):
+        if self.started is None:
+            self.started = time.monotonic()
+        self.frames += frames
+        if self.speed > 0:
+            due = self.started + self.frames / self.samplerate / self.speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+
+class LoopbackSource(AudioSource):
+    """System audio from the default speaker's loopback device (soundcard)"""
+
+    def __init__(self, samplerate=48000, speaker_name=None):
+        self.samplerate = samplerate
+        self.speaker_name = speaker_name
+        self._recorder = None
+
+    def open(self):
+        import soundcard as sc
+
+        _init_com()
+        if self.speaker_name is None:
+            self.speaker_name = sc.default_speaker().name
+        mic = sc.get_microphone(self.speaker_name, include_loopback=True)
+        self.channels = mic.channels
+        self._recorder = mic.recorder(samplerate=self.samplerate)
+        self._recorder.__enter__()
+        return self
+
+    def read(self, num_frames):
+        return self._recorder.record(numframes=num_frames)
+
+    def close(self):
+        if self._recorder is not None:
+            self._recorder.__exit__(None, None, None)
+            self._recorder = None
+
+    def describe(self):
+        return f"loopback of {self.speaker_name or 'default speaker'}"
+
+
+class WavFileSource(AudioSource):
+    """
+    Replay a 16-bit WAV file, at real time by default. speed=4 plays four
+    times faster, speed=0 as fast as the recorder can consume it.
+    """
+
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+        self.realtime = speed > 0
+        self._wav = None
+        with wave.open(path, "rb") as wf:
+            self.samplerate = wf.getframerate()
+            self.channels = wf.getnchannels()
+
+    def open(self):
+        self._wav = wave.open(self.path, "rb")
+        if self._wav.getsampwidth() != 2:
+            raise ValueError("Only 16-bit PCM WAV files are supported")
+        self._pacer = _Pacer(self.samplerate, self.speed)
+        return self
+
+    def read(self, num_frames):
+        skip = self._pacer.overflow()
+        if skip:
+            self._wav.readframes(skip)
+            self.lost_frames += skip
+        data = self._wav.readframes(num_frames)
+        block = np.frombuffer(data, dtype=np.int16).reshape(-1, self.channels)
+        self._pacer.wait(len(block))
+        return block.astype(np.float32) / 32768
+
+    def close(self):
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+
+    def describe(self):
+        return f"replay of {self.path}"
+
+
+class SyntheticSource(AudioSource):
+    """
+    Speech-like test signal (see audio.synthetic), generated a chunk at a
+    time so long or endless (duration=None) runs use constant memory.
+    """
+
+    CHUNK_SECONDS = 60
+
+    def __init__(self, duration=None, samplerate=48000, channels=2, speed=1.0,
+                 speech_ratio=0.6, seed=0):
+        self.duration = duration
+        self.samplerate = samplerate
+        self.channels = channels
+        self.speed = speed
+        self.realtime = speed > 0
+        self.speech_ratio = speech_ratio
+        self.seed = seed
+
+    def open(self):
+        self._pacer = _Pacer(self.samplerate, self.speed)
+        self._chunk = np.zeros(0, dtype=np.float32)
+        self._chunk_index = 0
+        self._position = 0
+        self._remaining = None if self.duration is None else int(self.duration * self.samplerate)
+        return self
+
+    def read(self, num_frames):
+        skip = self._pacer.overflow()
+        if skip:
+            self.lost_frames += len(self._generate(skip))
+        mono = self._generate(num_frames)
+        self._pacer.wait(len(mono))
+        return np.repeat(mono[:, None], self.channels, axis=1)
+
+    def _generate(self, num_frames):
+        if self._remaining is not None:
+            num_frames = min(num_frames, self._remaining)
+            self._remaining -= num_frames
+
+        parts = []
+        needed = num_frames
+        while needed > 0:
+            if self._position >= len(self._chunk):
+                self._chunk, _ = synthetic_meeting_audio(
+                    self.CHUNK_SECONDS, self.samplerate, self.speech_ratio, self.seed + self._chunk_index
+                )
+                self._chunk_index += 1
+                self._position = 0
+            part = self._chunk[self._position:self._position + needed]
+            self._position += len(part)
+            needed -= len(part)
+            parts.append(part)
+
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+    def describe(self):
+        return "synthetic meeting audio"
+
+
+def _init_com():
+    """soundcard's Windows backend needs COM initialised on each capture thread"""
+    try:
+        import pythoncom
+        pythoncom.CoInitialize()
+    except ImportError:
+        pass
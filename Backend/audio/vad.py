@@ -0,0 +1,200 @@
+import os
+import json
+import wave
+import numpy as np
+
+# Defaults tuned for meeting audio
+FRAME_MS = 30
+THRESHOLD_DB = 12        # how far above the noise floor a frame must be to count as speech
+MIN_LEVEL_DB = -55       # frames quieter than this (dBFS) are never speech
+ZCR_THRESHOLD = 0.25     # zero-crossing rate that marks quiet frames as unvoiced speech
+HANGOVER_MS = 300        # keep this much audio after speech ends
+PREROLL_MS = 90          # and this much before it starts
+MIN_SPEECH_MS = 120      # drop isolated bursts shorter than this
+
+# Frames read from a file at a time, so memory use does not depend on its length
+BLOCK_FRAMES = 1 << 18
+
+
+def frame_features(samples, sample_rate, frame_ms=FRAME_MS):
+    """
+    Split mono float samples into frames and return (energy_db, zcr), one
+    value per frame. Energy is in dBFS, zcr is crossings per sample.
+    """
+    frame_len = max(1, int(sample_rate * frame_ms / 1000))
+    n_frames = len(samples) // frame_len
+    frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+
+    energy_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame_len
+    return energy_db, zcr
+
+
+def detect_speech(samples, sample_rate, frame_ms=FRAME_MS, threshold_db=THRESHOLD_DB,
+                  min_level_db=MIN_LEVEL_DB, zcr_threshold=ZCR_THRESHOLD,
+                  hangover_ms=HANGOVER_MS, preroll_ms=PREROLL_MS, min_speech_ms=MIN_SPEECH_MS):
+    """
+    Find speech in mono audio.
+
+    samples may be int16 or float; multi-channel input is averaged. Returns
+    an int64 array of shape (n, 2) with [start, end) sample indices of each
+    speech segment, in order and non-overlapping.
+    """
+    samples = _mono_float(samples)
+    energy_db, zcr = frame_features(samples, sample_rate, frame_ms)
+    return _find_segments(energy_db, zcr, len(samples), sample_rate, frame_ms, threshold_db, min_level_db,
+                          zcr_threshold, hangover_ms, preroll_ms, min_speech_ms)
+
+
+def detect_speech_in_wav(file_path, block_frames=BLOCK_FRAMES, frame_ms=FRAME_MS, **vad_options):
+    """
+    detect_speech for a 16-bit WAV file, reading it a block at a time: only
+    the per-frame features of the whole file are held in memory. Returns
+    (segments, sample_rate, channels).
+    """
+    with wave.open(file_path, "rb") as wf:
+        channels = wf.getnchannels()
+        sample_rate = wf.getframerate()
+        if wf.getsampwidth() != 2:
+            raise ValueError("Only 16-bit PCM WAV files are supported")
+        frame_len = max(1, int(sample_rate * frame_ms / 1000))
+        # Whole frames per block, so no frame straddles two blocks
+        block_frames = max(frame_len, block_frames // frame_len * frame_len)
+
+        energy, crossings = [], []
+        total = 0
+        while True:
+            data = wf.readframes(block_frames)
+            if not data:
+                break
+            samples = _mono_float(np.frombuffer(data, dtype=np.int16).reshape(-1, channels))
+            block_energy, block_zcr = frame_features(samples, sample_rate, frame_ms)
+            energy.append(block_energy)
+            crossings.append(block_zcr)
+            total += len(samples)
+
+    energy_db = np.concatenate(energy) if energy else np.empty(0)
+    zcr = np.concatenate(crossings) if crossings else np.empty(0)
+    segments = _find_segments(energy_db, zcr, total, sample_rate, frame_ms, **vad_options)
+    return segments, sample_rate, channels
+
+
+def _mono_float(samples):
+    """Mono float32 samples in [-1, 1) from int16 or float input"""
+    samples = np.asarray(samples)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    if samples.dtype == np.int16:
+        return samples.astype(np.float32) / 32768
+    return samples.astype(np.float32, copy=False)
+
+
+def _find_segments(energy_db, zcr, n_samples, sample_rate, frame_ms=FRAME_MS, threshold_db=THRESHOLD_DB,
+                   min_level_db=MIN_LEVEL_DB, zcr_threshold=ZCR_THRESHOLD, hangover_ms=HANGOVER_MS,
+                   preroll_ms=PREROLL_MS, min_speech_ms=MIN_SPEECH_MS):
+    """Speech segments (sample indices) from the frame features of n_samples of audio"""
+    frame_len = max(1, int(sample_rate * frame_ms / 1000))
+    if len(energy_db) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    # Adaptive threshold relative to the quietest frames
+    noise_floor = np.percentile(energy_db, 10)
+    threshold = max(noise_floor + threshold_db, min_level_db)
+    loud = energy_db > threshold
+    # Unvoiced consonants are quiet but noisy; keep them if they are above the floor
+    unvoiced = (zcr > zcr_threshold) & (energy_db > threshold - threshold_db / 2)
+    speech = loud | unvoiced
+
+    # Remove isolated bursts shorter than min_speech_ms
+    min_frames = max(1, int(min_speech_ms / frame_ms))
+    starts, ends = _runs(speech)
+    for s, e in zip(starts, ends):
+        if e - s < min_frames:
+            speech[s:e] = False
+
+    # Hangover after and pre-roll before each speech frame
+    speech = _dilate(speech, int(hangover_ms / frame_ms), int(preroll_ms / frame_ms))
+
+    starts, ends = _runs(speech)
+    segments = np.stack([starts, ends], axis=1).astype(np.int64) * frame_len
+    segments[:, 1] = np.minimum(segments[:, 1], n_samples)
+    return segments
+
+
+def _runs(mask):
+    """Start and end indices of each run of True values"""
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def _dilate(mask, after, before):
+    """Extend every True frame forward by `after` frames and back by `before`"""
+    counts = np.cumsum(np.concatenate(([0], mask.view(np.int8))))
+    n = len(mask)
+    idx = np.arange(n)
+    # A frame is kept if any speech frame lies in [idx - after, idx + before]
+    lo = np.clip(idx - after, 0, n)
+    hi = np.clip(idx + before + 1, 0, n)
+    return counts[hi] - counts[lo] > 0
+
+
+def to_original_time(seconds, segment_map):
+    """Map a time in the trimmed audio back to the original recording"""
+    for segment in reversed(segment_map):
+        if seconds >= segment["trimmed_start"]:
+            return segment["original_start"] + (seconds - segment["trimmed_start"])
+    return seconds
+
+
+def to_original_times(seconds, segment_map):
+    """to_original_time for a whole array of times at once"""
+    seconds = np.asarray(seconds, dtype=np.float64)
+    if not segment_map:
+        return seconds
+    trimmed = np.array([segment["trimmed_start"] for segment in segment_map])
+    original = np.array([segment["original_start"] for segment in segment_map])
+    index = np.maximum(np.searchsorted(trimmed, seconds, side="right") - 1, 0)
+    return np.where(seconds >= trimmed[0], seconds + original[index] - trimmed[index], seconds)
+
+
+def trim_silence(file_path, output_path=None, block_frames=BLOCK_FRAMES, **vad_options):
+    """
+    Write a copy of a 16-bit WAV with the silent stretches removed, a block
+    at a time.
+
+    Returns (output_path, segment_map). segment_map lists the kept segments
+    with their start in the trimmed file and in the original, both in
+    seconds, and is also saved next to the output as JSON. If there is no
+    speech at all nothing is written and (None, []) is returned.
+    """
+    if output_path is None:
+        output_path = os.path.splitext(file_path)[0] + "_trimmed.wav"
+    if os.path.abspath(output_path) == os.path.abspath(file_path):
+        raise ValueError(f"Trimmed audio would overwrite {file_path}")
+
+    segments, sample_rate, channels = detect_speech_in_wav(file_path, block_frames, **vad_options)
+    if len(segments) == 0:
+        return None, []
+
+    segment_map = []
+    trimmed_start = 0
+    with wave.open(file_path, "rb") as wf, wave.open(output_path, "wb") as out:
+        out.setnchannels(channels)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        for start, end in segments.tolist():
+            wf.setpos(start)
+            for position in range(start, end, block_frames):
+                out.writeframesraw(wf.readframes(min(block_frames, end - position)))
+            segment_map.append({
+                "trimmed_start": trimmed_start / sample_rate,
+                "original_start": start / sample_rate,
+                "duration": (end - start) / sample_rate,
+            })
+            trimmed_start += end - start
+
+    with open(os.path.splitext(output_path)[0] + ".json", "w") as f:
+        json.dump(segment_map, f, indent=2)
+
+    return output_path, segment_map
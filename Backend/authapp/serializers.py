@@ -3,18 +3,25 @@ from pymongo import MongoClient
 from django.conf import settings
 import datetime
 from django.contrib.auth.hashers import make_password, check_password
-from firebase_admin import credentials, auth
-import firebase_admin
 import os
+from threading import Lock
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize Firebase Admin SDK
-if not firebase_admin._apps:
-    cred = credentials.Certificate(os.getenv('FIREBASE_CREDENTIALS_JSON'))
-    firebase_admin.initialize_app(cred)
+_firebase_lock = Lock()
+
+def firebase_auth():
+    """firebase_admin.auth, initialising the Firebase Admin SDK on first use"""
+    import firebase_admin
+    from firebase_admin import credentials, auth
+
+    with _firebase_lock:
+        if not firebase_admin._apps:
+            cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS_JSON)
+            firebase_admin.initialize_app(cred)
+    return auth
 
 class UserRegisterSerializer(serializers.Serializer):
     username = serializers.CharField(max_length=150)
@@ -131,7 +138,7 @@ class GoogleAuthSerializer(serializers.Serializer):
     
     def validate(self, data):
         try:
-            decoded_token = auth.verify_id_token(data['token'])
+            decoded_token = firebase_auth().verify_id_token(data['token'])
             data['decoded_token'] = decoded_token
             return data
         except Exception as e:
@@ -0,0 +1,85 @@
+from django.http import StreamingHttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+import os
+import json
+import time
+import logging
+from threading import Lock
+
+logger = logging.getLogger('summary_stream')
+
+# Seconds between checks for new chunks, and between keep-alive comments
+POLL_INTERVAL = float(os.getenv('SUMMARY_STREAM_POLL', '0.25'))
+KEEPALIVE_INTERVAL = 15
+# Connections are closed after this long; EventSource reconnects by itself
+# and carries on from the last chunk it received (Last-Event-ID)
+MAX_SECONDS = float(os.getenv('SUMMARY_STREAM_MAX_SECONDS', '600'))
+
+_store = None
+_store_lock = Lock()
+
+def get_store():
+    """The summary stream store, opened on first use (None if unavailable)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            from summarise.stream import open_summary_stream_store
+            _store = open_summary_stream_store()
+        return _store
+
+def _event(name, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {name}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+def summary_events(store, event_id, offset=0):
+    """
+    Server-sent events for an event's summary: a "chunk" for each piece
+    after the first `offset` (its id is the number of chunks sent so far),
+    a "reset" if the text sent until then was discarded, then "done" with
+    the complete summary.
+    """
+    from summarise.stream import DONE
+
+    yield "retry: 2000\n\n"
+    started = last_sent = time.monotonic()
+    while time.monotonic() - started < MAX_SECONDS:
+        chunks, state, summary = store.read(event_id, offset)
+        for text in chunks:
+            offset += 1
+            if text is None:
+                yield _event("reset", {}, offset)
+            else:
+                yield _event("chunk", {"text": text}, offset)
+        if state == DONE:
+            yield _event("done", {"summary": summary}, offset)
+            return
+        if chunks:
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= KEEPALIVE_INTERVAL:
+            # Keeps proxies from closing an idle connection
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        time.sleep(POLL_INTERVAL)
+
+@require_GET
+def summary_stream(request, email, event_index):
+    """Stream the summary of an event as it is generated (text/event-stream)"""
+    store = get_store()
+    if store is None:
+        return JsonResponse({'message': 'Summary streaming not available'}, status=503)
+
+    # Resume after the chunks the client already has
+    try:
+        offset = int(request.headers.get('Last-Event-ID') or request.GET.get('offset', 0))
+    except ValueError:
+        offset = 0
+
+    logger.info(f"Streaming summary of event {event_index} for {email} from chunk {offset}")
+    event_id = {"email": email, "event_index": event_index}
+    response = StreamingHttpResponse(summary_events(store, event_id, max(0, offset)),
+                                     content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
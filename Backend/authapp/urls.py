@@ -2,6 +2,7 @@ from django.urls import path
 from .views import RegisterView, LoginView, GoogleAuthView
 from . import views
 from .manual_join import manual_join_meeting
+from .summary_stream import summary_stream
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
@@ -10,5 +11,6 @@ urlpatterns = [
     path('events/create/', views.create_event, name='create_event'),
     path('events/<str:email>/', views.get_user_events, name='get_user_events'),
     path('events/<str:email>/<int:event_index>/', views.manage_event, name='manage_event'),
+    path('events/<str:email>/<int:event_index>/summary/stream/', summary_stream, name='summary_stream'),
     path('manual-join/', manual_join_meeting, name='manual_join_meeting'),
 ]
\ No newline at end of file
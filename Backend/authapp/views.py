@@ -3,9 +3,7 @@ from rest_framework.response import Response
 from .models import User
 from .serializers import UserRegisterSerializer, UserLoginSerializer, GoogleAuthSerializer
 from rest_framework.authtoken.models import Token
-from firebase_admin import auth as firebase_auth
 from rest_framework import serializers
-from firebase_admin.auth import ExpiredIdTokenError, InvalidIdTokenError
 from django.utils import timezone
 from django.conf import settings
 from pymongo import MongoClient
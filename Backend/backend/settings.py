@@ -15,8 +15,6 @@ import os
 from dotenv import load_dotenv
 from mongoengine import connect
 from django.contrib.auth.hashers import make_password, check_password
-import firebase_admin
-from firebase_admin import credentials
 
 # Load environment variables from .env file
 load_dotenv()
@@ -180,7 +178,5 @@ FIREBASE_PROJECT_ID = os.getenv('FIREBASE_PROJECT_ID')
 FIREBASE_STORAGE_BUCKET = os.getenv('FIREBASE_STORAGE_BUCKET')
 FIREBASE_MESSAGING_SENDER_ID = os.getenv('FIREBASE_MESSAGING_SENDER_ID')
 FIREBASE_APP_ID = os.getenv('FIREBASE_APP_ID')
-
-if not firebase_admin._apps:
-    cred = credentials.Certificate(os.getenv('FIREBASE_CREDENTIALS_JSON'))
-    firebase_admin.initialize_app(cred)
+# The Admin SDK is initialised from this file on first use (see authapp/serializers.py)
+FIREBASE_CREDENTIALS_JSON = os.getenv('FIREBASE_CREDENTIALS_JSON')
@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import datetime
+from threading import Lock
+
+# The stores behind stt/cache.py (transcripts) and summarise/cache.py
+# (summaries): text keyed by a hash, in JSON files or a MongoDB collection,
+# evicted least recently used beyond a total size and, if there is a TTL,
+# once expired. Standard library only: ai-api loads this file by path.
+
+CACHE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+
+
+class KeyedCache:
+    """
+    Text keyed by a hash. Subclasses store it; this class keeps the counters
+    and makes sure a broken cache never fails its caller (errors are logged
+    and count as misses). field names the text in stored entries and log
+    messages; with ttl None entries only go when evicted.
+    """
+
+    def __init__(self, field, logger, ttl=None, max_bytes=64 * 1024 * 1024):
+        self.field = field
+        self.logger = logger
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = Lock()
+
+    def get(self, key):
+        try:
+            value = self._get(key)
+        except Exception as e:
+            self.logger.warning(f"{self.field.capitalize()} cache lookup failed: {str(e)}")
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, key, value, info=None):
+        try:
+            self._put(key, value, info)
+            evicted = self._evict()
+        except Exception as e:
+            self.logger.warning(f"Could not store {self.field} in cache: {str(e)}")
+            return
+        with self._lock:
+            self.stores += 1
+            self.evictions += evicted
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _put(self, key, value, info):
+        raise NotImplementedError
+
+    def _evict(self):
+        """Remove expired entries, then least recently used ones beyond max_bytes; returns how many"""
+        raise NotImplementedError
+
+
+class DiskCache(KeyedCache):
+    """One JSON file per entry; a file's mtime is its last use"""
+
+    def __init__(self, directory, field, logger, ttl=None, max_bytes=64 * 1024 * 1024):
+        super().__init__(field, logger, ttl, max_bytes)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def _get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        if self.ttl is not None and time.time() - entry["created"] > self.ttl:
+            os.remove(path)
+            return None
+        os.utime(path)
+        return entry[self.field]
+
+    def _put(self, key, value, info):
+        path = self._path(key)
+        entry = {self.field: value, "info": info, "created": time.time()}
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(path + ".tmp", path)
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        # Nothing is used after its TTL, so anything unused for that long has expired
+        expired_before = time.time() - self.ttl if self.ttl is not None else 0
+        evicted = 0
+        for mtime, size, name in sorted(entries):
+            if total <= self.max_bytes and mtime >= expired_before:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        return evicted
+
+
+class MongoCache(KeyedCache):
+    """Entries in a MongoDB collection, shared by every machine using the same database"""
+
+    def __init__(self, collection, field, logger, ttl=None, max_bytes=64 * 1024 * 1024, uri=None):
+        super().__init__(field, logger, ttl, max_bytes)
+        from pymongo import MongoClient
+
+        self.client = MongoClient(uri or os.getenv('DB_URI'))
+        self.collection = self.client.user[collection]
+        self.collection.create_index("last_used")
+        # MongoDB deletes entries itself once they expire
+        self.collection.create_index("expires", expireAfterSeconds=0)
+
+    def _get(self, key):
+        now = datetime.datetime.utcnow()
+        query = {"_id": key}
+        if self.ttl is not None:
+            query["expires"] = {"$gt": now}
+        entry = self.collection.find_one_and_update(query, {"$set": {"last_used": now}})
+        return entry[self.field] if entry else None
+
+    def _put(self, key, value, info):
+        now = datetime.datetime.utcnow()
+        entry = {self.field: value, "info": info, "size": len(value.encode()), "created": now, "last_used": now}
+        if self.ttl is not None:
+            entry["expires"] = now + datetime.timedelta(seconds=self.ttl)
+        self.collection.replace_one({"_id": key}, entry, upsert=True)
+
+    def _evict(self):
+        totals = list(self.collection.aggregate([{"$group": {"_id": None, "total": {"$sum": "$size"}}}]))
+        total = totals[0]["total"] if totals else 0
+        evicted = []
+        if total > self.max_bytes:
+            for entry in self.collection.find({}, {"size": 1}).sort("last_used", 1):
+                if total <= self.max_bytes:
+                    break
+                evicted.append(entry["_id"])
+                total -= entry["size"]
+            self.collection.delete_many({"_id": {"$in": evicted}})
+        return len(evicted)
+
+
+def open_cache(prefix, directory, field, logger, max_bytes, ttl=None, backend=None):
+    """
+    The cache selected by <prefix>_CACHE_BACKEND ("disk", "mongo" or
+    "none"), or None if caching is off or unavailable. On disk it lives in
+    cache/<directory> and in MongoDB in the <field>_cache collection;
+    <prefix>_CACHE_DIR, _CACHE_MAX_BYTES and _CACHE_TTL override the
+    directory, max_bytes and ttl.
+    """
+    backend = backend or os.getenv(f'{prefix}_CACHE_BACKEND', 'disk')
+    max_bytes = int(os.getenv(f'{prefix}_CACHE_MAX_BYTES', str(max_bytes)))
+    ttl = os.getenv(f'{prefix}_CACHE_TTL', ttl)
+    ttl = float(ttl) if ttl is not None else None
+    try:
+        if backend == "disk":
+            directory = os.getenv(f'{prefix}_CACHE_DIR', os.path.join(CACHE_ROOT, directory))
+            return DiskCache(directory, field, logger, ttl, max_bytes)
+        if backend == "mongo":
+            return MongoCache(f"{field}_cache", field, logger, ttl, max_bytes)
+    except Exception as e:
+        logger.warning(f"{field.capitalize()} cache not available: {str(e)}")
+        return None
+    if backend != "none":
+        logger.warning(f"Unknown {field} cache backend: {backend}")
+    return None
@@ -1,9 +1,4 @@
 from typing import Dict
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.by import By
 import time
 from datetime import datetime
 import subprocess
@@ -11,7 +6,6 @@ import random
 import argparse
 import logging
 import signal
-from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
 load_dotenv()
@@ -31,16 +25,12 @@ TRANSCRIPTION_AVAILABLE = False
 
 # Try to import recording module
 try:
-    from record_meet import record_meet, start_recording
+    from record_meet import RecordingSession
     RECORDING_AVAILABLE = True
     logger.info("Recording functionality is available")
 except ImportError as e:
     logger.warning(f"Recording functionality not available: {str(e)}")
-    def record_meet():
-        logger.warning("Recording requested but functionality not available")
-        return None
-    def start_recording():
-        logger.warning("Recording functionality not available")
+    RecordingSession = None
 
 # Try to import transcription module
 try:
@@ -49,13 +39,187 @@ try:
     logger.info("Transcription functionality is available")
 except ImportError as e:
     logger.warning(f"Transcription functionality not available: {str(e)}")
-    def summarize_meet(audio_file):
+    def summarize_meet(audio_file, gcs_uri=None, transcript=None):
         logger.warning("Transcription requested but functionality not available")
         return "Transcription not available due to missing dependencies or credentials"
 
 # MongoDB connection for updating event status
 DB_URI = os.getenv('DB_URI')
 
+# Seconds between checks for whether the meeting is still going
+MEETING_CHECK_INTERVAL = 10
+
+# Safety stop: leave the call and stop recording after this many seconds,
+# whatever the page shows
+MEETING_MAX_DURATION = float(os.getenv('MEETING_MAX_DURATION', str(4 * 3600)))
+
+# Meet keeps the meeting URL once the call is over, so the end is read from
+# the page: these screens, or the Leave call control going away
+MEETING_ENDED_TEXTS = (
+    "You left the meeting",
+    "You've left the meeting",
+    "The call has ended",
+    "You've been removed from the meeting",
+    "No one responded to your request to join",
+    "Return to home screen",
+)
+LEAVE_CALL_SELECTOR = "button[aria-label='Leave call']"
+# Checks in a row without the Leave call control before the meeting counts as over
+LEAVE_CALL_MISSING_CHECKS = 2
+
+# Upload the recording to GCS while the meeting is still going, so
+# transcription can start as soon as it ends
+STREAMING_UPLOAD = os.getenv('STT_STREAMING_UPLOAD', '0') == '1'
+
+# Transcribe with streaming recognition during the meeting, so the
+# transcript is ready the moment it ends
+STREAMING_RECOGNITION = os.getenv('STT_STREAMING_RECOGNITION', '0') == '1'
+
+# Keep a running summary of the streaming transcript during the meeting,
+# so the final summary is one short call once it ends
+ROLLING_SUMMARY = os.getenv('SUMMARY_ROLLING', '0') == '1'
+
+# Record in segments of this many seconds and transcribe each one as soon
+# as it is finished, so only the last segment is left when the meeting
+# ends (0 records one file and transcribes it afterwards)
+SEGMENT_SECONDS = float(os.getenv('RECORDING_SEGMENT_SECONDS', '0'))
+
+# Start recognition and exit when the meeting ends; the scheduler picks up
+# the result and writes the summary (see check_transcriptions there)
+DETACHED_TRANSCRIPTION = os.getenv('STT_DETACHED_TRANSCRIPTION', '0') == '1'
+
+def start_streaming_upload(recording_path):
+    """Start uploading the raw PCM of a recording to GCS as it is captured"""
+    try:
+        from stt.stt import BUCKET_NAME
+        from stt.streaming_upload import StreamingGCSUpload
+        blob_name = os.path.splitext(os.path.basename(recording_path))[0] + ".raw"
+        return StreamingGCSUpload(BUCKET_NAME, blob_name).start()
+    except Exception as e:
+        logger.warning(f"Streaming upload not available, uploading after the meeting: {str(e)}")
+        return None
+
+def start_streaming_transcription(sample_rate):
+    """Start transcribing the recording as it is captured"""
+    try:
+        from stt.streaming import StreamingTranscriber
+        return StreamingTranscriber(sample_rate=sample_rate).start()
+    except Exception as e:
+        logger.warning(f"Streaming recognition not available, transcribing after the meeting: {str(e)}")
+        return None
+
+def start_segment_transcription():
+    """A callback for RecordingSession(on_segment=...) that transcribes each segment, or None"""
+    try:
+        from stt.segments import SegmentTranscriber
+        return SegmentTranscriber()
+    except Exception as e:
+        logger.warning(f"Segment transcription not available, recording one file: {str(e)}")
+        return None
+
+def start_detached_transcription(sound_file_path, gcs_uri, user_email, event_index):
+    """Start long-running recognition for the event; returns the operation name, or None"""
+    if not (user_email and event_index >= 0):
+        return None
+    try:
+        from stt.stt import start_transcription
+        record = start_transcription(sound_file_path, gcs_uri=gcs_uri,
+                                     event_id={"email": user_email, "event_index": event_index})
+    except Exception as e:
+        logger.warning(f"Detached transcription not available: {str(e)}")
+        return None
+    if isinstance(record, str):
+        logger.warning(f"Could not start detached transcription, transcribing here: {record}")
+        return None
+    return record["name"]
+
+def start_rolling_summary(transcriber):
+    """Summarise the transcriber's final results as they arrive; returns (summarizer, thread), or None"""
+    try:
+        from threading import Thread
+        from summarise.rolling import RollingSummarizer
+        summarizer = RollingSummarizer().start()
+        thread = Thread(target=summarizer.results_sink, args=(transcriber.results(),), daemon=True)
+        thread.start()
+        return summarizer, thread
+    except Exception as e:
+        logger.warning(f"Rolling summary not available, summarizing after the meeting: {str(e)}")
+        return None
+
+def finish_rolling_summary(rolling, on_chunk=None):
+    """The final summary from a rolling summary, or None if there is none"""
+    summarizer, thread = rolling
+    # The transcriber is closed, so its remaining results are on their way
+    thread.join()
+    try:
+        return summarizer.finish(on_chunk=on_chunk)
+    except Exception as e:
+        logger.error(f"Rolling summary failed, summarizing the transcript: {str(e)}")
+        return None
+
+def start_summary_stream(user_email, event_index):
+    """Start storing the event's summary as it is generated, for the dashboard; returns a SummaryStream, or None"""
+    try:
+        from summarise.stream import start_summary_stream as start_stream
+        return start_stream(user_email, event_index)
+    except Exception as e:
+        logger.warning(f"Summary streaming not available: {str(e)}")
+        return None
+
+def meeting_state(driver, By):
+    """
+    "ended" if Meet shows an end-of-call screen (or has left Meet), "in_call"
+    if the Leave call control is on the page, otherwise "unknown" (e.g.
+    still waiting to be let in). Raises if the browser is gone.
+    """
+    if "meet.google.com" not in driver.current_url:
+        return "ended"
+    page_text = driver.find_element(By.TAG_NAME, 'body').text
+    if any(text in page_text for text in MEETING_ENDED_TEXTS):
+        return "ended"
+    if driver.find_elements(By.CSS_SELECTOR, LEAVE_CALL_SELECTOR):
+        return "in_call"
+    return "unknown"
+
+def leave_meeting(driver, By):
+    """Click Leave call, if the bot is still in the call"""
+    try:
+        for button in driver.find_elements(By.CSS_SELECTOR, LEAVE_CALL_SELECTOR):
+            button.click()
+            logger.info("Left the meeting")
+            return
+    except Exception as e:
+        logger.warning(f"Could not leave the meeting: {str(e)}")
+
+def wait_for_meeting_end(driver, By):
+    """Block until the meeting is over for the bot, or MEETING_MAX_DURATION has passed"""
+    started = time.monotonic()
+    in_call_seen = False
+    missing_checks = 0
+    while True:
+        time.sleep(MEETING_CHECK_INTERVAL)
+        if time.monotonic() - started >= MEETING_MAX_DURATION:
+            logger.warning(f"Meeting still going after {MEETING_MAX_DURATION:.0f} s, leaving")
+            leave_meeting(driver, By)
+            return
+        try:
+            state = meeting_state(driver, By)
+        except Exception:
+            logger.info("Browser was closed or connection was lost")
+            return
+        if state == "ended":
+            logger.info("Meeting has ended or bot was removed from the meeting")
+            return
+        if state == "in_call":
+            in_call_seen = True
+            missing_checks = 0
+        elif in_call_seen:
+            # Only counts once the bot has been in the call, not while it waits to be let in
+            missing_checks += 1
+            if missing_checks >= LEAVE_CALL_MISSING_CHECKS:
+                logger.info("Leave call control is gone, the meeting has ended")
+                return
+
 def get_chrome_path():
     """Get the Chrome executable path"""
     # First try from environment variable
@@ -90,6 +254,8 @@ def update_event_status(email, event_index, status):
     """Update the event status in MongoDB"""
     if email and event_index >= 0:
         try:
+            from pymongo import MongoClient
+
             client = MongoClient(DB_URI)
             db = client.user
             users = db.users
@@ -114,6 +280,14 @@ def update_event_status(email, event_index, status):
 
 def join_meeting(meet_link, user_name, user_email=None, event_index=-1):
     """Join a meeting with the provided details"""
+    # Imported here rather than at the top: selenium and webdriver_manager
+    # are only needed once a meeting is joined, and slow down every import
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.common.by import By
+    from webdriver_manager.chrome import ChromeDriverManager
+
     try:
         logger.info(f"Joining meeting: {meet_link} as {user_name}")
         
@@ -189,21 +363,86 @@ def join_meeting(meet_link, user_name, user_email=None, event_index=-1):
         if user_email and event_index >= 0:
             update_event_status(user_email, event_index, "joined")
 
-        # Only attempt recording if the functionality is available
-        sound_file_path = None
+        # Start recording in the background while we watch the meeting
+        recording = None
+        uploader = None
+        transcriber = None
+        segments = None
+        rolling = None
         if RECORDING_AVAILABLE:
             try:
-                sound_file_path = record_meet()
-                logger.info(f"Recording saved to: {sound_file_path}")
+                if SEGMENT_SECONDS > 0 and TRANSCRIPTION_AVAILABLE and not STREAMING_RECOGNITION:
+                    segments = start_segment_transcription()
+                if segments is not None:
+                    recording = RecordingSession(segment_seconds=SEGMENT_SECONDS, on_segment=segments)
+                else:
+                    recording = RecordingSession()
+                if STREAMING_UPLOAD and TRANSCRIPTION_AVAILABLE:
+                    uploader = start_streaming_upload(recording.path)
+                    if uploader is not None:
+                        recording.sinks.append(uploader)
+                if STREAMING_RECOGNITION and TRANSCRIPTION_AVAILABLE:
+                    transcriber = start_streaming_transcription(recording.samplerate)
+                    if transcriber is not None:
+                        recording.sinks.append(transcriber)
+                        if ROLLING_SUMMARY:
+                            rolling = start_rolling_summary(transcriber)
+                recording.start()
             except Exception as e:
-                logger.error(f"Error recording meeting: {str(e)}")
+                logger.error(f"Error starting recording: {str(e)}")
+                recording = None
         else:
             logger.warning("Recording functionality not available, skipping recording")
 
+        # Keep the browser open until the meeting ends
+        wait_for_meeting_end(driver, By)
+
+        # Stop recording as soon as the meeting is over
+        sound_file_path = None
+        if recording is not None:
+            try:
+                sound_file_path = recording.stop()
+                logger.info(f"Recording saved to: {sound_file_path}")
+            except Exception as e:
+                logger.error(f"Error recording meeting: {str(e)}")
+        gcs_uri = None
+        if uploader is not None:
+            # Only the tail of the recording is still to be sent
+            gcs_uri = uploader.close()
+        transcript = None
+        if transcriber is not None:
+            transcript = transcriber.close()
+            if transcriber.error is not None:
+                # Fall back to transcribing the recording
+                transcript = None
+                rolling = None
+        if segments is not None and sound_file_path:
+            # Every segment but the last was transcribed during the meeting
+            transcript = segments.finish()
+
+        # Leave the recognition running and let the scheduler finish the summary
+        if DETACHED_TRANSCRIPTION and TRANSCRIPTION_AVAILABLE and sound_file_path and transcript is None:
+            operation_name = start_detached_transcription(sound_file_path, gcs_uri, user_email, event_index)
+            if operation_name:
+                logger.info(f"Transcription continues in operation {operation_name}, exiting")
+                update_event_status(user_email, event_index, "transcribing")
+                return True
+
         # Only attempt transcription if the functionality is available and recording succeeded
         if TRANSCRIPTION_AVAILABLE and sound_file_path:
             try:
-                summary = summarize_meet(sound_file_path)
+                stream = start_summary_stream(user_email, event_index)
+                summary = None
+                if rolling is not None and transcript:
+                    summary = finish_rolling_summary(rolling, on_chunk=stream.append if stream else None)
+                if summary is None:
+                    if stream:
+                        # The rolling summary may have streamed part of its answer before failing
+                        stream.reset()
+                    summary = summarize_meet(sound_file_path, gcs_uri=gcs_uri, transcript=transcript,
+                                             on_chunk=stream.append if stream else None)
+                if stream:
+                    stream.finish(summary)
                 with open("final_summ.txt", 'w+') as f:
                     f.write("Summary:\n" + summary)
                 logger.info("Meeting summary saved to final_summ.txt")
@@ -211,21 +450,7 @@ def join_meeting(meet_link, user_name, user_email=None, event_index=-1):
                 logger.error(f"Error creating meeting summary: {str(e)}")
         else:
             logger.warning("Transcription functionality not available or recording failed, skipping transcription")
-        
-        # Keep the browser open
-        meeting_ongoing = True
-        while meeting_ongoing:
-            time.sleep(60)  # Check every minute
-            try:
-                # Check if we're still in the meeting
-                current_url = driver.current_url
-                if "meet.google.com" not in current_url or "hangoutsmeet" not in current_url:
-                    meeting_ongoing = False
-                    logger.info("Meeting has ended or bot was removed from the meeting")
-            except:
-                meeting_ongoing = False
-                logger.info("Browser was closed or connection was lost")
-        
+
         # Update status to "completed" when the meeting ends
         if user_email and event_index >= 0:
             update_event_status(user_email, event_index, "completed")
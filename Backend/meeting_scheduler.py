@@ -7,6 +7,8 @@ from pymongo import MongoClient
 import subprocess
 from dotenv import load_dotenv
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 
 # Load environment variables
@@ -27,6 +29,14 @@ client = MongoClient(DB_URI)
 db = client.user
 users_collection = db.users
 
+# Summaries of finished transcriptions are written on this many worker
+# threads, so a slow model call never holds up the scheduling loop
+SUMMARY_WORKERS = int(os.getenv('SCHEDULER_SUMMARY_WORKERS', '2'))
+_summary_executor = None
+# Operations whose summary is queued or being written
+_summaries_in_progress = set()
+_summaries_lock = threading.Lock()
+
 # Path to your meeting joiner script
 MEETING_JOINER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'meeting_joiner.py')
 
@@ -99,7 +109,7 @@ def check_upcoming_meetings():
                     continue
 
                 # Skip events that are already joined or completed
-                if event.get('status') in ['joined', 'completed']:
+                if event.get('status') in ['joined', 'transcribing', 'completed']:
                     print(f"    Skipping: status is {event.get('status')}")
                     continue
 
@@ -155,6 +165,64 @@ def check_upcoming_meetings():
         logger.error(f"Error checking upcoming meetings: {str(e)}")
         print(f"Exception in check_upcoming_meetings: {str(e)}")
 
+def get_summary_executor():
+    """The pool summaries are written on, started on first use"""
+    global _summary_executor
+    with _summaries_lock:
+        if _summary_executor is None:
+            _summary_executor = ThreadPoolExecutor(SUMMARY_WORKERS, thread_name_prefix="summary")
+        return _summary_executor
+
+def deliver_transcription(record):
+    """Summarize a finished transcription and mark it delivered (runs on a summary worker)"""
+    try:
+        from stt.stt import operation_result, mark_delivered
+        from summarize_meet import summarize_meet
+        from summarise.stream import start_summary_stream
+
+        event_id = record['event_id']
+        stream = start_summary_stream(event_id['email'], event_id['event_index'])
+        summary = summarize_meet(record['file_path'], transcript=operation_result(record),
+                                 on_chunk=stream.append if stream else None)
+        if stream:
+            stream.finish(summary)
+        with open("final_summ.txt", 'w+') as f:
+            f.write("Summary:\n" + summary)
+        logger.info("Meeting summary saved to final_summ.txt")
+
+        users_collection.update_one(
+            {"email": event_id['email']},
+            {"$set": {f"events.{event_id['event_index']}.status": "completed"}}
+        )
+        mark_delivered(record['name'])
+    except Exception as e:
+        # Left undelivered, so the next check queues it again
+        logger.error(f"Error summarizing transcription {record['name']}: {str(e)}")
+    finally:
+        with _summaries_lock:
+            _summaries_in_progress.discard(record['name'])
+
+def check_transcriptions():
+    """Queue summaries of meetings whose transcription the joiner left running"""
+    try:
+        from stt.stt import poll_transcriptions
+        import summarize_meet, summarise.stream
+    except ImportError as e:
+        logger.warning(f"Cannot check transcriptions: {str(e)}")
+        return
+
+    try:
+        for record in poll_transcriptions():
+            with _summaries_lock:
+                if record['name'] in _summaries_in_progress:
+                    continue
+                _summaries_in_progress.add(record['name'])
+            event_id = record['event_id']
+            logger.info(f"Transcription {record['name']} finished for {event_id['email']}, event {event_id['event_index']}")
+            get_summary_executor().submit(deliver_transcription, record)
+    except Exception as e:
+        logger.error(f"Error checking transcriptions: {str(e)}")
+
 def run_scheduler():
     """Run the scheduler continuously"""
     logger.info("Meeting scheduler started")
@@ -163,6 +231,9 @@ def run_scheduler():
         try:
             # Check for upcoming meetings
             check_upcoming_meetings()
+
+            # Finish meetings whose transcription has come back
+            check_transcriptions()
             
             # Wait for 30 seconds before checking again
             time.sleep(30)
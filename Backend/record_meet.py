@@ -1,57 +1,656 @@
-from os import write
-import soundcard as sc
+import os
+import json
+import wave
 import numpy as np
 import datetime
-from threading import Thread
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+from queue import Queue
+from threading import Thread, Event
 import time
 
-def wait():
-    time.sleep(300)
-    raise KeyboardInterrupt
+from audio.resample import StreamingResampler
+from audio.sources import LoopbackSource
 
-# Configuration
-samplerate = 44100
+logger = logging.getLogger('record_meet')
+
+try:
+    from audio.flac import FlacStreamWriter, FLAC_AVAILABLE
+except ImportError:
+    FLAC_AVAILABLE = False
+
+# Configuration: capture at the device rate, save 16 kHz mono for speech recognition
+capture_samplerate = 48000
+samplerate = 16000
 channels = 1
-frames = []
 
-# Get default speaker (for name), then fetch it as a microphone with loopback
-default_speaker = sc.default_speaker()
-loopback_mic = sc.get_microphone(default_speaker.name, include_loopback=True)
+# Frames per capture call, and how many frames the capture ring buffer holds
+BLOCK_FRAMES = 1024
+RING_CAPACITY_FRAMES = BLOCK_FRAMES * 64
 
-def save_recording(frames):
-    audio_data = np.concatenate(frames, axis=0)
+# Capture in a child process (isolated from the GIL and blocking calls in
+# the bot) instead of a thread; set RECORDING_OUT_OF_PROCESS=0 to disable
+RECORDING_OUT_OF_PROCESS = os.getenv('RECORDING_OUT_OF_PROCESS', '1') == '1'
 
-    # 🔧 Convert float32 [-1, 1] to int16 [-32768, 32767]
-    audio_int16 = np.int16(audio_data * 32767)
+# File format for new recordings: "wav" or "flac"
+RECORDING_ENCODING = os.getenv('RECORDING_ENCODING', 'wav')
 
-    filename = f"system_audio_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
-    write(filename, samplerate, audio_int16)
+# Segmented recordings: how long a segment may run past its target length
+# while waiting for a pause, and what counts as a pause
+SEGMENT_MAX_EXTRA_SECONDS = 5
+SILENCE_WINDOW_MS = 30
+SILENCE_THRESHOLD_DB = -45
+
+
+def to_int16(block):
+    """Convert a float32 [-1, 1] block to int16 [-32768, 32767]"""
+    return np.int16(np.clip(block, -1.0, 1.0) * 32767)
+
+
+class WavStreamWriter:
+    """
+    Append 16-bit PCM blocks to an open WAV file as they are captured.
+
+    Frames are written without touching the header; the RIFF and data
+    chunk sizes are patched once when the writer is closed, so memory use
+    stays constant no matter how long the recording runs.
+    """
+
+    def __init__(self, filename, samplerate, channels):
+        self.filename = filename
+        self.samplerate = samplerate
+        self.channels = channels
+        self.frames_written = 0
+        self._wav = wave.open(filename, "wb")
+        self._wav.setnchannels(channels)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(samplerate)
+
+    def write(self, block):
+        """Write a float32 or int16 block of shape (frames, channels)"""
+        if block.dtype != np.int16:
+            block = to_int16(block)
+        self._wav.writeframesraw(np.ascontiguousarray(block).tobytes())
+        self.frames_written += len(block)
+
+    def close(self):
+        """Patch the WAV header with the final sizes and close the file"""
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+        return self.filename
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CaptureRingBuffer:
+    """
+    Fixed-capacity int16 ring buffer shared by the capture loop and a consumer.
+
+    The capture loop converts each block in place into the preallocated
+    sample array and advances the write cursor. A consumer calls peek() to
+    get views of the unread samples (no copy), processes them and then
+    calls advance(). If the consumer falls behind, incoming blocks are
+    dropped and counted rather than overwriting unread audio.
+
+    Cursors are stored as totals in a small int64 array (write, read,
+    dropped frames, overruns, frames lost by the source) so the buffer state can live in any memory
+    the caller provides, such as shared memory (see create_shared_ring).
+    """
+
+    WRITE, READ, DROPPED, OVERRUNS, SOURCE_LOST = 0, 1, 2, 3, 4
+    CURSORS = 5
+
+    def __init__(self, capacity_frames, channels, buffer=None, cursors=None):
+        self.capacity = capacity_frames
+        self.channels = channels
+        if buffer is None:
+            buffer = np.zeros((capacity_frames, channels), dtype=np.int16)
+        if cursors is None:
+            cursors = np.zeros(self.CURSORS, dtype=np.int64)
+        self._data = buffer
+        self._cursors = cursors
+        # Scratch space for the float -> int16 conversion, grown on demand
+        self._scratch = np.empty((0, channels), dtype=np.float32)
+
+    @property
+    def available(self):
+        """Number of frames written but not yet consumed"""
+        return int(self._cursors[self.WRITE] - self._cursors[self.READ])
+
+    @property
+    def free(self):
+        return self.capacity - self.available
+
+    @property
+    def dropped_frames(self):
+        return int(self._cursors[self.DROPPED])
+
+    @property
+    def overruns(self):
+        """Number of times a block was dropped because the buffer was full"""
+        return int(self._cursors[self.OVERRUNS])
+
+    @property
+    def source_lost_frames(self):
+        """Frames the audio source discarded before they reached the buffer"""
+        return int(self._cursors[self.SOURCE_LOST])
+
+    def set_source_lost_frames(self, frames):
+        self._cursors[self.SOURCE_LOST] = frames
+
+    @property
+    def frames_written(self):
+        return int(self._cursors[self.WRITE])
+
+    def write(self, block):
+        """
+        Copy a float32 or int16 block of shape (frames, channels) into the
+        buffer. Returns the number of frames stored (0 if it was dropped).
+        """
+        n = len(block)
+        if n > self.free:
+            self._cursors[self.DROPPED] += n
+            self._cursors[self.OVERRUNS] += 1
+            return 0
+
+        if block.dtype != np.int16:
+            if len(self._scratch) < n:
+                self._scratch = np.empty((n, self.channels), dtype=np.float32)
+            scratch = self._scratch[:n]
+            np.clip(block, -1.0, 1.0, out=scratch)
+            np.multiply(scratch, 32767, out=scratch)
+            block = scratch
+
+        start = int(self._cursors[self.WRITE] % self.capacity)
+        first = min(n, self.capacity - start)
+        np.copyto(self._data[start:start + first], block[:first], casting="unsafe")
+        if first < n:
+            np.copyto(self._data[:n - first], block[first:], casting="unsafe")
+
+        # Publish the frames only after they have been copied in
+        self._cursors[self.WRITE] += n
+        return n
+
+    def peek(self, max_frames=None):
+        """
+        Return views of the unread frames in order: one array, or two when
+        the unread region wraps around the end of the buffer.
+        """
+        n = self.available
+        if max_frames is not None:
+            n = min(n, max_frames)
+        if n == 0:
+            return ()
+        start = int(self._cursors[self.READ] % self.capacity)
+        first = min(n, self.capacity - start)
+        if first == n:
+            return (self._data[start:start + n],)
+        return (self._data[start:], self._data[:n - first])
+
+    def advance(self, frames):
+        """Mark frames returned by peek() as consumed"""
+        self._cursors[self.READ] += min(frames, self.available)
+
+    def drain(self, consumer, max_frames=None):
+        """Pass each unread view to consumer, then consume them"""
+        total = 0
+        for view in self.peek(max_frames):
+            consumer(view)
+            total += len(view)
+        self.advance(total)
+        return total
+
+
+def _shared_ring(shm, capacity_frames, channels):
+    cursor_bytes = CaptureRingBuffer.CURSORS * 8
+    cursors = np.ndarray(CaptureRingBuffer.CURSORS, dtype=np.int64, buffer=shm.buf)
+    buffer = np.ndarray((capacity_frames, channels), dtype=np.int16, buffer=shm.buf, offset=cursor_bytes)
+    return CaptureRingBuffer(capacity_frames, channels, buffer=buffer, cursors=cursors)
+
+
+def create_shared_ring(capacity_frames, channels):
+    """
+    Create a CaptureRingBuffer in a new shared memory block. Returns
+    (shm, ring); the caller must shm.close() and shm.unlink() when done.
+    """
+    size = CaptureRingBuffer.CURSORS * 8 + capacity_frames * channels * 2
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    shm.buf[:size] = bytes(size)
+    return shm, _shared_ring(shm, capacity_frames, channels)
+
+
+def attach_shared_ring(name, capacity_frames, channels):
+    """Open a ring buffer created by create_shared_ring in another process"""
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, _shared_ring(shm, capacity_frames, channels)
+
+
+def capture_audio(source, ring, stop_event, data_ready, samplerate, channels):
+    """
+    Capture loop: read blocks from source, downmix and resample them to the
+    output format and store them in ring until stop_event is set or the
+    source ends. data_ready is set whenever the ring is half full.
+    """
+    def store(data):
+        # Sources that are not real time wait for the writer instead of dropping audio
+        if not source.realtime:
+            while ring.free < len(data) and not stop_event.is_set():
+                data_ready.set()
+                time.sleep(0.001)
+        ring.write(data)
+        if ring.available >= ring.capacity // 2:
+            data_ready.set()
+
+    resampler = None
+    if source.samplerate != samplerate:
+        resampler = StreamingResampler(source.samplerate, samplerate, channels)
+    try:
+        with source:
+            while not stop_event.is_set():
+                data = source.read(BLOCK_FRAMES)
+                if source.lost_frames:
+                    ring.set_source_lost_frames(source.lost_frames)
+                if len(data) == 0:
+                    logger.info(f"Audio source ended: {source.describe()}")
+                    break
+                if channels == 1 and data.shape[1] != 1:
+                    data = data.mean(axis=1, keepdims=True)
+                if resampler is not None:
+                    data = resampler.process(data)
+                store(data)
+        if resampler is not None:
+            store(resampler.flush())
+    finally:
+        data_ready.set()
+
+
+def _capture_process(shm_name, capacity_frames, source, stop_event, data_ready, samplerate, channels):
+    """Entry point of the capture child process"""
+    shm, ring = attach_shared_ring(shm_name, capacity_frames, channels)
+    try:
+        capture_audio(source, ring, stop_event, data_ready, samplerate, channels)
+    except Exception as e:
+        logger.error(f"Error capturing audio: {str(e)}")
+        raise SystemExit(1)
+    finally:
+        del ring
+        shm.close()
 
-    print(f"Saved to: {filename}")
-    return filename
 
+def open_writer(path, samplerate, channels, encoding="wav"):
+    """Open a streaming writer for the given file format"""
+    if encoding == "flac":
+        return FlacStreamWriter(path, samplerate, channels)
+    return WavStreamWriter(path, samplerate, channels)
 
-def record_meet():
-    Thread(target=wait).start()
-    print(f"Loopback recording from: {default_speaker.name}")
+
+class SegmentedWriter:
+    """
+    Write a recording as a series of files of roughly segment_seconds each.
+
+    Once a segment reaches its target length it is closed at the next pause
+    in the audio (or after SEGMENT_MAX_EXTRA_SECONDS if nobody stops
+    talking). manifest.json in the output directory lists the finished
+    segments in order and is rewritten after each one, and on_segment is
+    called with each segment's manifest entry from a separate thread so a
+    slow callback never holds up the recording.
+    """
+
+    def __init__(self, directory, samplerate, channels, encoding="wav",
+                 segment_seconds=60, on_segment=None,
+                 max_extra_seconds=SEGMENT_MAX_EXTRA_SECONDS):
+        self.directory = directory
+        self.samplerate = samplerate
+        self.channels = channels
+        self.encoding = encoding
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.segments = []
+        self.frames_written = 0
+        self._segment_frames = int(segment_seconds * samplerate)
+        self._max_segment_frames = int((segment_seconds + max_extra_seconds) * samplerate)
+        self._window = max(1, int(samplerate * SILENCE_WINDOW_MS / 1000))
+        self._threshold = (10 ** (SILENCE_THRESHOLD_DB / 20) * 32768) ** 2
+        self._on_segment = on_segment
+        self._notifications = None
+
+        os.makedirs(directory, exist_ok=True)
+        if on_segment is not None:
+            self._notifications = Queue()
+            self._notifier = Thread(target=self._notify, name="record-segments", daemon=True)
+            self._notifier.start()
+        self._writer = self._open_segment()
+        self._write_manifest(complete=False)
+
+    def write(self, block):
+        """Write an int16 block, starting new segments at pauses as needed"""
+        if block.dtype != np.int16:
+            block = to_int16(block)
+        pos = 0
+        while pos < len(block):
+            written = self._writer.frames_written
+            remaining = len(block) - pos
+            if written + remaining < self._segment_frames:
+                self._write(block[pos:])
+                return
+
+            # Look for a pause between the target length and the hard limit
+            due = pos + max(0, self._segment_frames - written)
+            limit = pos + self._max_segment_frames - written
+            cut = self._find_pause(block, due, min(limit, len(block)))
+            if cut is None:
+                if limit > len(block):
+                    self._write(block[pos:])
+                    return
+                cut = limit
+
+            self._write(block[pos:cut])
+            self._finish_segment()
+            self._writer = self._open_segment()
+            pos = cut
+
+    def close(self):
+        """Finish the last segment and mark the manifest complete"""
+        if self._writer is not None:
+            if self._writer.frames_written:
+                self._finish_segment()
+            else:
+                self._writer.close()
+                os.remove(self._writer.filename)
+            self._writer = None
+            self._write_manifest(complete=True)
+            if self._notifications is not None:
+                self._notifications.put(None)
+                self._notifier.join()
+        return self.manifest_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _write(self, block):
+        self._writer.write(block)
+        self.frames_written += len(block)
+
+    def _find_pause(self, block, start, end):
+        """Index of the first quiet window in block[start:end], or None"""
+        n = (end - start) // self._window
+        if n <= 0:
+            return None
+        windows = block[start:start + n * self._window].reshape(n, -1).astype(np.float32)
+        quiet = np.flatnonzero(np.mean(windows * windows, axis=1) < self._threshold)
+        if len(quiet) == 0:
+            return None
+        return start + quiet[0] * self._window + self._window // 2
+
+    def _open_segment(self):
+        name = f"segment_{len(self.segments):04d}.{self.encoding}"
+        return open_writer(os.path.join(self.directory, name), self.samplerate, self.channels, self.encoding)
+
+    def _finish_segment(self):
+        self._writer.close()
+        start = sum(segment["frames"] for segment in self.segments)
+        segment = {
+            "index": len(self.segments),
+            "path": os.path.basename(self._writer.filename),
+            "frames": self._writer.frames_written,
+            "start": start / self.samplerate,
+            "duration": self._writer.frames_written / self.samplerate,
+        }
+        self.segments.append(segment)
+        self._write_manifest(complete=False)
+        logger.info(f"Finished segment {segment['index']}: {segment['duration']:.1f} s")
+        if self._notifications is not None:
+            self._notifications.put(dict(segment, path=self._writer.filename))
+
+    def _write_manifest(self, complete):
+        manifest = {
+            "samplerate": self.samplerate,
+            "channels": self.channels,
+            "encoding": self.encoding,
+            "complete": complete,
+            "segments": self.segments,
+        }
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _notify(self):
+        while True:
+            segment = self._notifications.get()
+            if segment is None:
+                return
+            try:
+                self._on_segment(segment)
+            except Exception as e:
+                logger.error(f"Error in segment callback: {str(e)}")
+
+
+class RecordingSession:
+    """
+    Non-blocking loopback recording.
+
+    start() begins capturing on a background thread, which downmixes and
+    resamples each block to the output format and stores it in a ring
+    buffer, while a second thread streams the buffered audio to a WAV or
+    FLAC file. stop() finishes the file and returns its path, so the caller
+    decides exactly when the recording ends.
+
+    By default capture runs in a child process that writes into a shared
+    memory ring buffer, so a busy or blocked parent (Selenium polling,
+    synchronous API calls) cannot cause dropped audio; dropped_frames,
+    overruns and source_lost_frames report any losses. out_of_process=False captures on a thread.
+
+    Audio comes from the system loopback device unless another AudioSource
+    (audio.sources) is given, e.g. a WAV replay or synthetic signal for
+    offline runs; capture_samplerate is then taken from the source.
+
+    With segment_seconds set, the recording is written as a directory of
+    segments plus a manifest (see SegmentedWriter) instead of one file,
+    on_segment is called as each segment is finished, and stop() returns
+    the manifest path.
+
+    sinks are extra consumers (e.g. stt.streaming_upload.StreamingGCSUpload)
+    whose write() is called from the writer thread with every int16 block
+    as it is saved. The caller starts them before start() and closes them
+    after stop().
+    """
+
+    def __init__(self, path=None, samplerate=samplerate, channels=channels,
+                 capture_samplerate=capture_samplerate, flush_interval=0.5, encoding=None,
+                 segment_seconds=None, on_segment=None, source=None, out_of_process=None,
+                 sinks=None):
+        if encoding is None:
+            encoding = RECORDING_ENCODING
+        if encoding not in ("wav", "flac"):
+            raise ValueError(f"Unsupported recording encoding: {encoding}")
+        if encoding == "flac" and not FLAC_AVAILABLE:
+            logger.warning("FLAC encoding not available, recording WAV instead")
+            encoding = "wav"
+        if path is None:
+            name = f"system_audio_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            if segment_seconds is None:
+                name += f".{encoding}"
+            path = os.path.join("Recordings", name)
+        self.path = path
+        self.segment_seconds = segment_seconds
+        self.on_segment = on_segment
+        self.encoding = encoding
+        self.samplerate = samplerate
+        self.channels = channels
+        if source is None:
+            source = LoopbackSource(capture_samplerate)
+        self.source = source
+        self.capture_samplerate = source.samplerate
+        if out_of_process is None:
+            out_of_process = RECORDING_OUT_OF_PROCESS
+        self.out_of_process = out_of_process
+        self.flush_interval = flush_interval
+        self.sinks = list(sinks or [])
+        self.error = None
+        self._ring = None
+        self._shm = None
+        self._writer = None
+        self._stop_event = None
+        self._data_ready = None
+        self._capture_thread = None
+        self._writer_thread = None
+        # Counters are kept after stop(), when the shared ring is released
+        self._dropped_frames = 0
+        self._overruns = 0
+        self._source_lost_frames = 0
+
+    @property
+    def is_running(self):
+        return self._capture_thread is not None and self._capture_thread.is_alive()
+
+    @property
+    def dropped_frames(self):
+        return self._ring.dropped_frames if self._ring is not None else self._dropped_frames
+
+    @property
+    def overruns(self):
+        return self._ring.overruns if self._ring is not None else self._overruns
+
+    @property
+    def source_lost_frames(self):
+        """Capture-rate frames the source lost because capture fell behind"""
+        return self._ring.source_lost_frames if self._ring is not None else self._source_lost_frames
+
+    def start(self):
+        """Start capturing in the background and return immediately"""
+        if self._capture_thread is not None:
+            raise RuntimeError("Recording session already started")
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if self.segment_seconds:
+            self._writer = SegmentedWriter(
+                self.path, self.samplerate, self.channels, self.encoding,
+                segment_seconds=self.segment_seconds, on_segment=self.on_segment
+            )
+        else:
+            self._writer = open_writer(self.path, self.samplerate, self.channels, self.encoding)
+
+        if self.out_of_process:
+            context = multiprocessing.get_context("spawn")
+            self._stop_event = context.Event()
+            self._data_ready = context.Event()
+            self._shm, self._ring = create_shared_ring(RING_CAPACITY_FRAMES, self.channels)
+            self._capture_thread = context.Process(
+                target=_capture_process,
+                args=(self._shm.name, RING_CAPACITY_FRAMES, self.source, self._stop_event,
+                      self._data_ready, self.samplerate, self.channels),
+                name="record-capture",
+                daemon=True,
+            )
+        else:
+            self._stop_event = Event()
+            self._data_ready = Event()
+            self._ring = CaptureRingBuffer(RING_CAPACITY_FRAMES, self.channels)
+            self._capture_thread = Thread(target=self._capture, name="record-capture", daemon=True)
+        self._writer_thread = Thread(target=self._write, name="record-writer", daemon=True)
+        self._capture_thread.start()
+        self._writer_thread.start()
+        logger.info(f"Recording started: {self.path}")
+        return self
+
+    def stop(self):
+        """Stop capturing, flush the remaining audio and return the file path"""
+        if self._capture_thread is None:
+            return None
+
+        self._stop_event.set()
+        self._capture_thread.join()
+        self._writer_thread.join()
+
+        self._dropped_frames = self._ring.dropped_frames
+        self._overruns = self._ring.overruns
+        self._source_lost_frames = self._ring.source_lost_frames
+        if self._shm is not None:
+            if self._capture_thread.exitcode:
+                self.error = f"capture process exited with code {self._capture_thread.exitcode}"
+            self._ring = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+        if self._writer.frames_written == 0:
+            logger.error(f"Recording failed, no audio captured: {self.error}")
+            return None
+
+        if self.dropped_frames:
+            logger.warning(f"Dropped {self.dropped_frames} frames in {self.overruns} overruns during recording")
+        if self.source_lost_frames:
+            logger.warning(f"Audio source lost {self.source_lost_frames} frames during recording")
+        path = self._writer.manifest_path if self.segment_seconds else self.path
+        logger.info(f"Recording saved to: {path}")
+        return path
+
+    def _capture(self):
+        try:
+            capture_audio(self.source, self._ring, self._stop_event, self._data_ready,
+                          self.samplerate, self.channels)
+        except Exception as e:
+            self.error = e
+            logger.error(f"Error capturing audio: {str(e)}")
+
+    def _write(self):
+        try:
+            while self._capture_thread.is_alive():
+                self._data_ready.wait(self.flush_interval)
+                self._data_ready.clear()
+                self._ring.drain(self._save)
+            # Capture has stopped writing by now; flush what is left
+            self._ring.drain(self._save)
+        finally:
+            self._writer.close()
+
+    def _save(self, block):
+        self._writer.write(block)
+        for sink in self.sinks:
+            try:
+                sink.write(block)
+            except Exception as e:
+                logger.error(f"Error in recording sink {type(sink).__name__}: {str(e)}")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def record_meet(max_duration=None, segment_seconds=None, on_segment=None, source=None):
+    """
+    Record the system audio loopback (or another source) until interrupted
+    (Ctrl+C), until max_duration seconds have passed or until the source
+    ends, and return the saved file path (the manifest path when recording
+    in segments of segment_seconds).
+    """
+    session = RecordingSession(segment_seconds=segment_seconds, on_segment=on_segment, source=source)
+    print(f"Recording from: {session.source.describe()}")
     print("Press Ctrl+C to stop recording.\n")
+    session.start()
+    started = time.monotonic()
     try:
-        # Create Recordings directory if it doesn't exist
-        os.makedirs("Recordings", exist_ok=True)
-        
-        filename = rf"Recordings/system_audio_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
-        
-        # Get default speakers
-        speakers = sc.default_speaker()
-        if not speakers:
-            raise Exception("No default speakers found")
-        
-        # Record audio
-        with speakers.recorder(samplerate=48000) as mic:
-            while True:
-                data = mic.record(numframes=1024)
-                frames.append(data)
+        while session.is_running:
+            if max_duration is not None and time.monotonic() - started >= max_duration:
+                break
+            time.sleep(0.5)
     except KeyboardInterrupt:
-        print("\n[INFO] Stopped. Saving file...")
-
-        return save_recording(frames)
\ No newline at end of file
+        pass
+    print("\n[INFO] Stopped. Saving file...")
+    filename = session.stop()
+    print(f"Saved to: {filename}")
+    return filename
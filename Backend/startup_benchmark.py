@@ -0,0 +1,73 @@
+"""
+Import time of the meeting joiner, the scheduler and the Django app,
+measured with python -X importtime in fresh interpreters.
+
+Usage: python startup_benchmark.py [runs] [top]
+
+Each target is imported `runs` times (default 5) in a new process, from a
+temporary directory so that the log files they open land there. The median
+total is printed with the `top` (default 8) slowest packages of the median
+run, by the time spent importing each package's own modules.
+"""
+import os
+import sys
+import tempfile
+import subprocess
+import statistics
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TARGETS = {
+    "joiner": "import meeting_joiner",
+    "scheduler": "import meeting_scheduler",
+    "django": "import django; django.setup(); import backend.urls",
+}
+
+
+def import_times(code, cwd):
+    """(total us, {package: self us summed over its modules}) from one python -X importtime run"""
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, DJANGO_SETTINGS_MODULE="backend.settings")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=cwd, env=env, capture_output=True, text=True)
+    lines = result.stderr.splitlines()
+    if result.returncode != 0:
+        errors = [line for line in lines if not line.startswith("import time:")]
+        raise RuntimeError(errors[-1] if errors else f"exit status {result.returncode}")
+
+    total = 0
+    packages = {}
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented; only top-level ones add up to the total
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(own)
+    return total, packages
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    with tempfile.TemporaryDirectory() as cwd:
+        for target, code in TARGETS.items():
+            try:
+                samples = [import_times(code, cwd) for _ in range(runs)]
+            except RuntimeError as e:
+                print(f"{target}: import failed: {e}\n")
+                continue
+            totals = [total for total, _ in samples]
+            median = statistics.median(totals)
+            _, packages = min(samples, key=lambda sample: abs(sample[0] - median))
+
+            print(f"{target}: {median / 1e6:.2f} s (min {min(totals) / 1e6:.2f} s, max {max(totals) / 1e6:.2f} s)")
+            for package, own in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+                print(f"    {own / 1e3:>8.1f} ms  {package}")
+            print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import wave
+import random
+import asyncio
+import logging
+from threading import Lock
+
+logger = logging.getLogger('stt')
+
+# ai-api loads this file by path for the stub, so stt.* is only imported
+# where a structured transcript is made
+
+# Settings for the stub backend (STT_BACKEND=stub)
+STUB_SCRIPT = os.getenv('STT_STUB_SCRIPT')
+STUB_LATENCY = float(os.getenv('STT_STUB_LATENCY', '0'))
+STUB_FAILURE_RATE = float(os.getenv('STT_STUB_FAILURE_RATE', '0'))
+STUB_SEED = os.getenv('STT_STUB_SEED')
+
+DEFAULT_SCRIPT = [
+    "Hello everyone, welcome to the Dialogon weekly meeting. "
+    "The speech to text module is done and the frontend design is in review. "
+    "Next sprint starts on Monday.",
+]
+
+
+class STTBackend:
+    """
+    Something that turns an audio file into a transcript.
+
+    transcribe() returns the transcript text (a stt.transcript.Transcript
+    with word timings if structured is true), or a string starting with
+    "Transcription failed" (like stt.transcribe_audio) instead of raising.
+    name is part of the transcript cache key, so transcripts from different
+    backends never mix.
+    """
+
+    name = None
+
+    def available(self):
+        """Whether the backend can be used (dependencies and credentials present)"""
+        return True
+
+    def transcribe(self, file_path, gcs_uri=None, mode=None, structured=False):
+        raise NotImplementedError
+
+    async def transcribe_async(self, file_path, gcs_uri=None, mode=None, structured=False):
+        return await asyncio.to_thread(self.transcribe, file_path, gcs_uri, mode, structured)
+
+
+class StubSTTBackend(STTBackend):
+    """
+    Offline stand-in that returns scripted transcripts.
+
+    script is a list of transcripts handed out in turn, or a dict from
+    audio file name to transcript (falling back to the list under "*", or
+    the default script). Every call takes `latency` seconds, and fails with
+    probability `failure_rate`; pass a seed for a repeatable sequence.
+    """
+
+    name = "stub"
+
+    def __init__(self, script=None, latency=0.0, failure_rate=0.0, seed=None):
+        if script is None:
+            script = DEFAULT_SCRIPT
+        self.script = script
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = Lock()
+
+    @classmethod
+    def from_env(cls):
+        script = None
+        if STUB_SCRIPT:
+            with open(STUB_SCRIPT, encoding="utf-8") as f:
+                script = json.load(f)
+        seed = int(STUB_SEED) if STUB_SEED is not None else None
+        return cls(script, STUB_LATENCY, STUB_FAILURE_RATE, seed)
+
+    def _next(self, file_path):
+        """Decide this call's outcome; returns (failed, transcript)"""
+        with self._lock:
+            index = self.calls
+            self.calls += 1
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+
+        script = self.script
+        if isinstance(script, dict):
+            name = os.path.basename(file_path)
+            if name in script:
+                return failed, script[name]
+            script = script.get("*", DEFAULT_SCRIPT)
+        return failed, script[index % len(script)]
+
+    def _result(self, file_path, failed, transcript, structured):
+        if failed:
+            return "Transcription failed: stub backend failure"
+        if structured:
+            from stt.transcript import Transcript
+
+            # Spread the words over the recording
+            return Transcript.from_text(transcript, 0.0, _duration(file_path))
+        return transcript
+
+    def transcribe(self, file_path, gcs_uri=None, mode=None, structured=False):
+        failed, transcript = self._next(file_path)
+        time.sleep(self.latency)
+        return self._result(file_path, failed, transcript, structured)
+
+    async def transcribe_async(self, file_path, gcs_uri=None, mode=None, structured=False):
+        failed, transcript = self._next(file_path)
+        await asyncio.sleep(self.latency)
+        return self._result(file_path, failed, transcript, structured)
+
+
+def _duration(file_path):
+    """Length of a WAV file in seconds, or None for anything else"""
+    try:
+        with wave.open(file_path, "rb") as wf:
+            return wf.getnframes() / wf.getframerate()
+    except Exception:
+        return None
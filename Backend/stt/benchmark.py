@@ -0,0 +1,219 @@
+"""
+Benchmarks for the transcription pipeline, using stub recognizers in place
+of the Speech API so they run offline.
+
+Usage: python stt/benchmark.py [minutes] [latency] [meetings]
+
+latency is the stub's fixed cost per request in seconds; on top of that it
+takes STUB_SECONDS_PER_AUDIO_SECOND for every second of audio. meetings is
+how many short recordings are transcribed at once in the concurrency test.
+"""
+import os
+import sys
+import time
+import wave
+import asyncio
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Run from Backend so that "stt" is the package, not stt/stt.py next to this script
+sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from audio.synthetic import synthetic_meeting_audio
+from audio.sources import SyntheticSource
+from stt.chunked import transcribe_chunked
+from stt.backends import StubSTTBackend
+
+SAMPLE_RATE = 16000
+# Roughly what long_running_recognize manages: a minute of audio in ~2 s
+STUB_SECONDS_PER_AUDIO_SECOND = 0.03
+
+
+def write_wav(path, audio, sample_rate):
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(np.int16(np.clip(audio, -1, 1) * 32767).tobytes())
+
+
+def stub_recognizer(latency):
+    def recognize(pcm):
+        seconds = len(pcm) / 2 / SAMPLE_RATE
+        time.sleep(latency + seconds * STUB_SECONDS_PER_AUDIO_SECOND)
+        return f"[{seconds:.0f} s]"
+    return recognize
+
+
+def bench_chunked(path, duration, latency):
+    print(f"Chunked transcription (stub: {latency:.1f} s + {STUB_SECONDS_PER_AUDIO_SECOND * 60:.1f} s per minute)")
+    serial = latency + duration * STUB_SECONDS_PER_AUDIO_SECOND
+    print(f"  one request:        {serial:.1f} s (estimated)")
+
+    for workers in (1, 4, 8, 16):
+        start = time.perf_counter()
+        _, chunks = transcribe_chunked(path, recognizer=stub_recognizer(latency), max_workers=workers)
+        elapsed = time.perf_counter() - start
+        print(f"  {workers:2d} workers:         {elapsed:.1f} s for {len(chunks)} chunks "
+              f"({serial / elapsed:.1f}x)")
+
+
+class _StubResponse:
+    def __init__(self, text):
+        result = type("Result", (), {"alternatives": [type("Alternative", (), {"transcript": text})()]})()
+        self.results = [result]
+
+
+class _StubOperation:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def result(self, timeout=None):
+        time.sleep(self.latency)
+        return _StubResponse("stub transcript")
+
+
+class _StubAsyncOperation(_StubOperation):
+    async def result(self, timeout=None):
+        await asyncio.sleep(self.latency)
+        return _StubResponse("stub transcript")
+
+
+class StubSpeechClient:
+    """Stands in for speech.SpeechClient: every operation takes `latency` seconds"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def long_running_recognize(self, config, audio):
+        return _StubOperation(self.latency)
+
+
+class StubAsyncSpeechClient(StubSpeechClient):
+    async def long_running_recognize(self, config, audio):
+        return _StubAsyncOperation(self.latency)
+
+
+class _ThreadCounter:
+    """Sample the number of live threads in the background and keep the peak"""
+
+    def __enter__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(0.01):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _stub_google_api(latency):
+    """Keep the Google backend's own processing but swap its clients, credentials check, cache and GCS for stubs"""
+    import stt.stt as stt_module
+    from stt.upload import AudioUploader
+
+    stt_module.set_backend(stt_module.GoogleSTTBackend())
+    stt_module.check_google_cloud = lambda: True
+    stt_module.get_transcript_cache = lambda: None
+    stt_module.uploader = AudioUploader("stub-bucket", inline_max_bytes=1 << 40)
+    stt_module.get_speech_client = lambda: StubSpeechClient(latency)
+    stt_module.get_async_speech_client = lambda: StubAsyncSpeechClient(latency)
+    return stt_module
+
+
+def bench_concurrent(paths, latency):
+    """Many meetings at once: a thread per job versus one event loop"""
+    stt_module = _stub_google_api(latency)
+
+    print(f"Concurrent transcription of {len(paths)} meetings (stub: {latency:.1f} s per operation)")
+
+    with _ThreadCounter() as threads:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(paths)) as pool:
+            list(pool.map(stt_module.transcribe_audio, paths))
+        elapsed = time.perf_counter() - start
+    print(f"  thread per job:     {elapsed:.1f} s, {threads.peak} threads at peak")
+
+    async def run_all():
+        return await asyncio.gather(*(stt_module.transcribe_audio_async(path) for path in paths))
+
+    with _ThreadCounter() as threads:
+        start = time.perf_counter()
+        asyncio.run(run_all())
+        elapsed = time.perf_counter() - start
+    print(f"  asyncio:            {elapsed:.1f} s, {threads.peak} threads at peak")
+
+
+def bench_pipeline(minutes, latency, workdir):
+    """
+    record -> transcribe -> summarize with the stub STT backend, to separate
+    our own overhead from the vendor's latency
+    """
+    import stt.stt as stt_module
+    import summarize_meet as summarize_module
+    from record_meet import RecordingSession
+
+    stt_module.get_transcript_cache = lambda: None
+    summarize_module.summarize_transcript = lambda transcript: transcript
+
+    print(f"Pipeline on {minutes:.0f} min of synthetic audio")
+    runs = [("stub backend", 0.0), ("stub backend", latency), ("google, stub API", latency)]
+    for name, stub_latency in runs:
+        if name == "stub backend":
+            stt_module.set_backend(StubSTTBackend(latency=stub_latency))
+        else:
+            # Includes our downmix, VAD trimming and encoding before the request
+            _stub_google_api(stub_latency)
+
+        start = time.perf_counter()
+        session = RecordingSession(path=os.path.join(workdir, "pipeline.wav"),
+                                   source=SyntheticSource(minutes * 60, speed=0), out_of_process=False)
+        session.start()
+        while session.is_running:
+            time.sleep(0.01)
+        path = session.stop()
+        recorded = time.perf_counter()
+        summary = summarize_module.summarize_meet(path)
+        done = time.perf_counter()
+
+        if summary.startswith("Summary unavailable"):
+            print(f"  failed: {summary}")
+            return
+        overhead = done - recorded - stub_latency
+        print(f"  {name}, {stub_latency:4.1f} s latency:  record {recorded - start:.1f} s, "
+              f"transcribe + summarize {done - recorded:.1f} s (our overhead {overhead:.2f} s)")
+
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 30
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    meetings = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    audio, _ = synthetic_meeting_audio(minutes * 60, SAMPLE_RATE)
+    print(f"Synthetic meeting: {minutes:.0f} min at {SAMPLE_RATE} Hz\n")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "meeting.wav")
+        write_wav(path, audio, SAMPLE_RATE)
+        bench_chunked(path, len(audio) / SAMPLE_RATE, latency)
+        print()
+
+        paths = []
+        for i in range(meetings):
+            clip, _ = synthetic_meeting_audio(30, SAMPLE_RATE, seed=i)
+            paths.append(os.path.join(workdir, f"clip_{i}.wav"))
+            write_wav(paths[-1], clip, SAMPLE_RATE)
+        bench_concurrent(paths, latency * 10)
+        print()
+        bench_pipeline(min(minutes, 10), latency * 10, workdir)
+
+
+if __name__ == "__main__":
+    main()
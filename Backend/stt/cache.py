@@ -0,0 +1,25 @@
+import json
+import hashlib
+import logging
+
+from keyed_cache import open_cache
+
+logger = logging.getLogger('stt')
+
+# Least recently used transcripts are evicted beyond this total size (STT_CACHE_MAX_BYTES)
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def cache_key(file_path, config, block_size=1024 * 1024):
+    """SHA-256 of the audio bytes and the recognition config that produced the transcript"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    digest.update(json.dumps(config, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def open_transcript_cache(backend=None):
+    """The cache selected by STT_CACHE_BACKEND (see keyed_cache.open_cache), or None if caching is off or unavailable"""
+    return open_cache("STT", "transcripts", "transcript", logger, CACHE_MAX_BYTES, backend=backend)
@@ -0,0 +1,223 @@
+import os
+import time
+import asyncio
+import wave
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from audio.vad import detect_speech, detect_speech_in_wav
+from stt.transcript import Transcript
+
+logger = logging.getLogger('stt')
+
+# Synchronous recognize accepts at most 60 s of inline audio per request
+MAX_CHUNK_SECONDS = 55
+# Don't cut chunks shorter than this just to land on a pause
+MIN_CHUNK_SECONDS = 20
+# Recognition requests in flight at once
+MAX_WORKERS = int(os.getenv('STT_MAX_WORKERS', '8'))
+# Attempts per chunk before the whole transcription fails
+CHUNK_ATTEMPTS = 3
+
+
+def split_at_silence(samples, sample_rate, max_seconds=MAX_CHUNK_SECONDS, min_seconds=MIN_CHUNK_SECONDS):
+    """
+    Split mono audio into chunks of at most max_seconds, cutting in the
+    middle of the longest pause in each window. Returns a list of
+    (start, end) sample indices; stretches without any speech are left out.
+    """
+    return _split_speech(detect_speech(samples, sample_rate), sample_rate, max_seconds, min_seconds)
+
+
+def split_wav_at_silence(file_path, max_seconds=MAX_CHUNK_SECONDS, min_seconds=MIN_CHUNK_SECONDS):
+    """
+    split_at_silence for a 16-bit WAV file, which is read a block at a time
+    (see audio.vad.detect_speech_in_wav) instead of being loaded whole.
+    Returns (chunks, sample_rate).
+    """
+    speech, sample_rate, _ = detect_speech_in_wav(file_path)
+    return _split_speech(speech, sample_rate, max_seconds, min_seconds), sample_rate
+
+
+def _split_speech(speech, sample_rate, max_seconds, min_seconds):
+    """Chunk bounds from (start, end) speech segments"""
+    if not len(speech):
+        return []
+
+    max_len = int(max_seconds * sample_rate)
+    min_len = int(min_seconds * sample_rate)
+    # Pauses between speech segments, as (start, end) sample indices
+    gaps = np.stack([speech[:-1, 1], speech[1:, 0]], axis=1)
+
+    chunks = []
+    start = int(speech[0, 0])
+    last_end = int(speech[-1, 1])
+    while last_end - start > max_len:
+        limit = start + max_len
+        mids = (gaps[:, 0] + gaps[:, 1]) // 2
+        candidates = np.nonzero((mids > start + min_len) & (mids <= limit))[0]
+        if len(candidates):
+            widths = gaps[candidates, 1] - gaps[candidates, 0]
+            gap = candidates[np.argmax(widths)]
+            cut, resume = int(gaps[gap, 0]), int(gaps[gap, 1])
+        else:
+            # Nobody paused for a whole window: cut mid-speech
+            cut = resume = limit
+        chunks.append((start, cut))
+        # Skip the pause itself, and any silence after it
+        later = np.nonzero(speech[:, 1] > resume)[0]
+        start = max(resume, int(speech[later[0], 0])) if len(later) else last_end
+    if last_end > start:
+        chunks.append((start, last_end))
+    return chunks
+
+
+def read_chunk(file_path, start, end):
+    """Mono int16 PCM bytes of samples start to end of a 16-bit WAV, read without loading the rest"""
+    with wave.open(file_path, "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError("Only 16-bit PCM WAV files are supported")
+        channels = wf.getnchannels()
+        wf.setpos(start)
+        data = wf.readframes(end - start)
+    if channels == 1:
+        return data
+    samples = np.frombuffer(data, dtype=np.int16).reshape(-1, channels)
+    return samples.mean(axis=1).astype(np.int16).tobytes()
+
+
+def _recognition_config(sample_rate, language_code, structured=False, model=None):
+    from google.cloud import speech
+
+    options = {"model": model} if model else {}
+    return speech.RecognitionConfig(
+        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+        sample_rate_hertz=sample_rate,
+        language_code=language_code,
+        enable_word_time_offsets=structured,
+        enable_word_confidence=structured,
+        **options,
+    )
+
+
+def _response_text(response, structured=False):
+    if structured:
+        return Transcript.from_results(response.results)
+    return " ".join(result.alternatives[0].transcript.strip()
+                    for result in response.results if result.alternatives)
+
+
+def google_recognizer(sample_rate, language_code="en-US", client=None, structured=False, model=None):
+    """
+    Recognizer that sends each chunk inline to the synchronous recognize RPC.
+    With structured, chunks come back as Transcripts with word timings.
+    """
+    from google.cloud import speech
+
+    if client is None:
+        client = speech.SpeechClient()
+    config = _recognition_config(sample_rate, language_code, structured, model)
+
+    def recognize(pcm):
+        response = client.recognize(config=config, audio=speech.RecognitionAudio(content=pcm))
+        return _response_text(response, structured)
+
+    return recognize
+
+
+def google_async_recognizer(sample_rate, language_code="en-US", client=None, structured=False, model=None):
+    """google_recognizer for transcribe_chunked_async, using the async Speech client"""
+    from google.cloud import speech
+
+    if client is None:
+        client = speech.SpeechAsyncClient()
+    config = _recognition_config(sample_rate, language_code, structured, model)
+
+    async def recognize(pcm):
+        response = await client.recognize(config=config, audio=speech.RecognitionAudio(content=pcm))
+        return _response_text(response, structured)
+
+    return recognize
+
+
+def transcribe_chunked(file_path, recognizer=None, max_workers=MAX_WORKERS,
+                       max_seconds=MAX_CHUNK_SECONDS, min_seconds=MIN_CHUNK_SECONDS):
+    """
+    Transcribe a 16-bit WAV by splitting it at pauses and recognising the
+    chunks concurrently, then joining the text in time order.
+
+    recognizer is a callable taking a chunk's raw int16 PCM bytes and
+    returning its text (or a Transcript with times relative to the chunk);
+    by default chunks go to the Speech API inline. Returns (transcript,
+    chunks) where chunks is a list of (offset seconds, duration seconds,
+    text). If the recognizer returns Transcripts, so does this, with times
+    relative to the whole file.
+
+    The file is never loaded whole: speech is detected a block at a time
+    and each chunk is read from disk when its turn comes, so memory use
+    depends on max_workers rather than on the length of the meeting.
+    """
+    bounds, sample_rate = split_wav_at_silence(file_path, max_seconds, min_seconds)
+    if recognizer is None:
+        recognizer = google_recognizer(sample_rate)
+    logger.info(f"Transcribing {len(bounds)} chunks with up to {max_workers} workers")
+
+    def work(start, end):
+        pcm = read_chunk(file_path, start, end)
+        for attempt in range(CHUNK_ATTEMPTS):
+            try:
+                return recognizer(pcm)
+            except Exception as e:
+                if attempt == CHUNK_ATTEMPTS - 1:
+                    raise
+                logger.warning(f"Chunk at {start / sample_rate:.1f} s failed, retrying: {e}")
+                time.sleep(2 ** attempt)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = [pool.submit(work, start, end) for start, end in bounds]
+        texts = [future.result() for future in futures]
+    logger.info(f"Chunked transcription took {time.perf_counter() - started:.1f} s")
+
+    return _stitch(bounds, texts, sample_rate)
+
+
+async def transcribe_chunked_async(file_path, recognizer=None, max_concurrency=MAX_WORKERS,
+                                   max_seconds=MAX_CHUNK_SECONDS, min_seconds=MIN_CHUNK_SECONDS):
+    """
+    transcribe_chunked for asyncio code: recognizer is an async callable,
+    and at most max_concurrency requests are in flight at once.
+    """
+    bounds, sample_rate = await asyncio.to_thread(split_wav_at_silence, file_path, max_seconds, min_seconds)
+    if recognizer is None:
+        recognizer = google_async_recognizer(sample_rate)
+    logger.info(f"Transcribing {len(bounds)} chunks, {max_concurrency} at a time")
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def work(start, end):
+        async with semaphore:
+            # Read inside the semaphore, so only the chunks in flight are in memory
+            pcm = await asyncio.to_thread(read_chunk, file_path, start, end)
+            for attempt in range(CHUNK_ATTEMPTS):
+                try:
+                    return await recognizer(pcm)
+                except Exception as e:
+                    if attempt == CHUNK_ATTEMPTS - 1:
+                        raise
+                    logger.warning(f"Chunk at {start / sample_rate:.1f} s failed, retrying: {e}")
+                    await asyncio.sleep(2 ** attempt)
+
+    texts = await asyncio.gather(*(work(start, end) for start, end in bounds))
+    return _stitch(bounds, texts, sample_rate)
+
+
+def _stitch(bounds, texts, sample_rate):
+    """Join chunk texts in time order; returns (transcript, chunks)"""
+    chunks = [(start / sample_rate, (end - start) / sample_rate, text)
+              for (start, end), text in zip(bounds, texts)]
+    if any(isinstance(text, Transcript) for text in texts):
+        transcript = Transcript.concatenate([text.shifted(offset) for offset, _, text in chunks])
+        return transcript, chunks
+    transcript = " ".join(text.strip() for _, _, text in chunks if text and text.strip())
+    return transcript, chunks
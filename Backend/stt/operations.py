@@ -0,0 +1,424 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from threading import Lock
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: the lock only covers threads of one process
+    fcntl = None
+
+logger = logging.getLogger('stt')
+
+# "disk", "mongo" or "none"
+OPERATIONS_BACKEND = os.getenv('STT_OPERATIONS_BACKEND', 'disk')
+OPERATIONS_DIR = os.getenv('STT_OPERATIONS_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'operations'))
+# Polling starts after POLL_INITIAL_DELAY seconds and backs off up to POLL_MAX_DELAY
+POLL_INITIAL_DELAY = float(os.getenv('STT_POLL_INITIAL_DELAY', '2'))
+POLL_MAX_DELAY = float(os.getenv('STT_POLL_MAX_DELAY', '60'))
+POLL_MULTIPLIER = 2.0
+# Delivered operations (and finished ones without an event) are removed
+# after this long; checked at most every PRUNE_INTERVAL seconds
+OPERATIONS_TTL = float(os.getenv('STT_OPERATIONS_TTL', str(7 * 24 * 3600)))
+PRUNE_INTERVAL = 3600
+
+# Operation states. A finished operation that belongs to an event stays
+# "done" or "failed" until its summary has been delivered.
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+DELIVERED = "delivered"
+
+
+def new_record(name, audio_hash, event_id=None, **fields):
+    """A store entry for an operation that was just started"""
+    now = time.time()
+    record = {
+        "name": name,
+        "audio_hash": audio_hash,
+        "event_id": event_id,
+        "state": RUNNING,
+        "attempts": 0,
+        "next_poll": now + POLL_INITIAL_DELAY,
+        "created": now,
+        "updated": now,
+        "transcript": None,
+        "error": None,
+    }
+    record.update(fields)
+    return record
+
+
+class OperationStore:
+    """
+    Long-running recognition operations, keyed by operation name, that
+    outlive the process which started them.
+
+    audio_hash identifies the audio and recognition settings, so the same
+    recording is never sent for recognition twice; event_id ties the
+    operation to the meeting whose summary is waiting for it.
+    """
+
+    def add(self, record):
+        raise NotImplementedError
+
+    def get(self, name):
+        raise NotImplementedError
+
+    def update(self, name, if_state=None, **fields):
+        """
+        Change some fields of a record; returns the updated record. With
+        if_state, only a record in that state is changed, and None is
+        returned if it has moved on (e.g. another process finished it).
+        """
+        raise NotImplementedError
+
+    def find(self, audio_hash):
+        """The newest running or successful operation for this audio, or None"""
+        raise NotImplementedError
+
+    def unfinished(self):
+        """Records of operations still running"""
+        raise NotImplementedError
+
+    def undelivered(self):
+        """Finished records with an event_id whose result has not been delivered"""
+        raise NotImplementedError
+
+    def prune(self, ttl=OPERATIONS_TTL):
+        """Remove settled records (see is_settled) not changed for ttl seconds; returns how many"""
+        raise NotImplementedError
+
+
+def is_settled(record):
+    """Whether nothing is waiting for the record any more: delivered, or finished without an event"""
+    return record["state"] == DELIVERED or (record["state"] != RUNNING and not record.get("event_id"))
+
+
+class DiskOperationStore(OperationStore):
+    """
+    One JSON file per operation, replaced atomically on every change.
+
+    Records that are running or waiting to be delivered live in the
+    directory itself, settled ones in settled/, so polling only reads
+    the operations that still matter. by_audio/ maps each audio_hash to
+    the names of its operations, oldest first, for find(). Changes are
+    made under a lock on the .lock file, which also keeps out other
+    processes sharing the directory (e.g. the joiner and the scheduler).
+    """
+
+    def __init__(self, directory=OPERATIONS_DIR, ttl=OPERATIONS_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self._settled_dir = os.path.join(directory, "settled")
+        self._index_dir = os.path.join(directory, "by_audio")
+        self._lock = Lock()
+        self._pruned = 0.0
+        indexed = os.path.isdir(self._index_dir)
+        os.makedirs(self._settled_dir, exist_ok=True)
+        os.makedirs(self._index_dir, exist_ok=True)
+        if not indexed:
+            self._migrate()
+
+    @contextmanager
+    def _locked(self):
+        with self._lock, open(os.path.join(self.directory, ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _filename(name):
+        return name.replace("/", "_") + ".json"
+
+    def _path(self, name, settled=False):
+        return os.path.join(self._settled_dir if settled else self.directory, self._filename(name))
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _replace(path, data):
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+
+    def _write(self, record):
+        settled = is_settled(record)
+        self._replace(self._path(record["name"], settled), record)
+        try:
+            # Written first, so a reader never finds neither copy
+            os.remove(self._path(record["name"], not settled))
+        except FileNotFoundError:
+            pass
+
+    def _index_path(self, audio_hash):
+        return os.path.join(self._index_dir, audio_hash + ".json")
+
+    def _index(self, audio_hash):
+        return self._read(self._index_path(audio_hash)) or []
+
+    def _records(self):
+        """The records in the directory itself: running or waiting to be delivered"""
+        records = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                try:
+                    with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                        records.append(json.load(f))
+                except FileNotFoundError:
+                    # Settled in the meantime
+                    pass
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping unreadable operation record {name}: {str(e)}")
+        return records
+
+    def _migrate(self):
+        """Index records written before by_audio/ and settled/ existed"""
+        records = sorted(self._records(), key=lambda record: record["created"])
+        for record in records:
+            self.add(record)
+        if records:
+            logger.info(f"Indexed {len(records)} STT operation records")
+
+    def add(self, record):
+        with self._locked():
+            self._write(record)
+            names = [name for name in self._index(record["audio_hash"]) if name != record["name"]]
+            self._replace(self._index_path(record["audio_hash"]), names + [record["name"]])
+
+    def get(self, name):
+        record = self._read(self._path(name))
+        if record is None:
+            record = self._read(self._path(name, settled=True))
+        return record
+
+    def update(self, name, if_state=None, **fields):
+        with self._locked():
+            record = self.get(name)
+            if record is None:
+                raise KeyError(name)
+            if if_state is not None and record["state"] != if_state:
+                return None
+            record.update(fields, updated=time.time())
+            self._write(record)
+            return record
+
+    def find(self, audio_hash):
+        for name in reversed(self._index(audio_hash)):
+            record = self.get(name)
+            if record is not None and record["state"] != FAILED:
+                return record
+        return None
+
+    def unfinished(self):
+        if time.time() - self._pruned > PRUNE_INTERVAL:
+            self.prune(self.ttl)
+        return [record for record in self._records() if record["state"] == RUNNING]
+
+    def undelivered(self):
+        return [record for record in self._records()
+                if record["state"] in (DONE, FAILED) and record.get("event_id")]
+
+    def prune(self, ttl=OPERATIONS_TTL):
+        self._pruned = time.time()
+        removed = {}
+        with self._locked():
+            for filename in os.listdir(self._settled_dir):
+                path = os.path.join(self._settled_dir, filename)
+                record = self._read(path) if filename.endswith(".json") else None
+                if record is not None and self._pruned - record["updated"] > ttl:
+                    os.remove(path)
+                    removed.setdefault(record["audio_hash"], set()).add(record["name"])
+            for audio_hash, names in removed.items():
+                remaining = [name for name in self._index(audio_hash) if name not in names]
+                if remaining:
+                    self._replace(self._index_path(audio_hash), remaining)
+                else:
+                    os.remove(self._index_path(audio_hash))
+        count = sum(len(names) for names in removed.values())
+        if count:
+            logger.info(f"Pruned {count} settled STT operation records")
+        return count
+
+
+class MongoOperationStore(OperationStore):
+    """Operations in a MongoDB collection, visible to every process using the same database"""
+
+    def __init__(self, uri=None, collection="stt_operations"):
+        from pymongo import MongoClient, ReturnDocument
+
+        self._after = ReturnDocument.AFTER
+        self.client = MongoClient(uri or os.getenv('DB_URI'))
+        self.collection = self.client.user[collection]
+        self.collection.create_index("audio_hash")
+        self.collection.create_index("state")
+        self._pruned = 0.0
+
+    @staticmethod
+    def _record(document):
+        if document is None:
+            return None
+        document = dict(document)
+        document["name"] = document.pop("_id")
+        return document
+
+    def add(self, record):
+        document = dict(record)
+        document["_id"] = document.pop("name")
+        self.collection.replace_one({"_id": document["_id"]}, document, upsert=True)
+
+    def get(self, name):
+        return self._record(self.collection.find_one({"_id": name}))
+
+    def update(self, name, if_state=None, **fields):
+        fields["updated"] = time.time()
+        query = {"_id": name}
+        if if_state is not None:
+            query["state"] = if_state
+        document = self.collection.find_one_and_update(query, {"$set": fields}, return_document=self._after)
+        if document is None:
+            if if_state is not None and self.collection.count_documents({"_id": name}, limit=1):
+                return None
+            raise KeyError(name)
+        return self._record(document)
+
+    def find(self, audio_hash):
+        documents = self.collection.find({"audio_hash": audio_hash, "state": {"$ne": FAILED}}).sort("created", -1).limit(1)
+        return next((self._record(document) for document in documents), None)
+
+    def unfinished(self):
+        if time.time() - self._pruned > PRUNE_INTERVAL:
+            self.prune()
+        return [self._record(document) for document in self.collection.find({"state": RUNNING})]
+
+    def undelivered(self):
+        query = {"state": {"$in": [DONE, FAILED]}, "event_id": {"$ne": None}}
+        return [self._record(document) for document in self.collection.find(query)]
+
+    def prune(self, ttl=OPERATIONS_TTL):
+        self._pruned = time.time()
+        settled = [{"state": DELIVERED}, {"state": {"$in": [DONE, FAILED]}, "event_id": None}]
+        result = self.collection.delete_many({"$or": settled, "updated": {"$lt": time.time() - ttl}})
+        return result.deleted_count
+
+
+def open_operation_store(backend=None):
+    """The store selected by STT_OPERATIONS_BACKEND, or None if it is off or unavailable"""
+    backend = backend or OPERATIONS_BACKEND
+    try:
+        if backend == "disk":
+            return DiskOperationStore()
+        if backend == "mongo":
+            return MongoOperationStore()
+    except Exception as e:
+        logger.warning(f"STT operation store not available: {str(e)}")
+        return None
+    if backend != "none":
+        logger.warning(f"Unknown STT operation store: {backend}")
+    return None
+
+
+class OperationPoller:
+    """
+    Waits for operations in an OperationStore by polling each one with
+    exponential backoff, rather than blocking on a single call.
+
+    check(record) looks at an operation once. It returns None while the
+    operation is still running, or the fields to store once it has
+    finished (state DONE or FAILED, plus the transcript or error). When
+    and how often each operation was polled is kept in the store, so a new
+    process carries on where the last one stopped.
+    """
+
+    def __init__(self, store, check, initial_delay=POLL_INITIAL_DELAY, max_delay=POLL_MAX_DELAY,
+                 multiplier=POLL_MULTIPLIER):
+        self.store = store
+        self.check = check
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+
+    def delay(self, attempts):
+        return min(self.max_delay, self.initial_delay * self.multiplier ** attempts)
+
+    def poll(self, record):
+        """Check one operation and record the outcome; returns the updated record"""
+        if record["state"] != RUNNING:
+            # Another process finished it in the meantime
+            return record
+        try:
+            finished = self.check(record)
+        except Exception as e:
+            # Network trouble and the like: try again later
+            logger.warning(f"Could not poll operation {record['name']}: {str(e)}")
+            finished = None
+        if finished is not None:
+            logger.info(f"Operation {record['name']} {finished['state']} after {record['attempts'] + 1} polls")
+            updated = self.store.update(record["name"], if_state=RUNNING, **finished)
+        else:
+            attempts = record["attempts"] + 1
+            updated = self.store.update(record["name"], if_state=RUNNING, attempts=attempts,
+                                        next_poll=time.time() + self.delay(attempts))
+        # None if another process finished it while this one was polling
+        return updated if updated is not None else self.store.get(record["name"])
+
+    def poll_due(self):
+        """Poll every running operation whose next poll is due; returns those that finished"""
+        finished = []
+        now = time.time()
+        for record in self.store.unfinished():
+            if record["next_poll"] <= now:
+                record = self.poll(record)
+                if record["state"] != RUNNING:
+                    finished.append(record)
+        return finished
+
+    def _due_in(self, name, deadline):
+        """
+        (record, seconds until its next poll) for a running operation, or
+        (record, None) once it has finished; TimeoutError if the next poll
+        would come after the deadline.
+        """
+        record = self.store.get(name)
+        if record is None:
+            raise KeyError(name)
+        if record["state"] != RUNNING:
+            return record, None
+        delay = max(0.0, record["next_poll"] - time.time())
+        if deadline is not None and time.time() + delay > deadline:
+            raise TimeoutError(f"Operation {name} still running")
+        return record, delay
+
+    def wait(self, name, timeout=None):
+        """Poll one operation until it finishes; returns its record"""
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            record, delay = self._due_in(name, deadline)
+            if delay is None:
+                return record
+            time.sleep(delay)
+            self.poll(self.store.get(name))
+
+    async def wait_async(self, name, timeout=None):
+        """wait() for asyncio code; store access and polls run in the default executor"""
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            record, delay = await asyncio.to_thread(self._due_in, name, deadline)
+            if delay is None:
+                return record
+            await asyncio.sleep(delay)
+            await asyncio.to_thread(lambda: self.poll(self.store.get(name)))
@@ -0,0 +1,59 @@
+import os
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger('stt')
+
+# Set STT_ROUTING=0 to always use the default model with long-running recognition
+ROUTING_ENABLED = os.getenv('STT_ROUTING', '1') == '1'
+
+RoutingPolicy = namedtuple("RoutingPolicy", "short_seconds sync_seconds inline_max_bytes short_model long_model")
+
+# How a recording is sent for recognition:
+# model - recognition model name
+# method - "recognize" (synchronous, at most a minute of audio) or "long_running"
+# inline - send the audio in the request rather than through GCS
+# seconds - audio actually sent; duration and speech_ratio are what it was decided from
+Route = namedtuple("Route", "model method inline seconds duration speech_ratio")
+
+
+def policy_from_env(inline_max_bytes):
+    return RoutingPolicy(
+        # Up to this much speech counts as a short clip
+        short_seconds=float(os.getenv('STT_ROUTE_SHORT_SECONDS', '15')),
+        # Up to this much audio goes to synchronous recognize (API limit: 60 s)
+        sync_seconds=float(os.getenv('STT_ROUTE_SYNC_SECONDS', '55')),
+        inline_max_bytes=inline_max_bytes,
+        short_model=os.getenv('STT_SHORT_MODEL', 'latest_short'),
+        long_model=os.getenv('STT_LONG_MODEL', 'latest_long'),
+    )
+
+
+def choose_route(policy, duration, speech_ratio=None, size=None):
+    """
+    Route a recording of `duration` seconds.
+
+    speech_ratio is the fraction of the recording kept after trimming
+    silence, or None if the whole recording is sent; what matters is how
+    much audio reaches the API. size is the byte size of the audio to send,
+    or None if it is already in GCS.
+    """
+    seconds = duration * speech_ratio if speech_ratio is not None else duration
+    route = Route(
+        model=policy.short_model if seconds <= policy.short_seconds else policy.long_model,
+        method="recognize" if seconds <= policy.sync_seconds else "long_running",
+        inline=size is not None and size <= policy.inline_max_bytes,
+        seconds=round(seconds, 2),
+        duration=round(duration, 2),
+        speech_ratio=None if speech_ratio is None else round(speech_ratio, 3),
+    )
+    logger.info(f"STT route: {route.model} via {route.method}, {'inline' if route.inline else 'GCS'} "
+                f"({route.seconds} s sent of {route.duration} s, speech ratio {route.speech_ratio})")
+    return route
+
+
+def log_latency(route, latency):
+    """Log how long a routed recognition took, for tuning the thresholds"""
+    logger.info(f"STT route latency: {latency:.2f} s for {route.model} via {route.method}, "
+                f"{'inline' if route.inline else 'GCS'}, {route.seconds} s of audio "
+                f"({latency / max(route.seconds, 0.01):.3f} s per audio second)")
@@ -0,0 +1,54 @@
+import time
+import logging
+from threading import Lock
+
+logger = logging.getLogger('stt')
+
+
+def _failed(transcript):
+    return isinstance(transcript, str) and transcript.startswith("Transcription failed")
+
+
+class SegmentTranscriber:
+    """
+    Transcribes a segmented recording (record_meet.SegmentedWriter) while
+    it is being made: pass it as on_segment and each finished segment is
+    transcribed on the recorder's notification thread, so once the
+    recording stops only the last segment is left.
+
+    finish() retries the segments that failed once and returns the segment
+    transcripts joined in order, or the first failure. transcribe(path)
+    replaces stt.stt.transcribe_audio.
+    """
+
+    def __init__(self, transcribe=None):
+        if transcribe is None:
+            from stt.stt import transcribe_audio as transcribe
+        self.transcribe = transcribe
+        self.segments = {}
+        self.transcripts = {}
+        self._lock = Lock()
+
+    def __call__(self, segment):
+        started = time.perf_counter()
+        transcript = self.transcribe(segment["path"])
+        with self._lock:
+            self.segments[segment["index"]] = segment
+            self.transcripts[segment["index"]] = transcript
+        if _failed(transcript):
+            logger.warning(f"Segment {segment['index']} not transcribed, retrying at the end: {transcript}")
+        else:
+            logger.info(f"Segment {segment['index']} transcribed in {time.perf_counter() - started:.2f} s")
+
+    def finish(self):
+        """The transcript of the whole recording; call after the recording has stopped"""
+        with self._lock:
+            indexes = sorted(self.transcripts)
+        if indexes != list(range(len(indexes))):
+            return "Transcription failed: Missing recording segments"
+        for index in indexes:
+            if _failed(self.transcripts[index]):
+                self.transcripts[index] = self.transcribe(self.segments[index]["path"])
+                if _failed(self.transcripts[index]):
+                    return self.transcripts[index]
+        return " ".join(text for text in (self.transcripts[index].strip() for index in indexes) if text)
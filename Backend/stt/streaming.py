@@ -0,0 +1,314 @@
+import os
+import time
+import queue
+import logging
+from collections import deque, namedtuple
+from threading import Thread, Condition
+import numpy as np
+
+logger = logging.getLogger('stt')
+
+# Google closes a streaming recognize call after about 5 minutes of audio, so
+# streams are rotated before that: at the first pause after STREAM_SOFT_LIMIT
+# seconds, and unconditionally at STREAM_HARD_LIMIT
+STREAM_SOFT_LIMIT = 240
+STREAM_HARD_LIMIT = 290
+
+# Blocks quieter than this count as a pause (same threshold as record_meet)
+PAUSE_THRESHOLD_DB = -45
+
+# Each streaming request may carry at most 25 KB of audio
+MAX_REQUEST_BYTES = 16 * 1024
+
+# Consecutive failed streams before giving up
+MAX_RECONNECTS = 5
+
+# Results waiting for the consumer of results(); past this the oldest are
+# dropped (the transcript is kept separately and loses nothing)
+RESULTS_QUEUE_SIZE = 1000
+
+# host:port of a local stand-in for the Speech API (plain gRPC, no credentials)
+SPEECH_EMULATOR_HOST = os.getenv('SPEECH_EMULATOR_HOST')
+
+# One recognition result; times are seconds from the first fed sample
+TranscriptResult = namedtuple("TranscriptResult", "text is_final start end confidence stability")
+
+
+def _default_client():
+    from google.cloud import speech
+
+    if SPEECH_EMULATOR_HOST:
+        import grpc
+        from google.cloud.speech_v1.services.speech.transports import SpeechGrpcTransport
+        channel = grpc.insecure_channel(SPEECH_EMULATOR_HOST)
+        return speech.SpeechClient(transport=SpeechGrpcTransport(channel=channel))
+
+    # Importing stt.stt sets up the service account credentials
+    from stt.stt import check_google_cloud
+    if not check_google_cloud():
+        raise RuntimeError("Missing Google Cloud dependencies or credentials")
+    return speech.SpeechClient()
+
+
+def _seconds(duration):
+    """Seconds in a proto Duration (a timedelta in newer client libraries)"""
+    if duration is None:
+        return 0.0
+    if hasattr(duration, "total_seconds"):
+        return duration.total_seconds()
+    return duration.seconds + duration.nanos / 1e9
+
+
+def _is_quiet(data):
+    samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+    if not len(samples):
+        return True
+    rms = np.sqrt(np.mean(samples * samples)) / 32768
+    return 20 * np.log10(rms + 1e-10) < PAUSE_THRESHOLD_DB
+
+
+class _Stream:
+    """Bookkeeping for one streaming recognize call"""
+
+    def __init__(self, first_chunk, first_frame):
+        self.first_chunk = first_chunk
+        self.first_frame = first_frame
+        self.cursor = first_chunk
+        self.active = True
+        self.rotated = False
+
+
+class StreamingTranscriber:
+    """
+    Transcribe audio while it is being recorded, using the Speech API's
+    streaming recognize RPC.
+
+    feed() takes mono 16-bit PCM (or float) blocks from any thread without
+    blocking; a background thread streams them to the API. results() yields
+    interim and final TranscriptResults as they arrive, and close() waits
+    for the last final results and returns the full transcript. Results
+    are only queued once results() has been called, and at most
+    RESULTS_QUEUE_SIZE of them, so the consumer has to keep up.
+
+    A stream only lasts about five minutes, so a new one is started at a
+    pause after STREAM_SOFT_LIMIT seconds (the old one is half-closed, which
+    makes the server finalise everything it was sent). Audio is kept until
+    a final result covers it: if a stream fails, the next one resends what
+    was not finalised yet, so no speech is lost on a reconnect.
+
+    Also usable as a RecordingSession sink (write() is feed()).
+    """
+
+    def __init__(self, sample_rate=16000, language_code="en-US", interim_results=True, client=None,
+                 soft_limit=STREAM_SOFT_LIMIT, hard_limit=STREAM_HARD_LIMIT,
+                 max_reconnects=MAX_RECONNECTS, results_queue_size=RESULTS_QUEUE_SIZE):
+        self.sample_rate = sample_rate
+        self.language_code = language_code
+        self.interim_results = interim_results
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.max_reconnects = max_reconnects
+        self.frames_fed = 0
+        self.streams = 0
+        self.reconnects = 0
+        self.error = None
+        self.finals = []
+        self.dropped_results = 0
+        self._client = client
+        self._results = queue.Queue(results_queue_size)
+        self._listening = False
+        self._last_final_end = 0.0
+        # Audio not yet covered by a final result: (start frame, bytes), and
+        # the running index of the first one
+        self._chunks = deque()
+        self._base = 0
+        self._input_ended = False
+        self._condition = Condition()
+        self._thread = None
+
+    def start(self):
+        self._thread = Thread(target=self._run, name="streaming-stt", daemon=True)
+        self._thread.start()
+        return self
+
+    def feed(self, block):
+        """Queue a block of mono audio: int16/float numpy array or raw int16 bytes"""
+        if isinstance(block, np.ndarray):
+            if block.dtype != np.int16:
+                block = np.int16(np.clip(block, -1.0, 1.0) * 32767)
+            data = np.ascontiguousarray(block).tobytes()
+        else:
+            data = bytes(block)
+
+        with self._condition:
+            if self._input_ended:
+                raise RuntimeError("Transcriber already closed")
+            for i in range(0, len(data), MAX_REQUEST_BYTES):
+                piece = data[i:i + MAX_REQUEST_BYTES]
+                self._chunks.append((self.frames_fed, piece))
+                self.frames_fed += len(piece) // 2
+            self._condition.notify_all()
+
+    write = feed
+
+    def results(self):
+        """Iterate over the TranscriptResults (interim and final) from now until the transcriber is closed"""
+        self._listening = True
+        return self._iter_results()
+
+    def _iter_results(self):
+        while True:
+            result = self._results.get()
+            if result is None:
+                return
+            yield result
+
+    def close(self, timeout=None):
+        """Signal the end of the audio, wait for final results and return the transcript"""
+        if self._thread is None:
+            self.start()
+        with self._condition:
+            self._input_ended = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        if self.error is not None:
+            logger.error(f"Streaming transcription failed: {self.error}")
+        logger.info(f"Streamed {self.frames_fed / self.sample_rate:.0f} s of audio in {self.streams} "
+                    f"streams ({self.reconnects} reconnects)")
+        return self.transcript
+
+    @property
+    def transcript(self):
+        return " ".join(result.text.strip() for result in self.finals if result.text.strip())
+
+    def _config(self):
+        from google.cloud import speech
+
+        return speech.StreamingRecognitionConfig(
+            config=speech.RecognitionConfig(
+                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=self.sample_rate,
+                language_code=self.language_code,
+                enable_word_time_offsets=True,
+            ),
+            interim_results=self.interim_results,
+        )
+
+    def _run(self):
+        try:
+            if self._client is None:
+                self._client = _default_client()
+            config = self._config()
+            failures = 0
+            while True:
+                try:
+                    finished = self._run_stream(config)
+                    failures = 0
+                except Exception as e:
+                    failures += 1
+                    if failures > self.max_reconnects:
+                        raise
+                    self.reconnects += 1
+                    delay = min(2 ** (failures - 1), 30)
+                    logger.warning(f"Recognition stream failed, reconnecting in {delay} s: {e}")
+                    time.sleep(delay)
+                    continue
+                if finished:
+                    return
+        except Exception as e:
+            self.error = e
+        finally:
+            self._publish(None)
+
+    def _run_stream(self, config):
+        """Run one streaming call; returns True once all audio has been recognised"""
+        with self._condition:
+            first_frame = self._chunks[0][0] if self._chunks else self.frames_fed
+            stream = _Stream(self._base, first_frame)
+        self.streams += 1
+
+        try:
+            responses = self._client.streaming_recognize(config, self._requests(stream))
+            for response in responses:
+                for result in response.results:
+                    self._handle_result(result, stream)
+        finally:
+            with self._condition:
+                stream.active = False
+                self._condition.notify_all()
+
+        with self._condition:
+            # The server finalised everything it was sent before the stream ended
+            self._trim(stream.cursor)
+            return self._input_ended and not self._chunks
+
+    def _requests(self, stream):
+        from google.cloud import speech
+
+        while True:
+            with self._condition:
+                while (stream.active and not self._input_ended
+                       and stream.cursor >= self._base + len(self._chunks)):
+                    self._condition.wait()
+                if not stream.active or stream.cursor >= self._base + len(self._chunks):
+                    return
+                start, data = self._chunks[stream.cursor - self._base]
+                stream.cursor += 1
+
+            yield speech.StreamingRecognizeRequest(audio_content=data)
+
+            elapsed = (start + len(data) // 2 - stream.first_frame) / self.sample_rate
+            if elapsed >= self.hard_limit or (elapsed >= self.soft_limit and _is_quiet(data)):
+                logger.info(f"Rotating recognition stream after {elapsed:.0f} s")
+                stream.rotated = True
+                return
+
+    def _handle_result(self, result, stream):
+        if not result.alternatives:
+            return
+        alternative = result.alternatives[0]
+        offset = stream.first_frame / self.sample_rate
+        end = offset + _seconds(result.result_end_time)
+        start = self._last_final_end
+        if alternative.words:
+            start = offset + _seconds(alternative.words[0].start_time)
+
+        transcript_result = TranscriptResult(
+            text=alternative.transcript,
+            is_final=result.is_final,
+            start=start,
+            end=end,
+            confidence=alternative.confidence if result.is_final else None,
+            stability=None if result.is_final else result.stability,
+        )
+        if result.is_final:
+            self.finals.append(transcript_result)
+            self._last_final_end = end
+            with self._condition:
+                self._trim(stream.cursor, int(end * self.sample_rate))
+        if self._listening:
+            self._publish(transcript_result)
+
+    def _publish(self, result):
+        """Queue a result (None marks the end) for results(), dropping the oldest if the queue is full"""
+        while True:
+            try:
+                self._results.put_nowait(result)
+                return
+            except queue.Full:
+                try:
+                    self._results.get_nowait()
+                except queue.Empty:
+                    continue
+                self.dropped_results += 1
+                if self.dropped_results == 1:
+                    logger.warning("Transcript results are not being read fast enough, dropping the oldest")
+
+    def _trim(self, cursor, end_frame=None):
+        """Forget audio before cursor (and, if given, ending by end_frame)"""
+        while self._chunks and self._base < cursor:
+            start, data = self._chunks[0]
+            if end_frame is not None and start + len(data) // 2 > end_frame:
+                break
+            self._chunks.popleft()
+            self._base += 1
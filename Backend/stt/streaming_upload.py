@@ -0,0 +1,222 @@
+import os
+import time
+import logging
+from threading import Thread, Condition
+from urllib.parse import quote
+
+logger = logging.getLogger('stt')
+
+# GCS requires every chunk except the last to be a multiple of 256 KiB
+CHUNK_GRANULARITY = 256 * 1024
+DEFAULT_CHUNK_SIZE = 8 * CHUNK_GRANULARITY
+
+MAX_RETRIES = 5
+RETRY_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+# Point at a local fake-gcs-server (or any stand-in) the same way google-cloud-storage does
+STORAGE_EMULATOR_HOST = os.getenv('STORAGE_EMULATOR_HOST')
+
+
+class UploadError(Exception):
+    pass
+
+
+def _default_session():
+    """HTTP session for GCS: anonymous for an emulator, otherwise with Google credentials"""
+    if STORAGE_EMULATOR_HOST:
+        import requests
+        return requests.Session()
+
+    import google.auth
+    from google.auth.transport.requests import AuthorizedSession
+    credentials, _ = google.auth.default(scopes=["https://www.googleapis.com/auth/devstorage.read_write"])
+    return AuthorizedSession(credentials)
+
+
+class StreamingGCSUpload:
+    """
+    Upload a recording to GCS while it is still being captured.
+
+    A resumable upload session is opened on start(); bytes passed to write()
+    are buffered and sent from a background thread in fixed-size chunks as
+    soon as enough have accumulated, and close() sends the last partial chunk
+    and finalises the object. A failed chunk is retried with backoff after
+    asking the server how much it actually received, so nothing is sent
+    twice or lost.
+
+    Also usable as a RecordingSession sink: numpy blocks are uploaded as raw
+    PCM (no WAV header), which the Speech API accepts as LINEAR16 when the
+    sample rate is given in the RecognitionConfig.
+    """
+
+    def __init__(self, bucket_name, blob_name, content_type="application/octet-stream",
+                 chunk_size=DEFAULT_CHUNK_SIZE, session=None, max_retries=MAX_RETRIES):
+        if chunk_size % CHUNK_GRANULARITY:
+            raise ValueError(f"chunk_size must be a multiple of {CHUNK_GRANULARITY}")
+        self.bucket_name = bucket_name
+        self.blob_name = blob_name
+        self.content_type = content_type
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.base_url = (STORAGE_EMULATOR_HOST or "https://storage.googleapis.com").rstrip("/")
+        self.bytes_uploaded = 0
+        self.retries = 0
+        self.error = None
+        self._session = session
+        self._session_uri = None
+        self._pending = bytearray()
+        self._closing = False
+        self._completed = False
+        self._condition = Condition()
+        self._thread = None
+
+    @property
+    def gcs_uri(self):
+        return f"gs://{self.bucket_name}/{self.blob_name}"
+
+    def start(self):
+        """Open the upload session and start sending chunks in the background"""
+        self._thread = Thread(target=self._run, name="gcs-upload", daemon=True)
+        self._thread.start()
+        return self
+
+    def write(self, data):
+        """Queue bytes (or a contiguous numpy array) for upload"""
+        with self._condition:
+            if self._closing:
+                raise UploadError("Upload already closed")
+            if self.error is not None:
+                return
+            self._pending += memoryview(data).cast("B")
+            if len(self._pending) >= self.chunk_size:
+                self._condition.notify()
+
+    def close(self):
+        """
+        Send the remaining bytes and finalise the object. Returns the gs://
+        URI, or None if the upload failed.
+        """
+        if self._thread is None:
+            self.start()
+        with self._condition:
+            self._closing = True
+            self._condition.notify()
+        self._thread.join()
+        if self.error is not None:
+            logger.error(f"Streaming upload of {self.gcs_uri} failed: {self.error}")
+            return None
+        logger.info(f"Streamed {self.bytes_uploaded} bytes to {self.gcs_uri} ({self.retries} retries)")
+        return self.gcs_uri
+
+    def _run(self):
+        try:
+            if self._session is None:
+                self._session = _default_session()
+            self._session_uri = self._with_retries(self._initiate)
+            while True:
+                with self._condition:
+                    while len(self._pending) < self.chunk_size and not self._closing:
+                        self._condition.wait()
+                    final = self._closing and len(self._pending) <= self.chunk_size
+                    size = len(self._pending) if final else self.chunk_size
+                    chunk = bytes(self._pending[:size])
+                chunk_start = self.bytes_uploaded
+                self._with_retries(lambda: self._send_chunk(chunk, chunk_start, final))
+                with self._condition:
+                    del self._pending[:size]
+                if final:
+                    return
+        except Exception as e:
+            self.error = e
+            with self._condition:
+                # Stop buffering audio nobody will send
+                self._pending = bytearray()
+
+    def _initiate(self):
+        url = (f"{self.base_url}/upload/storage/v1/b/{quote(self.bucket_name, safe='')}/o"
+               f"?uploadType=resumable&name={quote(self.blob_name, safe='')}")
+        response = self._session.post(
+            url,
+            json={"name": self.blob_name, "contentType": self.content_type},
+            headers={"X-Upload-Content-Type": self.content_type},
+        )
+        self._check(response, (200, 201))
+        return response.headers["Location"]
+
+    def _send_chunk(self, chunk, chunk_start, final):
+        """
+        Send the part of chunk (which begins at byte chunk_start of the
+        object) that the server has not confirmed yet.
+        """
+        end = chunk_start + len(chunk)
+        if self._completed:
+            self.bytes_uploaded = end
+            return
+        start = self.bytes_uploaded
+        data = chunk[start - chunk_start:]
+        total = str(end) if final else "*"
+        if data:
+            content_range = f"bytes {start}-{end - 1}/{total}"
+        else:
+            content_range = f"bytes */{total}"
+        response = self._session.put(self._session_uri, data=data, headers={"Content-Range": content_range})
+
+        if final:
+            self._check(response, (200, 201))
+            self._completed = True
+            self.bytes_uploaded = end
+            return
+        self._check(response, (308,))
+        confirmed = self._confirmed_bytes(response)
+        self.bytes_uploaded = confirmed
+        if confirmed < end:
+            # The server kept only part of the chunk; resend the rest
+            raise _Retry(f"server persisted {confirmed - start} of {len(data)} bytes")
+
+    def _query_offset(self):
+        """Ask the server how many bytes of this upload it has persisted"""
+        response = self._session.put(self._session_uri, data=b"", headers={"Content-Range": "bytes */*"})
+        self._check(response, (308, 200, 201))
+        if response.status_code != 308:
+            # The final chunk got through even though we did not see the reply
+            self._completed = True
+            return self.bytes_uploaded
+        return self._confirmed_bytes(response)
+
+    @staticmethod
+    def _confirmed_bytes(response):
+        # Range: bytes=0-N means N+1 bytes persisted; no header means none
+        value = response.headers.get("Range")
+        if not value:
+            return 0
+        return int(value.rsplit("-", 1)[1]) + 1
+
+    @staticmethod
+    def _check(response, expected):
+        if response.status_code in expected:
+            return
+        if response.status_code in RETRY_STATUS_CODES:
+            raise _Retry(f"HTTP {response.status_code}")
+        raise UploadError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+    def _with_retries(self, operation):
+        delay = 1.0
+        for attempt in range(self.max_retries + 1):
+            try:
+                return operation()
+            except (_Retry, ConnectionError, OSError) as e:
+                if attempt == self.max_retries:
+                    raise UploadError(f"giving up after {self.max_retries} retries: {e}")
+                self.retries += 1
+                logger.warning(f"Retrying upload of {self.gcs_uri} in {delay:.0f} s: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+                if self._session_uri is not None:
+                    try:
+                        self.bytes_uploaded = self._query_offset()
+                    except Exception as query_error:
+                        logger.warning(f"Could not query upload offset: {query_error}")
+
+
+class _Retry(Exception):
+    pass
@@ -2,11 +2,20 @@
 
 import os
 import sys
+import json
+import time
 import wave
+import asyncio
 import logging
+import importlib.util
+from threading import Lock, RLock
 from pathlib import Path
 from dotenv import load_dotenv
 
+if __name__ == "__main__":
+    # Run as a script: import the stt and audio packages from Backend, not this file
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 # Load environment variables
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
 
@@ -19,59 +28,189 @@ logging.basicConfig(
 )
 logger = logging.getLogger('stt')
 
-# Try to import Google Cloud dependencies
+def _lazy_import(name):
+    """
+    The module `name`, loaded on first attribute access rather than now.
+    Raises ImportError straight away if it is not installed.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+# Try to import Google Cloud dependencies. Importing the client libraries
+# takes most of a second, so they are only loaded once they are used.
 GOOGLE_CLOUD_AVAILABLE = False
 PYDUB_AVAILABLE = False
 
 try:
-    from google.cloud import speech, storage
+    speech = _lazy_import("google.cloud.speech")
+    storage = _lazy_import("google.cloud.storage")
     GOOGLE_CLOUD_AVAILABLE = True
     logger.info("Google Cloud Speech and Storage APIs are available")
 except ImportError as e:
     logger.error(f"Google Cloud dependency missing: {str(e)}")
 
 try:
-    from pydub import AudioSegment
+    pydub = _lazy_import("pydub")
     PYDUB_AVAILABLE = True
     logger.info("pydub module is available")
 except ImportError as e:
     logger.error(f"pydub dependency missing: {str(e)}")
 
+DOWNMIX_AVAILABLE = False
+try:
+    from audio.downmix import read_wav_info, downmix_to_mono
+    DOWNMIX_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"Streaming downmix not available, falling back to pydub: {str(e)}")
+
+VAD_AVAILABLE = False
+try:
+    from audio.vad import trim_silence, to_original_times
+    VAD_AVAILABLE = True
+    logger.info("Voice activity detection is available")
+except ImportError as e:
+    logger.warning(f"Voice activity detection not available: {str(e)}")
+
+FLAC_AVAILABLE = False
+try:
+    from audio.flac import encode_flac, read_flac_info, read_flac_duration, FLAC_AVAILABLE
+    if FLAC_AVAILABLE:
+        logger.info("FLAC encoding is available")
+    else:
+        logger.warning("ffmpeg not found - audio will be uploaded as uncompressed WAV")
+except ImportError as e:
+    logger.warning(f"FLAC encoding not available: {str(e)}")
+
+UPLOAD_STRATEGY_AVAILABLE = False
+try:
+    from stt.upload import AudioUploader, INLINE_MAX_BYTES
+    UPLOAD_STRATEGY_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"Upload strategy not available, every file will be uploaded: {str(e)}")
+
+ROUTING_AVAILABLE = False
+try:
+    from stt.routing import ROUTING_ENABLED, Route, policy_from_env, choose_route, log_latency
+    ROUTING_AVAILABLE = ROUTING_ENABLED and UPLOAD_STRATEGY_AVAILABLE
+except ImportError as e:
+    logger.warning(f"STT model routing not available: {str(e)}")
+
+from stt.backends import STTBackend, StubSTTBackend
+from stt.transcript import Transcript
+
+CACHE_AVAILABLE = False
+try:
+    from stt.cache import cache_key, open_transcript_cache
+    CACHE_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"Transcript cache not available: {str(e)}")
+
+OPERATIONS_AVAILABLE = False
+try:
+    from stt.operations import open_operation_store, new_record, OperationPoller, DONE, FAILED, DELIVERED
+    OPERATIONS_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"STT operation store not available, waiting on operations in-process: {str(e)}")
+
+CHUNKED_AVAILABLE = False
+try:
+    from stt.chunked import transcribe_chunked, transcribe_chunked_async, google_recognizer, google_async_recognizer
+    CHUNKED_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"Chunked transcription not available: {str(e)}")
+
+# Drop silent stretches before uploading (set STT_TRIM_SILENCE=0 to disable)
+TRIM_SILENCE = os.getenv('STT_TRIM_SILENCE', '1') == '1'
+
+# Format to upload for recognition: "flac" (lossless, about half the size) or "wav"
+AUDIO_ENCODING = os.getenv('STT_AUDIO_ENCODING', 'flac')
+
+# "long_running": one long_running_recognize call on the uploaded file
+# "chunked": split at pauses and recognise the pieces in parallel (stt.chunked)
+TRANSCRIBE_MODE = os.getenv('STT_TRANSCRIBE_MODE', 'long_running')
+
+LANGUAGE_CODE = "en-US"
+
+# Seconds to wait for a long-running recognition operation
+RECOGNITION_TIMEOUT = 300
+
+# Bucket that audio is uploaded to for long-running recognition
+BUCKET_NAME = "dialogon-audio-bucket"
+
+# Model, recognition method and inline/GCS by amount of speech (see stt.routing)
+ROUTING_POLICY = policy_from_env(INLINE_MAX_BYTES) if ROUTING_AVAILABLE else None
+
+# API clients are created on first use and reused, so credentials are
+# loaded and channels set up once per process
+_speech_client = None
+_storage_client = None
+_async_speech_client = None
+_client_lock = Lock()
+
+# The transcript cache, operation store and poller are also opened on first
+# use: the disk backends create their directories, the mongo ones connect
+_NOT_OPENED = object()
+_transcript_cache = _NOT_OPENED
+_operation_store = _NOT_OPENED
+_operation_poller = _NOT_OPENED
+_store_lock = RLock()
+
+# "google" or "stub" (scripted transcripts, see stt.backends)
+STT_BACKEND = os.getenv('STT_BACKEND', 'google')
+
 # Check for credentials in environment variables
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 GOOGLE_APPLICATION_CREDENTIALS = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
+CREDENTIALS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'keys', 'dialogon-stt-key.json')
+
+_credentials_ready = False
+
+def _setup_credentials():
+    """Point the Google client libraries at our credentials (once, on first use)"""
+    global _credentials_ready
+    if _credentials_ready:
+        return
+    _credentials_ready = True
 
-# Set up credentials
-if GOOGLE_APPLICATION_CREDENTIALS and os.path.exists(GOOGLE_APPLICATION_CREDENTIALS):
-    # Use credentials file path from environment
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = GOOGLE_APPLICATION_CREDENTIALS
-    logger.info(f"Using Google Cloud credentials from environment: {GOOGLE_APPLICATION_CREDENTIALS}")
-elif GOOGLE_API_KEY:
-    # Use API key directly
-    logger.info("Using Google API key from environment variables")
-    # Note: When using API key, authentication works differently with Google Cloud
-    # This is a fallback in case the key is available in this format
-    os.environ["GOOGLE_API_KEY"] = GOOGLE_API_KEY
-else:
-    # Check for fallback credentials file
-    CREDENTIALS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'keys', 'dialogon-stt-key.json')
-    if os.path.exists(CREDENTIALS_PATH):
+    if GOOGLE_APPLICATION_CREDENTIALS and os.path.exists(GOOGLE_APPLICATION_CREDENTIALS):
+        # Use credentials file path from environment
+        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = GOOGLE_APPLICATION_CREDENTIALS
+        logger.info(f"Using Google Cloud credentials from environment: {GOOGLE_APPLICATION_CREDENTIALS}")
+    elif GOOGLE_API_KEY:
+        # Use API key directly
+        logger.info("Using Google API key from environment variables")
+        # Note: When using API key, authentication works differently with Google Cloud
+        # This is a fallback in case the key is available in this format
+        os.environ["GOOGLE_API_KEY"] = GOOGLE_API_KEY
+    elif os.path.exists(CREDENTIALS_PATH):
+        # Fallback credentials file
         os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = CREDENTIALS_PATH
         logger.info(f"Using Google Cloud credentials from file: {CREDENTIALS_PATH}")
     else:
         logger.warning("No Google Cloud credentials found in environment or at default path")
-        # Creating an empty directory structure to avoid errors
-        os.makedirs(os.path.dirname(CREDENTIALS_PATH), exist_ok=True)
 
 def check_google_cloud():
     """Check if Google Cloud dependencies are available"""
+    _setup_credentials()
     if not GOOGLE_CLOUD_AVAILABLE:
         logger.error("Missing Google Cloud dependencies. Install with: pip install google-cloud-speech google-cloud-storage")
         return False
     
     if not (GOOGLE_API_KEY or 
             (GOOGLE_APPLICATION_CREDENTIALS and os.path.exists(GOOGLE_APPLICATION_CREDENTIALS)) or 
-            os.path.exists(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'keys', 'dialogon-stt-key.json'))):
+            os.path.exists(CREDENTIALS_PATH)):
         logger.error("No Google Cloud credentials available")
         return False
     
@@ -90,6 +229,66 @@ def check_dependencies():
     
     return True
 
+def get_speech_client():
+    """Speech client shared by all calls (created on first use)"""
+    global _speech_client
+    _setup_credentials()
+    with _client_lock:
+        if _speech_client is None:
+            _speech_client = speech.SpeechClient()
+        return _speech_client
+
+def get_storage_client():
+    """Storage client shared by all calls (created on first use)"""
+    global _storage_client
+    _setup_credentials()
+    with _client_lock:
+        if _storage_client is None:
+            _storage_client = storage.Client()
+        return _storage_client
+
+def get_async_speech_client():
+    """
+    Async Speech client shared by all calls in the running event loop.
+    Its gRPC channel belongs to the loop it was created in, so a new
+    client is made if called from a different loop.
+    """
+    global _async_speech_client
+    _setup_credentials()
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        if _async_speech_client is None or _async_speech_client[0] is not loop:
+            _async_speech_client = (loop, speech.SpeechAsyncClient())
+        return _async_speech_client[1]
+
+def get_transcript_cache():
+    """Transcripts of audio that was already transcribed with the same settings (None if unavailable)"""
+    global _transcript_cache
+    with _store_lock:
+        if _transcript_cache is _NOT_OPENED:
+            _transcript_cache = open_transcript_cache() if CACHE_AVAILABLE else None
+        return _transcript_cache
+
+def get_operation_store():
+    """Long-running operations, recorded so they can be picked up again after a restart (None if unavailable)"""
+    global _operation_store
+    with _store_lock:
+        if _operation_store is _NOT_OPENED:
+            _operation_store = open_operation_store() if OPERATIONS_AVAILABLE else None
+        return _operation_store
+
+def get_operation_poller():
+    """Poller for the operations in the store, or None if there is no store"""
+    global _operation_poller
+    with _store_lock:
+        if _operation_poller is _NOT_OPENED:
+            store = get_operation_store()
+            _operation_poller = OperationPoller(store, _check_operation) if store is not None else None
+        return _operation_poller
+
+# Inline content for short files, content-addressed blobs for long ones
+uploader = AudioUploader(BUCKET_NAME, client_factory=get_storage_client) if UPLOAD_STRATEGY_AVAILABLE else None
+
 def upload_to_gcs(bucket_name, source_file, destination_blob_name):
     """Upload file to Google Cloud Storage"""
     if not check_google_cloud():
@@ -97,7 +296,7 @@ def upload_to_gcs(bucket_name, source_file, destination_blob_name):
         return False
     
     try:
-        client = storage.Client()
+        client = get_storage_client()
         bucket = client.bucket(bucket_name)
         blob = bucket.blob(destination_blob_name)
         blob.upload_from_filename(source_file)
@@ -107,13 +306,106 @@ def upload_to_gcs(bucket_name, source_file, destination_blob_name):
         logger.error(f"Error uploading to GCS: {str(e)}")
         return False
 
-def analyze_and_prepare_audio(file_path):
+def analyze_and_prepare_audio(file_path, trim=None, encoding=None):
+    """
+    Analyze audio file, convert to mono if needed, optionally trim silence
+    and encode it in the format that will be uploaded.
+
+    When trimming, the map from kept segments back to original timestamps is
+    saved next to the trimmed file as JSON, and _NoSpeech is raised if
+    there is no speech at all. FLAC input is used as-is.
+    """
+    if trim is None:
+        trim = TRIM_SILENCE
+    if encoding is None:
+        encoding = AUDIO_ENCODING
+
+    if file_path.lower().endswith(".flac"):
+        return _analyze_flac(file_path)
+
+    file_path, sample_rate = _prepare_mono(file_path)
+    if not file_path:
+        return file_path, sample_rate
+
+    if trim:
+        file_path = _trim_silence(file_path)
+
+    if encoding == "flac":
+        file_path = _encode_flac(file_path)
+
+    return file_path, sample_rate
+
+def _trim_silence(file_path):
+    """Trim silence from a WAV file, falling back to the original on failure"""
+    if not VAD_AVAILABLE:
+        logger.warning("Silence trimming requested but voice activity detection is not available")
+        return file_path
+
+    try:
+        trimmed_path, segment_map = trim_silence(file_path)
+    except Exception as e:
+        logger.error(f"Error trimming silence, using untrimmed audio: {str(e)}")
+        return file_path
+    if trimmed_path is None:
+        logger.info(f"No speech in {file_path}, nothing to transcribe")
+        raise _NoSpeech(file_path)
+    kept = sum(segment["duration"] for segment in segment_map)
+    logger.info(f"Trimmed silence: kept {len(segment_map)} segments, {kept:.1f} s of speech")
+    return trimmed_path
+
+def _encode_flac(file_path):
+    """Encode a WAV file as FLAC, falling back to the WAV on failure"""
+    if not FLAC_AVAILABLE:
+        logger.warning("FLAC encoding requested but not available, uploading WAV")
+        return file_path
+
+    try:
+        flac_path = encode_flac(file_path)
+        logger.info(f"Encoded FLAC: {os.path.getsize(file_path)} -> {os.path.getsize(flac_path)} bytes")
+        return flac_path
+    except Exception as e:
+        logger.error(f"Error encoding FLAC, uploading WAV: {str(e)}")
+        return file_path
+
+def _analyze_flac(file_path):
+    """Read channels and sample rate of a FLAC recording"""
+    if not os.path.exists(file_path):
+        logger.error(f"File not found: {file_path}")
+        return None, None
+
+    try:
+        channels, sample_rate = read_flac_info(file_path)
+        logger.info(f"Channels: {channels}, sample rate: {sample_rate} Hz (FLAC)")
+
+        if channels != 1:
+            logger.info("Converting to mono")
+            mono_path = file_path[:-len(".flac")] + "_mono.flac"
+            return encode_flac(file_path, mono_path, channels=1), sample_rate
+        return file_path, sample_rate
+    except Exception as e:
+        logger.error(f"Error analyzing audio: {str(e)}")
+        return None, None
+
+def recognition_encoding(file_path):
+    """RecognitionConfig encoding matching the file that will be uploaded"""
+    if file_path.lower().endswith(".flac"):
+        return speech.RecognitionConfig.AudioEncoding.FLAC
+    return speech.RecognitionConfig.AudioEncoding.LINEAR16
+
+def _prepare_mono(file_path):
     """Analyze audio file and convert to mono if needed"""
     if not os.path.exists(file_path):
         logger.error(f"File not found: {file_path}")
         return None, None
     
     try:
+        if DOWNMIX_AVAILABLE:
+            try:
+                return _downmix(file_path)
+            except ValueError as e:
+                # Not a plain PCM WAV; let pydub deal with it
+                logger.warning(f"Streaming downmix not possible: {str(e)}")
+
         # Get basic audio info
         with wave.open(file_path, "rb") as wf:
             channels = wf.getnchannels()
@@ -125,7 +417,7 @@ def analyze_and_prepare_audio(file_path):
         if channels != 1:
             if PYDUB_AVAILABLE:
                 logger.info("Converting to mono")
-                sound = AudioSegment.from_wav(file_path)
+                sound = pydub.AudioSegment.from_wav(file_path)
                 sound = sound.set_channels(1)
                 mono_path = file_path.replace(".wav", "_mono.wav")
                 sound.export(mono_path, format="wav")
@@ -142,66 +434,533 @@ def analyze_and_prepare_audio(file_path):
         logger.error(f"Error analyzing audio: {str(e)}")
         return None, None
 
-def transcribe_audio(file_path: str):
-    """Transcribe audio file using Google Cloud Speech-to-Text API"""
-    if not check_google_cloud():
+def _downmix(file_path):
+    """Header-only analysis, and a block-by-block downmix if the file is not mono"""
+    info = read_wav_info(file_path)
+    logger.info(f"Channels: {info.channels}, sample rate: {info.sample_rate} Hz")
+    if info.channels == 1:
+        return file_path, info.sample_rate
+
+    logger.info("Converting to mono")
+    mono_path, _ = downmix_to_mono(file_path, file_path.replace(".wav", "_mono.wav"))
+    return mono_path, info.sample_rate
+
+class GoogleSTTBackend(STTBackend):
+    """Google Cloud Speech-to-Text: long-running recognition, or chunked (see TRANSCRIBE_MODE)"""
+
+    name = "google"
+
+    def available(self):
+        return check_google_cloud()
+
+    def transcribe(self, file_path, gcs_uri=None, mode=None, structured=False):
+        if mode == "chunked" and not gcs_uri:
+            return _transcribe_chunked(file_path, structured)
+        return _transcribe_long_running(file_path, gcs_uri, structured, mode)
+
+    async def transcribe_async(self, file_path, gcs_uri=None, mode=None, structured=False):
+        if mode == "chunked" and not gcs_uri:
+            return await _transcribe_chunked_async(file_path, structured)
+        return await _transcribe_long_running_async(file_path, gcs_uri, structured, mode)
+
+_backend = None
+
+def get_backend():
+    """The backend selected with set_backend() or STT_BACKEND"""
+    global _backend
+    if _backend is None:
+        if STT_BACKEND == "stub":
+            _backend = StubSTTBackend.from_env()
+        else:
+            if STT_BACKEND != "google":
+                logger.warning(f"Unknown STT backend {STT_BACKEND}, using google")
+            _backend = GoogleSTTBackend()
+        logger.info(f"Using the {_backend.name} STT backend")
+    return _backend
+
+def set_backend(backend):
+    """Use this STTBackend for all transcriptions from now on"""
+    global _backend
+    _backend = backend
+
+def transcribe_audio(file_path: str, gcs_uri: str = None, mode: str = None, structured: bool = False):
+    """
+    Transcribe audio file with the STT backend (Google Cloud
+    Speech-to-Text unless STT_BACKEND or set_backend() say otherwise).
+
+    mode overrides STT_TRANSCRIBE_MODE; in "chunked" mode nothing is
+    uploaded and time to transcript depends on the number of chunks
+    divided by the number of workers rather than on the meeting length.
+
+    If the audio was already uploaded while it was being recorded (see
+    stt.streaming_upload), pass its gcs_uri: the object is raw 16-bit PCM
+    with the same sample rate as the local file, and the upload is skipped.
+
+    Transcripts are cached by the audio's content and the recognition
+    settings, so transcribing the same recording again returns at once.
+
+    With structured=True the result is a stt.transcript.Transcript with
+    word timings (relative to the original recording, even when silence
+    was trimmed) and confidences; failures are still returned as strings.
+    """
+    if not os.path.exists(file_path):
+        logger.error(f"File not found: {file_path}")
+        return "Transcription failed: Audio file not found"
+
+    if mode is None:
+        mode = TRANSCRIBE_MODE
+
+    backend = get_backend()
+    key, settings, transcript = _cache_lookup(file_path, mode, backend, structured)
+    if transcript is not None:
+        return transcript
+
+    if not backend.available():
         logger.error("Cannot transcribe audio: Missing Google Cloud dependencies or credentials")
         return "Transcription failed: Missing Google Cloud dependencies or credentials"
-    
+
+    transcript = backend.transcribe(file_path, gcs_uri, mode, structured)
+
+    _cache_store(key, transcript, settings)
+    return transcript
+
+async def transcribe_audio_async(file_path: str, gcs_uri: str = None, mode: str = None, structured: bool = False):
+    """
+    transcribe_audio for asyncio code: the Speech API is called through
+    its async client, so many meetings can be transcribed concurrently in
+    one event loop. Local file work (hashing, downmixing, encoding) and
+    GCS uploads run in the loop's default executor.
+    """
     if not os.path.exists(file_path):
         logger.error(f"File not found: {file_path}")
         return "Transcription failed: Audio file not found"
-    
+
+    if mode is None:
+        mode = TRANSCRIBE_MODE
+
+    backend = get_backend()
+    key, settings, transcript = await asyncio.to_thread(_cache_lookup, file_path, mode, backend, structured)
+    if transcript is not None:
+        return transcript
+
+    if not backend.available():
+        logger.error("Cannot transcribe audio: Missing Google Cloud dependencies or credentials")
+        return "Transcription failed: Missing Google Cloud dependencies or credentials"
+
+    transcript = await backend.transcribe_async(file_path, gcs_uri, mode, structured)
+
+    await asyncio.to_thread(_cache_store, key, transcript, settings)
+    return transcript
+
+def _cache_lookup(file_path, mode, backend, structured=False):
+    """Returns (key, settings, cached transcript or None)"""
+    transcript_cache = get_transcript_cache()
+    if transcript_cache is None:
+        return None, None, None
+    settings = _transcript_settings(file_path, mode, backend.name, structured)
+    key = cache_key(file_path, settings)
+    transcript = transcript_cache.get(key)
+    if transcript is not None:
+        logger.info(f"Transcript cache hit for {file_path} ({transcript_cache.stats()})")
+        if structured:
+            transcript = Transcript.from_json(transcript)
+    return key, settings, transcript
+
+def _cache_store(key, transcript, settings):
+    transcript_cache = get_transcript_cache()
+    if key is None or transcript_cache is None:
+        return
+    if isinstance(transcript, Transcript):
+        transcript_cache.put(key, transcript.to_json(), settings)
+    elif not transcript.startswith("Transcription failed"):
+        transcript_cache.put(key, transcript, settings)
+
+def _transcript_settings(file_path, mode, backend_name, structured):
+    """Cache key settings: the recognition settings plus the backend and result type"""
+    settings = _recognition_settings(file_path, mode)
+    settings["backend"] = backend_name
+    settings["structured"] = structured
+    return settings
+
+def _recognition_settings(file_path, mode):
+    """Everything besides the audio itself that affects the transcript"""
+    return {
+        "sample_rate": _sample_rate(file_path),
+        "language_code": LANGUAGE_CODE,
+        "model": ROUTING_POLICY._asdict() if ROUTING_POLICY else "default",
+        "mode": mode,
+        "trim_silence": TRIM_SILENCE,
+    }
+
+def _sample_rate(file_path):
+    """Sample rate from the file header, without decoding any audio"""
     try:
+        if file_path.lower().endswith(".flac"):
+            return read_flac_info(file_path)[1]
+        with wave.open(file_path, "rb") as wf:
+            return wf.getframerate()
+    except Exception:
+        return None
+
+class _TranscriptionFailed(Exception):
+    pass
+
+class _NoSpeech(Exception):
+    """The recording is all silence: the transcript is empty and nothing is sent for recognition"""
+
+def _empty_transcript(structured):
+    return Transcript.empty() if structured else ""
+
+def _prepare_recognition(file_path, gcs_uri=None, structured=False):
+    """
+    Prepare the audio, route it (see stt.routing) and get it to the API
+    (inline or through GCS). Returns (config, audio, gcs_uri, prepared
+    file, route); gcs_uri is None for inline audio, route None without
+    routing.
+    """
+    original_path = file_path
+    if gcs_uri:
+        # Already uploaded as raw PCM during the recording
+        sample_rate = _sample_rate(file_path)
+        encoding = speech.RecognitionConfig.AudioEncoding.LINEAR16
+        audio = speech.RecognitionAudio(uri=gcs_uri)
+        route = _route(original_path)
+        logger.info(f"Using audio streamed to {gcs_uri} during recording")
+    else:
         # Analyze and prepare the audio file (convert to mono if needed)
         file_path, sample_rate = analyze_and_prepare_audio(file_path)
         if not file_path or not sample_rate:
-            return "Transcription failed: Error analyzing audio file"
-        
-        # Upload to Google Cloud Storage
-        bucket_name = "dialogon-audio-bucket"
-        destination_blob_name = os.path.basename(file_path)
-        
-        if not upload_to_gcs(bucket_name, file_path, destination_blob_name):
-            return "Transcription failed: Error uploading to Google Cloud Storage"
-        
-        # Set up the URI for the audio file in GCS
-        gcs_uri = f"gs://{bucket_name}/{destination_blob_name}"
-        
-        # Create a Speech client
-        client = speech.SpeechClient()
-        
-        # Read the audio data for local processing (not used in this flow but kept for future)
-        with open(file_path, "rb") as audio_file:
-            content = audio_file.read()
-            
-        # Create the recognition audio object
-        audio = speech.RecognitionAudio(uri=gcs_uri)
-        
-        # Configure the request
-        config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-            sample_rate_hertz=sample_rate,
-            language_code="en-US"
-        )
-        
-        # Start the long-running recognition operation
+            raise _TranscriptionFailed("Error analyzing audio file")
+        encoding = recognition_encoding(file_path)
+        route = _route(original_path, file_path)
+
+        # Send inline, or upload to Google Cloud Storage
+        if uploader is not None:
+            try:
+                audio, gcs_uri = uploader.recognition_audio(file_path, inline=route.inline if route else None)
+            except Exception as e:
+                logger.error(f"Error uploading to GCS: {str(e)}")
+                raise _TranscriptionFailed("Error uploading to Google Cloud Storage")
+        else:
+            destination_blob_name = os.path.basename(file_path)
+            if not upload_to_gcs(BUCKET_NAME, file_path, destination_blob_name):
+                raise _TranscriptionFailed("Error uploading to Google Cloud Storage")
+            gcs_uri = f"gs://{BUCKET_NAME}/{destination_blob_name}"
+            audio = speech.RecognitionAudio(uri=gcs_uri)
+
+    options = {"model": route.model} if route else {}
+    config = speech.RecognitionConfig(
+        encoding=encoding,
+        sample_rate_hertz=sample_rate,
+        language_code=LANGUAGE_CODE,
+        enable_word_time_offsets=structured,
+        enable_word_confidence=structured,
+        **options,
+    )
+    return config, audio, gcs_uri, file_path, route
+
+def _route(original_path, prepared_path=None):
+    """Route by the recording's duration and how much of it is speech; None without routing"""
+    if ROUTING_POLICY is None:
+        return None
+    try:
+        duration = _duration(original_path)
+    except Exception as e:
+        logger.warning(f"Cannot measure {original_path} for routing, using long-running recognition: {str(e)}")
+        return None
+    if duration is None:
+        return None
+
+    speech_ratio = None
+    segment_map = _segment_map(prepared_path) if prepared_path else None
+    if segment_map is not None and duration > 0:
+        # Only the speech is sent
+        speech_ratio = sum(segment["duration"] for segment in segment_map) / duration
+    size = os.path.getsize(prepared_path) if prepared_path else None
+    return choose_route(ROUTING_POLICY, duration, speech_ratio, size)
+
+def _duration(file_path):
+    """Length in seconds from the file header"""
+    if file_path.lower().endswith(".flac"):
+        return read_flac_duration(file_path)
+    if DOWNMIX_AVAILABLE:
+        info = read_wav_info(file_path)
+        return info.frames / info.sample_rate
+    with wave.open(file_path, "rb") as wf:
+        return wf.getnframes() / wf.getframerate()
+
+def _recognize(config, audio, route):
+    """Run the recognition the route asks for; returns the response"""
+    started = time.perf_counter()
+    if route is not None and route.method == "recognize":
+        response = get_speech_client().recognize(config=config, audio=audio)
+    else:
+        operation = get_speech_client().long_running_recognize(config=config, audio=audio)
+        response = operation.result(timeout=RECOGNITION_TIMEOUT)
+    if route is not None:
+        log_latency(route, time.perf_counter() - started)
+    return response
+
+async def _recognize_async(config, audio, route):
+    started = time.perf_counter()
+    client = get_async_speech_client()
+    if route is not None and route.method == "recognize":
+        response = await client.recognize(config=config, audio=audio)
+    else:
+        operation = await client.long_running_recognize(config=config, audio=audio)
+        response = await operation.result(timeout=RECOGNITION_TIMEOUT)
+    if route is not None:
+        log_latency(route, time.perf_counter() - started)
+    return response
+
+def _finish_recognition(response, gcs_uri, prepared_path=None, structured=False):
+    """Combine the results and remove the audio from GCS"""
+    if structured:
+        transcript = _restore_original_times(Transcript.from_results(response.results), prepared_path)
+    else:
+        transcript = " ".join(result.alternatives[0].transcript.strip()
+                              for result in response.results if result.alternatives)
+
+    # The audio is not needed in GCS any more
+    if uploader is not None:
+        uploader.delete([gcs_uri])
+        logger.info(f"Upload stats: {uploader.stats()}")
+
+    return transcript
+
+def _segment_map(prepared_path):
+    """The segment map saved when silence was trimmed from this file, or None"""
+    stem = os.path.splitext(prepared_path)[0]
+    if not stem.endswith("_trimmed") or not os.path.exists(stem + ".json"):
+        return None
+    with open(stem + ".json") as f:
+        return json.load(f)
+
+def _restore_original_times(transcript, prepared_path):
+    """Move word times in trimmed audio back to where they were in the recording"""
+    if not prepared_path or not VAD_AVAILABLE:
+        return transcript
+    segment_map = _segment_map(prepared_path)
+    if segment_map is None:
+        return transcript
+    return transcript.map_times(lambda seconds: to_original_times(seconds, segment_map))
+
+def _transcribe_long_running(file_path, gcs_uri=None, structured=False, mode=None):
+    """Transcribe with one long_running_recognize call on the whole file"""
+    try:
+        operation_poller = get_operation_poller()
+        if operation_poller is not None:
+            # Recorded in the operation store and polled with backoff; if we
+            # time out or crash, the next attempt resumes the same operation
+            record = _start_operation(file_path, gcs_uri, structured, mode)
+            logger.info("Transcription in progress...")
+            return operation_result(operation_poller.wait(record["name"], timeout=RECOGNITION_TIMEOUT))
+
+        config, audio, gcs_uri, prepared_path, route = _prepare_recognition(file_path, gcs_uri, structured)
+
         logger.info("Transcription in progress...")
-        operation = client.long_running_recognize(config=config, audio=audio)
-        
-        # Get the final result
-        response = operation.result(timeout=300)
+        response = _recognize(config, audio, route)
+        return _finish_recognition(response, gcs_uri, prepared_path, structured)
+    except _NoSpeech:
+        return _empty_transcript(structured)
+    except _TranscriptionFailed as e:
+        return f"Transcription failed: {str(e)}"
+    except Exception as e:
+        logger.error(f"Error during transcription: {str(e)}")
+        return f"Transcription failed: {str(e)}"
+
+async def _transcribe_long_running_async(file_path, gcs_uri=None, structured=False, mode=None):
+    try:
+        operation_poller = await asyncio.to_thread(get_operation_poller)
+        if operation_poller is not None:
+            record = await asyncio.to_thread(_start_operation, file_path, gcs_uri, structured, mode)
+            logger.info("Transcription in progress...")
+            record = await operation_poller.wait_async(record["name"], timeout=RECOGNITION_TIMEOUT)
+            return operation_result(record)
 
-        # Combine the transcriptions
-        transcript = ""
-        for result in response.results:
-            transcript += result.alternatives[0].transcript + " "
+        config, audio, gcs_uri, prepared_path, route = await asyncio.to_thread(
+            _prepare_recognition, file_path, gcs_uri, structured)
 
-        return transcript.strip()
+        logger.info("Transcription in progress...")
+        response = await _recognize_async(config, audio, route)
+        return await asyncio.to_thread(_finish_recognition, response, gcs_uri, prepared_path, structured)
+    except _NoSpeech:
+        return _empty_transcript(structured)
+    except _TranscriptionFailed as e:
+        return f"Transcription failed: {str(e)}"
     except Exception as e:
         logger.error(f"Error during transcription: {str(e)}")
         return f"Transcription failed: {str(e)}"
 
+def start_transcription(file_path, gcs_uri=None, event_id=None, structured=False, mode="long_running"):
+    """
+    Start long-running recognition of a file without waiting for it, so
+    the caller can exit. Returns the operation's record in the operation
+    store (see stt.operations), or a "Transcription failed" string.
+
+    If the same audio is already being (or has been) recognised with the
+    same settings, that operation is returned instead of starting another.
+    With an event_id, poll_transcriptions() hands the result over once the
+    operation has finished, in whichever process calls it.
+    """
+    if not os.path.exists(file_path):
+        logger.error(f"File not found: {file_path}")
+        return "Transcription failed: Audio file not found"
+    if get_operation_poller() is None:
+        return "Transcription failed: No STT operation store to record the operation in"
+    if not check_google_cloud():
+        return "Transcription failed: Missing Google Cloud dependencies or credentials"
+
+    try:
+        return _start_operation(file_path, gcs_uri, structured, mode, event_id)
+    except _TranscriptionFailed as e:
+        return f"Transcription failed: {str(e)}"
+    except Exception as e:
+        logger.error(f"Error starting transcription: {str(e)}")
+        return f"Transcription failed: {str(e)}"
+
+def poll_transcriptions():
+    """
+    Poll the running operations that are due, then return the records of
+    finished operations whose event has not had its result yet. Call
+    mark_delivered() once a result has been dealt with.
+    """
+    operation_poller = get_operation_poller()
+    if operation_poller is None:
+        return []
+    operation_poller.poll_due()
+    return operation_poller.store.undelivered()
+
+def mark_delivered(name):
+    get_operation_store().update(name, state=DELIVERED)
+
+def operation_result(record):
+    """The transcript of a finished operation, or a "Transcription failed" string"""
+    if record["state"] == FAILED:
+        return f"Transcription failed: {record['error']}"
+    if record["structured"]:
+        return Transcript.from_json(record["transcript"])
+    return record["transcript"]
+
+def _start_operation(file_path, gcs_uri, structured, mode, event_id=None):
+    """Find or start the operation for this audio; returns its record"""
+    settings = _transcript_settings(file_path, mode, GoogleSTTBackend.name, structured)
+    audio_hash = cache_key(file_path, settings)
+    operation_store = get_operation_store()
+
+    record = operation_store.find(audio_hash)
+    if record is not None:
+        logger.info(f"Reusing {record['state']} operation {record['name']} for {file_path}")
+        if event_id is not None and record["event_id"] != event_id:
+            fields = {"event_id": event_id}
+            if record["state"] == DELIVERED:
+                fields["state"] = DONE
+            record = operation_store.update(record["name"], **fields)
+        return record
+
+    try:
+        config, audio, gcs_uri, prepared_path, route = _prepare_recognition(file_path, gcs_uri, structured)
+    except _NoSpeech:
+        # Nothing to recognise; recorded as done so the event still gets its (empty) result
+        transcript = _empty_transcript(structured)
+        _cache_store(audio_hash, transcript, settings)
+        if isinstance(transcript, Transcript):
+            transcript = transcript.to_json()
+        record = new_record("nospeech/" + audio_hash, audio_hash, event_id, state=DONE, transcript=transcript,
+                            file_path=file_path, prepared_path=None, gcs_uri=None, structured=structured,
+                            settings=settings, route=None)
+        operation_store.add(record)
+        return record
+    fields = dict(file_path=file_path, prepared_path=prepared_path, gcs_uri=gcs_uri, structured=structured,
+                  settings=settings, route=route._asdict() if route else None)
+
+    if route is not None and route.method == "recognize":
+        # Short enough to get the transcript right away; recorded all the same
+        response = _recognize(config, audio, route)
+        transcript = _finish_recognition(response, gcs_uri, prepared_path, structured)
+        _cache_store(audio_hash, transcript, settings)
+        if isinstance(transcript, Transcript):
+            transcript = transcript.to_json()
+        record = new_record("recognize/" + audio_hash, audio_hash, event_id, state=DONE, transcript=transcript, **fields)
+        operation_store.add(record)
+        return record
+
+    operation = get_speech_client().long_running_recognize(config=config, audio=audio)
+    record = new_record(operation.operation.name, audio_hash, event_id, **fields)
+    operation_store.add(record)
+    logger.info(f"Started operation {record['name']} for {file_path}")
+    return record
+
+def _check_operation(record):
+    """Look at an operation once (for OperationPoller); fields to store once it has finished"""
+    operation = get_speech_client().get_operation(request={"name": record["name"]})
+    if not operation.done:
+        return None
+    if operation.error.code:
+        return {"state": FAILED, "error": operation.error.message}
+
+    if record.get("route"):
+        # Includes the polling delay, which is what the caller waited for
+        log_latency(Route(**record["route"]), time.time() - record["created"])
+
+    response = speech.LongRunningRecognizeResponse.deserialize(operation.response.value)
+    transcript = _finish_recognition(response, record["gcs_uri"], record["prepared_path"], record["structured"])
+    _cache_store(record["audio_hash"], transcript, record["settings"])
+    if isinstance(transcript, Transcript):
+        transcript = transcript.to_json()
+    return {"state": DONE, "transcript": transcript}
+
+def _prepare_chunked(file_path):
+    if not CHUNKED_AVAILABLE:
+        logger.error("Chunked transcription requested but not available")
+        raise _TranscriptionFailed("Chunked transcription not available")
+
+    # Chunks are sent inline, so keep them as uncompressed mono WAV
+    file_path, sample_rate = analyze_and_prepare_audio(file_path, encoding="wav")
+    if not file_path or not sample_rate:
+        raise _TranscriptionFailed("Error analyzing audio file")
+    return file_path, sample_rate
+
+def _chunk_model():
+    """Chunks are pieces of a meeting, so they use the long-form model when routing"""
+    return ROUTING_POLICY.long_model if ROUTING_POLICY else None
+
+def _transcribe_chunked(file_path, structured=False):
+    try:
+        file_path, sample_rate = _prepare_chunked(file_path)
+        recognizer = google_recognizer(sample_rate, LANGUAGE_CODE, client=get_speech_client(), structured=structured,
+                                       model=_chunk_model())
+        transcript, chunks = transcribe_chunked(file_path, recognizer=recognizer)
+        logger.info(f"Transcribed {len(chunks)} chunks")
+        if structured:
+            return _restore_original_times(transcript, file_path)
+        return transcript
+    except _NoSpeech:
+        return _empty_transcript(structured)
+    except _TranscriptionFailed as e:
+        return f"Transcription failed: {str(e)}"
+    except Exception as e:
+        logger.error(f"Error during chunked transcription: {str(e)}")
+        return f"Transcription failed: {str(e)}"
+
+async def _transcribe_chunked_async(file_path, structured=False):
+    try:
+        file_path, sample_rate = await asyncio.to_thread(_prepare_chunked, file_path)
+        recognizer = google_async_recognizer(sample_rate, LANGUAGE_CODE, client=get_async_speech_client(),
+                                             structured=structured, model=_chunk_model())
+        transcript, chunks = await transcribe_chunked_async(file_path, recognizer=recognizer)
+        logger.info(f"Transcribed {len(chunks)} chunks")
+        if structured:
+            return await asyncio.to_thread(_restore_original_times, transcript, file_path)
+        return transcript
+    except _NoSpeech:
+        return _empty_transcript(structured)
+    except _TranscriptionFailed as e:
+        return f"Transcription failed: {str(e)}"
+    except Exception as e:
+        logger.error(f"Error during chunked transcription: {str(e)}")
+        return f"Transcription failed: {str(e)}"
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Usage: python stt.py <audio_file.wav>")
@@ -0,0 +1,218 @@
+"""
+DiskOperationStore and OperationPoller on a temporary directory, with a
+fake check in place of the Speech API. Run from Backend:
+python -m pytest --import-mode=importlib stt
+"""
+import json
+import time
+import multiprocessing
+
+import pytest
+
+from stt.operations import (DiskOperationStore, OperationPoller, new_record,
+                            RUNNING, DONE, FAILED, DELIVERED)
+
+EVENT = {"email": "a@example.com", "event_index": 0}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DiskOperationStore(str(tmp_path))
+
+
+def _add(store, name, audio_hash="audio", event_id=EVENT, **fields):
+    record = new_record(name, audio_hash, event_id, **fields)
+    store.add(record)
+    return record
+
+
+class FakeCheck:
+    """Reports an operation as running until it has been checked `polls` times"""
+
+    def __init__(self, polls, result=None):
+        self.polls = polls
+        self.result = result or {"state": DONE, "transcript": "hello"}
+        self.calls = []
+
+    def __call__(self, record):
+        self.calls.append(dict(record))
+        if len(self.calls) < self.polls:
+            return None
+        return self.result
+
+
+def test_find_returns_newest_operation_that_did_not_fail(store):
+    _add(store, "op/1", state=DONE, transcript="first")
+    assert store.find("audio")["name"] == "op/1"
+
+    _add(store, "op/2")
+    assert store.find("audio")["name"] == "op/2"
+
+    store.update("op/2", state=FAILED, error="boom")
+    assert store.find("audio")["name"] == "op/1"
+    assert store.find("other") is None
+
+
+def test_delivered_operations_are_still_found_for_reuse(store):
+    _add(store, "op/1", state=DONE, transcript="text")
+    store.update("op/1", state=DELIVERED)
+
+    assert store.find("audio")["state"] == DELIVERED
+    assert store.get("op/1")["transcript"] == "text"
+
+
+def test_unfinished_and_undelivered(store):
+    _add(store, "running")
+    _add(store, "done", state=DONE)
+    _add(store, "failed", state=FAILED, error="boom")
+    _add(store, "no-event", event_id=None, state=DONE)
+    _add(store, "delivered", state=DONE)
+    store.update("delivered", state=DELIVERED)
+
+    assert [record["name"] for record in store.unfinished()] == ["running"]
+    assert sorted(record["name"] for record in store.undelivered()) == ["done", "failed"]
+
+
+def test_settled_records_are_kept_out_of_the_scanned_directory(store, tmp_path):
+    _add(store, "op/1", state=DONE)
+    store.update("op/1", state=DELIVERED)
+    assert not (tmp_path / "op_1.json").exists()
+    assert (tmp_path / "settled" / "op_1.json").exists()
+
+    # Reused for another event: waiting to be delivered again
+    store.update("op/1", state=DONE, event_id={"email": "b@example.com", "event_index": 1})
+    assert (tmp_path / "op_1.json").exists()
+    assert not (tmp_path / "settled" / "op_1.json").exists()
+    assert [record["name"] for record in store.undelivered()] == ["op/1"]
+
+
+def test_prune_removes_only_old_settled_records(store, tmp_path):
+    _add(store, "old", audio_hash="a1", state=DONE)
+    store.update("old", state=DELIVERED)
+    _add(store, "failed", audio_hash="a2", event_id=None, state=FAILED, error="boom")
+    _add(store, "waiting", audio_hash="a3", state=DONE)
+    _add(store, "running", audio_hash="a4")
+    time.sleep(0.05)
+    _add(store, "recent", audio_hash="a5", state=DONE)
+    store.update("recent", state=DELIVERED)
+
+    assert store.prune(ttl=0.04) == 2
+    assert store.get("old") is None and store.get("failed") is None
+    assert store.find("a1") is None
+    assert not (tmp_path / "by_audio" / "a1.json").exists()
+    assert all(store.get(name) is not None for name in ("waiting", "running", "recent"))
+
+
+def test_update_if_state(store):
+    _add(store, "op/1")
+    store.update("op/1", state=DELIVERED)
+
+    assert store.update("op/1", if_state=RUNNING, attempts=3) is None
+    assert store.get("op/1")["attempts"] == 0
+    assert store.update("op/1", if_state=DELIVERED, attempts=3)["attempts"] == 3
+    with pytest.raises(KeyError):
+        store.update("missing", state=DONE)
+
+
+def _update_many(directory, field, count):
+    store = DiskOperationStore(directory)
+    for i in range(count):
+        store.update("op/1", **{field: i})
+
+
+def test_updates_from_several_processes_are_not_lost(store, tmp_path):
+    _add(store, "op/1", a=-1, b=-1)
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_update_many, args=(str(tmp_path), field, 100)) for field in "ab"]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+
+    record = store.get("op/1")
+    # Each update rereads the record under the lock, so neither overwrote the other's field
+    assert (record["a"], record["b"]) == (99, 99)
+
+
+def test_old_directory_layout_is_indexed(tmp_path):
+    for record in (new_record("op/1", "audio", EVENT, state=DELIVERED),
+                   new_record("op/2", "audio", EVENT)):
+        with open(tmp_path / (record["name"].replace("/", "_") + ".json"), "w") as f:
+            json.dump(record, f)
+
+    store = DiskOperationStore(str(tmp_path))
+    assert store.find("audio")["name"] == "op/2"
+    assert (tmp_path / "settled" / "op_1.json").exists()
+    assert [record["name"] for record in store.unfinished()] == ["op/2"]
+
+
+def test_poller_backs_off_exponentially(store):
+    _add(store, "op/1")
+    check = FakeCheck(polls=5)
+    poller = OperationPoller(store, check, initial_delay=10, max_delay=40, multiplier=2)
+
+    delays = []
+    for _ in range(4):
+        before = time.time()
+        record = poller.poll(store.get("op/1"))
+        delays.append(round(record["next_poll"] - before))
+    assert delays == [20, 40, 40, 40]
+    assert record["attempts"] == 4
+    assert record["state"] == RUNNING
+
+    record = poller.poll(store.get("op/1"))
+    assert record["state"] == DONE and record["transcript"] == "hello"
+
+
+def test_poll_due_only_polls_operations_that_are_due(store):
+    _add(store, "due", audio_hash="a1", next_poll=time.time() - 1)
+    _add(store, "later", audio_hash="a2", next_poll=time.time() + 100)
+    check = FakeCheck(polls=1)
+
+    finished = OperationPoller(store, check).poll_due()
+    assert [record["name"] for record in finished] == ["due"]
+    assert [record["name"] for record in check.calls] == ["due"]
+
+
+def test_new_process_resumes_polling_where_the_last_stopped(tmp_path):
+    first = DiskOperationStore(str(tmp_path))
+    _add(first, "op/1")
+    poller = OperationPoller(first, FakeCheck(polls=10), initial_delay=100)
+    poller.poll(first.get("op/1"))
+    poller.poll(first.get("op/1"))
+
+    # A restarted scheduler opens the same directory
+    second = DiskOperationStore(str(tmp_path))
+    check = FakeCheck(polls=1)
+    restarted = OperationPoller(second, check, initial_delay=100)
+    assert restarted.poll_due() == []
+    assert check.calls == []
+
+    second.update("op/1", next_poll=time.time() - 1)
+    finished = restarted.poll_due()
+    assert [record["state"] for record in finished] == [DONE]
+    # The backoff state came from the store
+    assert check.calls[0]["attempts"] == 2
+
+
+def test_poll_does_not_undo_another_process_finishing(store):
+    _add(store, "op/1")
+    stale = store.get("op/1")
+    store.update("op/1", state=DONE, transcript="theirs")
+    store.update("op/1", state=DELIVERED)
+
+    record = OperationPoller(store, FakeCheck(polls=1)).poll(stale)
+    assert record["state"] == DELIVERED
+    assert record["transcript"] == "theirs"
+
+
+def test_wait_polls_until_done(store):
+    _add(store, "op/1", next_poll=time.time())
+    check = FakeCheck(polls=3, result={"state": FAILED, "error": "no speech"})
+    poller = OperationPoller(store, check, initial_delay=0.01, max_delay=0.02)
+
+    record = poller.wait("op/1", timeout=10)
+    assert record["state"] == FAILED
+    assert len(check.calls) == 3
+    with pytest.raises(KeyError):
+        poller.wait("missing")
@@ -0,0 +1,181 @@
+"""
+StreamingTranscriber against a fake streaming_recognize. Run from
+Backend: python -m pytest --import-mode=importlib stt
+"""
+import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("google.cloud.speech")
+
+from stt.streaming import StreamingTranscriber, MAX_REQUEST_BYTES, STREAM_SOFT_LIMIT, STREAM_HARD_LIMIT
+
+SAMPLE_RATE = 16000
+# One block per streaming request: 0.512 s
+BLOCK_FRAMES = MAX_REQUEST_BYTES // 2
+BLOCK_SECONDS = BLOCK_FRAMES / SAMPLE_RATE
+
+
+def _block(index, quiet=False):
+    """A block whose first sample is its index; loud, or quiet enough to count as a pause"""
+    block = np.full(BLOCK_FRAMES, 0 if quiet else 1000, dtype=np.int16)
+    block[0] = index
+    return block
+
+
+def _result(text, end_blocks, is_final, start_blocks=None):
+    words = []
+    if start_blocks is not None:
+        words = [SimpleNamespace(start_time=datetime.timedelta(seconds=start_blocks * BLOCK_SECONDS))]
+    alternative = SimpleNamespace(transcript=text, words=words, confidence=0.9)
+    return SimpleNamespace(alternatives=[alternative], is_final=is_final, stability=0.5,
+                           result_end_time=datetime.timedelta(seconds=end_blocks * BLOCK_SECONDS))
+
+
+class FakeSpeechClient:
+    """
+    Recognises every FINAL_EVERY blocks a stream receives as one final result
+    "b<first>-<last>" (block indexes read from the audio), with an interim
+    result in between, and the rest once the stream is half-closed. fail
+    maps a stream number (from 1) to the number of blocks after which it
+    breaks.
+    """
+
+    FINAL_EVERY = 20
+
+    def __init__(self, fail=None):
+        self.fail = dict(fail or {})
+        self.streams = []
+
+    def streaming_recognize(self, config, requests):
+        number = len(self.streams) + 1
+        received = []
+        self.streams.append(received)
+        finalised = 0
+        for request in requests:
+            received.append(int(np.frombuffer(request.audio_content[:2], dtype=np.int16)[0]))
+            if self.fail.get(number) == len(received):
+                raise ConnectionError("stream reset")
+            if len(received) - finalised == self.FINAL_EVERY:
+                yield self._final(received, finalised)
+                finalised = len(received)
+            elif len(received) - finalised == self.FINAL_EVERY // 2:
+                yield SimpleNamespace(results=[_result("...", len(received), False)])
+        if len(received) > finalised:
+            yield self._final(received, finalised)
+
+    @staticmethod
+    def _final(received, finalised):
+        text = f"b{received[finalised]}-{received[-1]}"
+        return SimpleNamespace(results=[_result(text, len(received), True, start_blocks=finalised)])
+
+
+def _transcribe(blocks, client):
+    transcriber = StreamingTranscriber(sample_rate=SAMPLE_RATE, client=client).start()
+    for block in blocks:
+        transcriber.feed(block)
+    return transcriber, transcriber.close(timeout=60)
+
+
+def _covered(transcript):
+    """Block indexes named by the final results, in order"""
+    blocks = []
+    for text in transcript.split():
+        first, last = (int(value) for value in text[1:].split("-"))
+        blocks.extend(range(first, last + 1))
+    return blocks
+
+
+def test_rotates_at_first_pause_after_soft_limit():
+    pause = int(250 / BLOCK_SECONDS)
+    count = int(400 / BLOCK_SECONDS)
+    client = FakeSpeechClient()
+    transcriber, transcript = _transcribe([_block(i, quiet=i == pause) for i in range(count)], client)
+
+    assert transcriber.error is None
+    assert [len(stream) for stream in client.streams] == [pause + 1, count - pause - 1]
+    assert STREAM_SOFT_LIMIT <= len(client.streams[0]) * BLOCK_SECONDS < 251
+    assert _covered(transcript) == list(range(count))
+
+
+def test_rotates_at_hard_limit_without_pauses():
+    count = int(700 / BLOCK_SECONDS)
+    client = FakeSpeechClient()
+    transcriber, transcript = _transcribe([_block(i) for i in range(count)], client)
+
+    per_stream = int(np.ceil(STREAM_HARD_LIMIT / BLOCK_SECONDS))
+    assert [len(stream) for stream in client.streams] == [per_stream, per_stream, count - 2 * per_stream]
+    # Quiet blocks never came, so only the hard limit rotated the streams
+    assert all(len(stream) * BLOCK_SECONDS < STREAM_HARD_LIMIT + BLOCK_SECONDS for stream in client.streams)
+    # Each stream carries on right after the last one
+    assert client.streams[1][0] == client.streams[0][-1] + 1
+    assert _covered(transcript) == list(range(count))
+    assert transcriber.finals[-1].end == pytest.approx(count * BLOCK_SECONDS)
+
+
+def test_failed_stream_resends_audio_not_finalised():
+    count = 100
+    # The first stream breaks after 35 blocks, with only the first 20 finalised
+    client = FakeSpeechClient(fail={1: 35})
+    transcriber, transcript = _transcribe([_block(i) for i in range(count)], client)
+
+    assert transcriber.error is None
+    assert transcriber.reconnects == 1
+    assert client.streams[0] == list(range(35))
+    # Blocks 20-34 were sent but never finalised, so the next stream starts over from 20
+    assert client.streams[1][0] == FakeSpeechClient.FINAL_EVERY
+    assert _covered(transcript) == list(range(count))
+    # Times of the second stream's results are still relative to the whole recording
+    assert transcriber.finals[1].start == pytest.approx(20 * BLOCK_SECONDS)
+
+
+def test_gives_up_after_max_reconnects():
+    client = FakeSpeechClient(fail={1: 1, 2: 1})
+    transcriber = StreamingTranscriber(sample_rate=SAMPLE_RATE, client=client, max_reconnects=1).start()
+    transcriber.feed(_block(0))
+    transcriber.close(timeout=60)
+
+    assert isinstance(transcriber.error, ConnectionError)
+    assert len(client.streams) == 2
+
+
+def test_results_reach_a_consumer_in_order():
+    client = FakeSpeechClient()
+    transcriber = StreamingTranscriber(sample_rate=SAMPLE_RATE, client=client)
+    results = transcriber.results()
+    transcriber.start()
+    for i in range(50):
+        transcriber.feed(_block(i))
+    transcript = transcriber.close(timeout=60)
+
+    received = list(results)
+    assert " ".join(result.text for result in received if result.is_final) == transcript
+    assert any(not result.is_final for result in received)
+
+
+def test_results_are_not_kept_without_a_consumer():
+    transcriber, _ = _transcribe([_block(i) for i in range(200)], FakeSpeechClient())
+
+    # Only the end marker
+    assert transcriber._results.qsize() == 1
+    assert len(transcriber.finals) == 10
+
+
+def test_results_queue_is_bounded():
+    client = FakeSpeechClient()
+    transcriber = StreamingTranscriber(sample_rate=SAMPLE_RATE, client=client, results_queue_size=5)
+    results = transcriber.results()
+    transcriber.start()
+    for i in range(200):
+        transcriber.feed(_block(i))
+    transcript = transcriber.close(timeout=60)
+
+    received = list(results)
+    assert len(received) == 4
+    # 20 results and the end marker went through a queue of 5
+    assert transcriber.dropped_results == 21 - 5
+    assert received[-1].text == transcript.split()[-1]
+    # The transcript itself is complete
+    assert _covered(transcript) == list(range(200))
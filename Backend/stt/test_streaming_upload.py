@@ -0,0 +1,221 @@
+"""
+StreamingGCSUpload against a local stand-in for the GCS resumable upload
+API. Run from Backend: python -m pytest --import-mode=importlib stt
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+import requests
+
+from stt import streaming_upload
+from stt.streaming_upload import StreamingGCSUpload, CHUNK_GRANULARITY
+
+KIB_256 = CHUNK_GRANULARITY
+
+
+class FakeGCS:
+    """
+    One bucket of resumable uploads. Each PUT is recorded as (content_range,
+    length, status); faults maps the number of a PUT (from 1, queries
+    included) to (bytes of it to keep, status to reply with).
+    """
+
+    def __init__(self):
+        self.uploads = {}
+        self.objects = {}
+        self.puts = []
+        self.faults = {}
+        self.errors = []
+        self.initiate_status = 200
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, headers=()):
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if fake.initiate_status != 200:
+                    return self._reply(fake.initiate_status)
+                name = self.path.split("name=", 1)[1]
+                upload_id = str(len(fake.uploads))
+                fake.uploads[upload_id] = {"name": name, "data": bytearray(), "done": False}
+                self._reply(200, [("Location", f"{fake.url}/session/{upload_id}")])
+
+            def do_PUT(self):
+                data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with fake._lock:
+                    status, headers = fake._put(self.path.rsplit("/", 1)[1],
+                                                self.headers["Content-Range"], data)
+                self._reply(status, headers)
+
+        return Handler
+
+    def _put(self, upload_id, content_range, data):
+        upload = self.uploads[upload_id]
+        keep, fault_status = self.faults.get(len(self.puts) + 1, (None, None))
+        span, total = content_range[len("bytes "):].split("/")
+
+        if span == "*":
+            # Offset query, or an empty final request
+            status = 200 if upload["done"] else 308
+        else:
+            start, end = (int(value) for value in span.split("-"))
+            if upload["done"] or start != len(upload["data"]) or end - start + 1 != len(data):
+                self.errors.append(f"bad request {content_range} with {len(data)} bytes, "
+                                   f"{len(upload['data'])} persisted")
+                self.puts.append((content_range, len(data), 400))
+                return 400, []
+            if total == "*" and len(data) % KIB_256:
+                self.errors.append(f"chunk of {len(data)} bytes is not a multiple of 256 KiB")
+            upload["data"] += data[:keep] if keep is not None else data
+            status = 308
+        if total != "*" and len(upload["data"]) == int(total):
+            upload["done"] = True
+            self.objects[upload["name"]] = bytes(upload["data"])
+            status = 200
+
+        status = fault_status or status
+        self.puts.append((content_range, len(data), status))
+        if status == 308 and upload["data"]:
+            return status, [("Range", f"bytes=0-{len(upload['data']) - 1}")]
+        return status, []
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def gcs(monkeypatch):
+    fake = FakeGCS()
+    monkeypatch.setattr(streaming_upload, "STORAGE_EMULATOR_HOST", fake.url)
+    yield fake
+    fake.close()
+
+
+def _upload(gcs, data, chunk_size=2 * KIB_256, piece=100_003):
+    upload = StreamingGCSUpload("bucket", "meeting.raw", chunk_size=chunk_size,
+                                session=requests.Session()).start()
+    for start in range(0, len(data), piece):
+        upload.write(data[start:start + piece])
+    return upload, upload.close()
+
+
+def _data(size):
+    return np.random.default_rng(0).integers(0, 256, size, dtype=np.uint8).tobytes()
+
+
+def test_chunks_on_256k_boundaries(gcs):
+    data = _data(5 * KIB_256 + 12_345)
+    upload, uri = _upload(gcs, data)
+
+    assert uri == "gs://bucket/meeting.raw"
+    assert gcs.objects["meeting.raw"] == data
+    assert gcs.errors == []
+    assert [put[:2] for put in gcs.puts] == [
+        (f"bytes 0-{2 * KIB_256 - 1}/*", 2 * KIB_256),
+        (f"bytes {2 * KIB_256}-{4 * KIB_256 - 1}/*", 2 * KIB_256),
+        (f"bytes {4 * KIB_256}-{len(data) - 1}/{len(data)}", KIB_256 + 12_345),
+    ]
+    assert upload.bytes_uploaded == len(data)
+    assert upload.retries == 0
+
+
+def test_exact_multiple_is_finalised_with_the_last_chunk(gcs):
+    data = _data(4 * KIB_256)
+    upload, uri = _upload(gcs, data)
+
+    assert gcs.objects["meeting.raw"] == data
+    # Either the last chunk carries the total, or (if it was sent before
+    # close) an empty request does
+    assert gcs.puts[-1][0] in (f"bytes {2 * KIB_256}-{len(data) - 1}/{len(data)}", f"bytes */{len(data)}")
+    assert gcs.errors == []
+
+
+def test_numpy_blocks_are_sent_as_raw_pcm(gcs):
+    audio = np.arange(300_000, dtype=np.int16)
+    upload = StreamingGCSUpload("bucket", "meeting.raw", chunk_size=KIB_256,
+                                session=requests.Session()).start()
+    for block in np.array_split(audio, 37):
+        upload.write(block)
+
+    assert upload.close() == "gs://bucket/meeting.raw"
+    assert gcs.objects["meeting.raw"] == audio.tobytes()
+
+
+def test_partial_chunk_recovered_from_offset_query(gcs):
+    data = _data(5 * KIB_256 + 777)
+    # The second chunk fails after the server kept only its first 256 KiB
+    gcs.faults[2] = (KIB_256, 503)
+    upload, uri = _upload(gcs, data)
+
+    assert uri == "gs://bucket/meeting.raw"
+    assert gcs.objects["meeting.raw"] == data
+    assert gcs.errors == []
+    assert upload.retries == 1
+    ranges = [put[0] for put in gcs.puts]
+    # Failed PUT, offset query, then only the part the server did not keep
+    assert ranges[1:4] == [
+        f"bytes {2 * KIB_256}-{4 * KIB_256 - 1}/*",
+        "bytes */*",
+        f"bytes {3 * KIB_256}-{4 * KIB_256 - 1}/*",
+    ]
+    # Only the 256 KiB the server dropped went over the wire twice
+    assert sum(length for _, length, _ in gcs.puts) == len(data) + KIB_256
+
+
+def test_failed_put_resent_when_nothing_was_kept(gcs):
+    data = _data(3 * KIB_256)
+    gcs.faults[1] = (0, 500)
+    upload, uri = _upload(gcs, data)
+
+    assert gcs.objects["meeting.raw"] == data
+    assert [put[0] for put in gcs.puts[:3]] == [
+        f"bytes 0-{2 * KIB_256 - 1}/*", "bytes */*", f"bytes 0-{2 * KIB_256 - 1}/*",
+    ]
+    assert gcs.errors == []
+
+
+def test_lost_reply_to_final_chunk(gcs):
+    data = _data(KIB_256 + 10)
+    # The object is complete but the client sees an error
+    gcs.faults[1] = (None, 503)
+    upload, uri = _upload(gcs, data, chunk_size=2 * KIB_256)
+
+    assert uri == "gs://bucket/meeting.raw"
+    assert gcs.objects["meeting.raw"] == data
+    # The offset query finds the object finished; nothing is sent again
+    assert [put[0] for put in gcs.puts] == [f"bytes 0-{len(data) - 1}/{len(data)}", "bytes */*"]
+    assert upload.bytes_uploaded == len(data)
+
+
+def test_empty_recording_is_finalised(gcs):
+    upload, uri = _upload(gcs, b"")
+
+    assert uri == "gs://bucket/meeting.raw"
+    assert gcs.objects["meeting.raw"] == b""
+
+
+def test_rejected_upload_returns_none(gcs):
+    gcs.initiate_status = 403
+    upload, uri = _upload(gcs, _data(KIB_256))
+
+    assert uri is None
+    assert isinstance(upload.error, streaming_upload.UploadError)
+    assert gcs.puts == []
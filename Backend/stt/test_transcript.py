@@ -0,0 +1,83 @@
+"""
+Transcript serialisation round trips: JSON (what the transcript cache and
+operation store keep) and the binary form. Run from Backend:
+python -m pytest --import-mode=importlib stt
+"""
+import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from stt.transcript import Transcript
+
+
+def _word(word, start, end, confidence):
+    return SimpleNamespace(word=word, start_time=datetime.timedelta(seconds=start),
+                           end_time=datetime.timedelta(seconds=end), confidence=confidence)
+
+
+def _result(words, transcript="", end=0.0, confidence=0.0):
+    alternative = SimpleNamespace(words=words, transcript=transcript, confidence=confidence)
+    return SimpleNamespace(alternatives=[alternative], result_end_time=datetime.timedelta(seconds=end))
+
+
+@pytest.fixture
+def transcript():
+    results = [
+        _result([_word("hello", 0.0, 0.42, 0.91), _word("everyone", 0.42, 1.105, 0.875)]),
+        # An utterance without word timings, and one without words at all
+        _result([], transcript="next sprint", end=3.5, confidence=0.6),
+        _result([]),
+        _result([_word("hello", 4.0, 4.3, 0.5), _word("café", 4.3, 4.9, 0.99)]),
+    ]
+    return Transcript.from_results(results, offset=60.0)
+
+
+def _assert_same(copy, transcript, confidence_tolerance=0.0):
+    assert copy.vocabulary == transcript.vocabulary
+    assert copy.text == transcript.text
+    assert copy.word_ids.tolist() == transcript.word_ids.tolist()
+    assert copy.starts.tolist() == transcript.starts.tolist()
+    assert copy.ends.tolist() == transcript.ends.tolist()
+    assert copy.segments.tolist() == transcript.segments.tolist()
+    np.testing.assert_allclose(copy.confidence, transcript.confidence, atol=confidence_tolerance)
+    assert copy.segment_texts() == transcript.segment_texts()
+
+
+def test_words_and_timings(transcript):
+    assert transcript.text == "hello everyone next sprint hello café"
+    # "hello" is stored once
+    assert transcript.vocabulary == ["hello", "everyone", "next", "sprint", "café"]
+    assert transcript.starts.tolist() == [60000, 60420, 63500, 63500, 64000, 64300]
+    assert transcript.ends.tolist() == [60420, 61105, 63500, 63500, 64300, 64900]
+    assert transcript.segments.tolist() == [0, 2, 4]
+
+
+def test_json_round_trip(transcript):
+    copy = Transcript.from_json(transcript.to_json())
+    # Confidence is written with three decimals
+    _assert_same(copy, transcript, confidence_tolerance=5e-4)
+    assert list(copy.words())[1][:3] == ("everyone", 60.42, 61.105)
+
+
+def test_bytes_round_trip(transcript):
+    data = transcript.to_bytes()
+    copy = Transcript.from_bytes(data)
+    _assert_same(copy, transcript)
+    assert copy.to_bytes() == data
+
+
+def test_empty_transcript_round_trips():
+    empty = Transcript.empty()
+    for copy in (Transcript.from_json(empty.to_json()), Transcript.from_bytes(empty.to_bytes())):
+        _assert_same(copy, empty)
+        assert len(copy) == 0
+        assert copy.text == ""
+        assert copy.duration == 0.0
+        assert copy.segment_texts() == []
+
+
+def test_bytes_form_is_checked():
+    with pytest.raises(ValueError):
+        Transcript.from_bytes(b"XXXX" + bytes(12))
@@ -0,0 +1,241 @@
+import json
+import struct
+import numpy as np
+
+_MAGIC = b"DTR1"
+_HEADER = struct.Struct("<4sIII")
+
+
+def _seconds(duration):
+    """Seconds in a proto Duration (a timedelta in newer client libraries)"""
+    if duration is None:
+        return 0.0
+    if hasattr(duration, "total_seconds"):
+        return duration.total_seconds()
+    return duration.seconds + duration.nanos / 1e9
+
+
+class Transcript:
+    """
+    Words of a transcript with their timings, stored as parallel arrays.
+
+    Each word is an index into `vocabulary` (so repeated words are stored
+    once), with start and end times in milliseconds and the recogniser's
+    confidence (0 when unknown). `segments` holds the index of the first
+    word of each recognition result, i.e. each utterance. Words are in time
+    order, which makes slicing by time a binary search.
+    """
+
+    def __init__(self, vocabulary, word_ids, starts, ends, confidence, segments):
+        self.vocabulary = list(vocabulary)
+        self.word_ids = np.asarray(word_ids, dtype=np.int32)
+        self.starts = np.asarray(starts, dtype=np.int32)
+        self.ends = np.asarray(ends, dtype=np.int32)
+        self.confidence = np.asarray(confidence, dtype=np.float32)
+        self.segments = np.asarray(segments, dtype=np.int32)
+
+    @classmethod
+    def empty(cls):
+        return cls([], [], [], [], [], [])
+
+    @classmethod
+    def from_results(cls, results, offset=0.0):
+        """
+        Build from Speech API results recognised with word time offsets;
+        offset (seconds) is added to every time.
+        """
+        builder = _Builder()
+        for result in results:
+            if not result.alternatives:
+                continue
+            alternative = result.alternatives[0]
+            builder.segment()
+            if alternative.words:
+                for word in alternative.words:
+                    builder.add(word.word, offset + _seconds(word.start_time),
+                                offset + _seconds(word.end_time), word.confidence)
+            else:
+                # No word timings: put the whole result at its end time
+                end = offset + _seconds(getattr(result, "result_end_time", None))
+                for word in alternative.transcript.split():
+                    builder.add(word, end, end, alternative.confidence)
+        return builder.build()
+
+    @classmethod
+    def from_text(cls, text, start=0.0, end=None, confidence=0.0):
+        """Spread the words of plain text evenly between start and end (seconds)"""
+        words = text.split()
+        if end is None:
+            end = start + 0.4 * len(words)
+        edges = np.linspace(start, end, len(words) + 1)
+        builder = _Builder()
+        builder.segment()
+        for word, word_start, word_end in zip(words, edges[:-1], edges[1:]):
+            builder.add(word, word_start, word_end, confidence)
+        return builder.build()
+
+    @classmethod
+    def concatenate(cls, transcripts):
+        """Join transcripts (already in time order) into one"""
+        vocabulary = []
+        index = {}
+        parts = []
+        word_count = 0
+        for transcript in transcripts:
+            remap = np.empty(len(transcript.vocabulary), dtype=np.int32)
+            for i, word in enumerate(transcript.vocabulary):
+                if word not in index:
+                    index[word] = len(vocabulary)
+                    vocabulary.append(word)
+                remap[i] = index[word]
+            parts.append((transcript, remap, word_count))
+            word_count += len(transcript)
+
+        def joined(values, dtype):
+            return np.concatenate([values(*part) for part in parts]) if parts else np.empty(0, dtype)
+
+        return cls(
+            vocabulary,
+            joined(lambda t, remap, _: remap[t.word_ids], np.int32),
+            joined(lambda t, *_: t.starts, np.int32),
+            joined(lambda t, *_: t.ends, np.int32),
+            joined(lambda t, *_: t.confidence, np.float32),
+            joined(lambda t, _, base: t.segments + base, np.int32),
+        )
+
+    def shifted(self, seconds):
+        """The same transcript with every time moved by `seconds`"""
+        delta = int(round(seconds * 1000))
+        return Transcript(self.vocabulary, self.word_ids, self.starts + delta, self.ends + delta,
+                          self.confidence, self.segments)
+
+    def map_times(self, function):
+        """A copy with every time passed through function (seconds array -> seconds array)"""
+        starts = np.rint(np.asarray(function(self.starts / 1000)) * 1000)
+        ends = np.rint(np.asarray(function(self.ends / 1000)) * 1000)
+        return Transcript(self.vocabulary, self.word_ids, starts, ends, self.confidence, self.segments)
+
+    def __len__(self):
+        return len(self.word_ids)
+
+    def __str__(self):
+        return self.text
+
+    @property
+    def text(self):
+        vocabulary = self.vocabulary
+        return " ".join(vocabulary[i] for i in self.word_ids.tolist())
+
+    @property
+    def duration(self):
+        return int(self.ends[-1]) / 1000 if len(self) else 0.0
+
+    def words(self):
+        """Yield (word, start seconds, end seconds, confidence)"""
+        vocabulary = self.vocabulary
+        for i, start, end, confidence in zip(self.word_ids.tolist(), self.starts.tolist(),
+                                             self.ends.tolist(), self.confidence.tolist()):
+            yield vocabulary[i], start / 1000, end / 1000, confidence
+
+    def slice(self, start, end):
+        """Words starting in [start, end) seconds, as a new Transcript sharing the vocabulary"""
+        first = int(np.searchsorted(self.starts, int(round(start * 1000)), side="left"))
+        last = int(np.searchsorted(self.starts, int(round(end * 1000)), side="left"))
+        segments = self.segments[(self.segments > first) & (self.segments < last)] - first
+        if last > first:
+            segments = np.concatenate(([0], segments))
+        return Transcript(self.vocabulary, self.word_ids[first:last], self.starts[first:last],
+                          self.ends[first:last], self.confidence[first:last], segments)
+
+    def segment_texts(self):
+        """(start seconds, end seconds, text) of each utterance"""
+        bounds = np.append(self.segments, len(self)).tolist()
+        vocabulary = self.vocabulary
+        word_ids, starts, ends = self.word_ids.tolist(), self.starts.tolist(), self.ends.tolist()
+        result = []
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            if last > first:
+                text = " ".join(vocabulary[i] for i in word_ids[first:last])
+                result.append((starts[first] / 1000, ends[last - 1] / 1000, text))
+        return result
+
+    def to_dict(self):
+        return {
+            "vocabulary": self.vocabulary,
+            "word_ids": self.word_ids.tolist(),
+            "starts": self.starts.tolist(),
+            "ends": self.ends.tolist(),
+            "confidence": np.round(self.confidence, 3).tolist(),
+            "segments": self.segments.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["vocabulary"], data["word_ids"], data["starts"], data["ends"],
+                   data["confidence"], data["segments"])
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    def to_bytes(self):
+        """Compact binary form: header, little-endian arrays, then the vocabulary"""
+        vocabulary = "\n".join(self.vocabulary).encode("utf-8")
+        return b"".join((
+            _HEADER.pack(_MAGIC, len(self), len(self.vocabulary), len(self.segments)),
+            self.word_ids.astype("<i4").tobytes(),
+            self.starts.astype("<i4").tobytes(),
+            self.ends.astype("<i4").tobytes(),
+            self.confidence.astype("<f4").tobytes(),
+            self.segments.astype("<i4").tobytes(),
+            vocabulary,
+        ))
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, words, vocabulary_size, segments = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("Not a serialized Transcript")
+        offset = _HEADER.size
+        arrays = []
+        for dtype, count in (("<i4", words), ("<i4", words), ("<i4", words), ("<f4", words), ("<i4", segments)):
+            arrays.append(np.frombuffer(data, dtype=dtype, count=count, offset=offset))
+            offset += 4 * count
+        vocabulary = data[offset:].decode("utf-8").split("\n") if vocabulary_size else []
+        return cls(vocabulary, *arrays)
+
+
+class _Builder:
+    """Collects words in Python lists and turns them into a Transcript once"""
+
+    def __init__(self):
+        self.vocabulary = []
+        self.index = {}
+        self.word_ids = []
+        self.starts = []
+        self.ends = []
+        self.confidence = []
+        self.segments = []
+
+    def segment(self):
+        self.segments.append(len(self.word_ids))
+
+    def add(self, word, start, end, confidence):
+        # Keep the vocabulary splittable on newlines for the binary form
+        word = word.replace("\n", " ")
+        word_id = self.index.get(word)
+        if word_id is None:
+            word_id = self.index[word] = len(self.vocabulary)
+            self.vocabulary.append(word)
+        self.word_ids.append(word_id)
+        self.starts.append(int(round(start * 1000)))
+        self.ends.append(int(round(end * 1000)))
+        self.confidence.append(confidence)
+
+    def build(self):
+        # Results without any words leave empty segments behind
+        segments = sorted(set(s for s in self.segments if s < len(self.word_ids)))
+        return Transcript(self.vocabulary, self.word_ids, self.starts, self.ends, self.confidence, segments)
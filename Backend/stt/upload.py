@@ -0,0 +1,134 @@
+import os
+import hashlib
+import logging
+from threading import Lock
+
+logger = logging.getLogger('stt')
+
+# Files up to this size are sent inline with the recognition request (the
+# API's limit for inline content is 10 MB) instead of going through GCS
+INLINE_MAX_BYTES = int(os.getenv('STT_INLINE_MAX_BYTES', str(9 * 1024 * 1024)))
+
+# Uploaded audio is stored under its content hash in this folder of the bucket
+BLOB_PREFIX = "audio/"
+
+
+def file_sha256(file_path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _split_uri(gcs_uri):
+    bucket_name, _, blob_name = gcs_uri[len("gs://"):].partition("/")
+    return bucket_name, blob_name
+
+
+class AudioUploader:
+    """
+    Decide how audio reaches the Speech API.
+
+    Short files are sent inline, which skips a GCS round trip. Longer ones
+    are uploaded under a name derived from their SHA-256, so a retry or
+    re-run of the same file finds the object already there and skips the
+    upload. Once the transcript is in, delete() removes the objects in one
+    batch request. Counters say how much was uploaded and how much avoided.
+    """
+
+    def __init__(self, bucket_name, inline_max_bytes=INLINE_MAX_BYTES, client=None, client_factory=None):
+        self.bucket_name = bucket_name
+        self.inline_max_bytes = inline_max_bytes
+        self.bytes_uploaded = 0
+        self.uploads = 0
+        self.uploads_avoided = 0
+        self.bytes_avoided = 0
+        self.inline_requests = 0
+        self.blobs_deleted = 0
+        self._client = client
+        self._client_factory = client_factory
+        self._lock = Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            if self._client_factory is not None:
+                return self._client_factory()
+            from google.cloud import storage
+            self._client = storage.Client()
+        return self._client
+
+    def recognition_audio(self, file_path, inline=None):
+        """
+        Return (RecognitionAudio, gcs_uri) for a prepared audio file; gcs_uri
+        is None when the audio is sent inline. inline overrides the decision
+        by size (stt.routing makes it).
+        """
+        from google.cloud import speech
+
+        size = os.path.getsize(file_path)
+        if inline is None:
+            inline = size <= self.inline_max_bytes
+        if inline:
+            with open(file_path, "rb") as f:
+                content = f.read()
+            with self._lock:
+                self.inline_requests += 1
+                self.uploads_avoided += 1
+                self.bytes_avoided += size
+            logger.info(f"Sending {size} bytes inline")
+            return speech.RecognitionAudio(content=content), None
+
+        gcs_uri = self.upload(file_path)
+        return speech.RecognitionAudio(uri=gcs_uri), gcs_uri
+
+    def upload(self, file_path):
+        """Upload a file under its content hash unless it is already there; returns its gs:// URI"""
+        size = os.path.getsize(file_path)
+        blob_name = BLOB_PREFIX + file_sha256(file_path) + os.path.splitext(file_path)[1].lower()
+        gcs_uri = f"gs://{self.bucket_name}/{blob_name}"
+        blob = self.client.bucket(self.bucket_name).blob(blob_name)
+
+        if blob.exists():
+            with self._lock:
+                self.uploads_avoided += 1
+                self.bytes_avoided += size
+            logger.info(f"{gcs_uri} already uploaded, skipping upload")
+            return gcs_uri
+
+        blob.upload_from_filename(file_path)
+        with self._lock:
+            self.uploads += 1
+            self.bytes_uploaded += size
+        logger.info(f"Uploaded {size} bytes to {gcs_uri}")
+        return gcs_uri
+
+    def delete(self, gcs_uris):
+        """Delete objects that are no longer needed, in a single batch request"""
+        gcs_uris = [uri for uri in gcs_uris if uri]
+        if not gcs_uris:
+            return
+        try:
+            client = self.client
+            with client.batch():
+                for uri in gcs_uris:
+                    bucket_name, blob_name = _split_uri(uri)
+                    client.bucket(bucket_name).blob(blob_name).delete()
+            with self._lock:
+                self.blobs_deleted += len(gcs_uris)
+            logger.info(f"Deleted {len(gcs_uris)} objects from GCS")
+        except Exception as e:
+            # Leftover objects only cost storage, so this is not an error
+            logger.warning(f"Could not delete {gcs_uris}: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "bytes_uploaded": self.bytes_uploaded,
+                "uploads": self.uploads,
+                "uploads_avoided": self.uploads_avoided,
+                "bytes_avoided": self.bytes_avoided,
+                "inline_requests": self.inline_requests,
+                "blobs_deleted": self.blobs_deleted,
+            }
@@ -0,0 +1,126 @@
+"""
+Single-prompt versus map-reduce summarisation, with a stub in place of
+Gemini so it runs offline.
+
+Usage: python summarise/benchmark.py [scale]
+
+The stub takes STUB_BASE_SECONDS per request, plus STUB_SECONDS_PER_INPUT_TOKEN
+for each prompt token and STUB_SECONDS_PER_OUTPUT_TOKEN for each token it
+writes. Its summaries are a fifth of the prompt, up to STUB_MAX_OUTPUT_TOKENS.
+All of it is multiplied by scale (default 0.02), so the benchmark takes
+seconds; the times printed are scaled back up.
+
+The rolling summarizer is fed the meeting as it would be during a call,
+but MEETING_SPEEDUP times faster than real time; what matters for it is
+the time from the end of the meeting to the final summary.
+"""
+import os
+import sys
+import time
+import random
+import threading
+
+# Run from Backend so that "summarise" is the package, not summarise/summarise.py next to this script
+sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+import summarise.summarise as summarise_module
+from summarise.summarise import summarize_transcript, estimate_tokens
+from summarise.rolling import RollingSummarizer
+
+STUB_BASE_SECONDS = 0.5
+STUB_SECONDS_PER_INPUT_TOKEN = 0.0002
+STUB_SECONDS_PER_OUTPUT_TOKEN = 0.01
+STUB_MAX_OUTPUT_TOKENS = 400
+# Speaking rate in transcript tokens per minute of meeting
+TOKENS_PER_MINUTE = 200
+# How much faster than real time meetings are played to the rolling summarizer
+MEETING_SPEEDUP = 10
+
+WORDS = ("the team agreed to ship the release on friday after the review "
+         "and the design for the new dashboard still needs feedback from sales").split()
+
+
+def synthetic_sentences(minutes, seed=0):
+    rng = random.Random(seed)
+    sentences = []
+    tokens = 0
+    while tokens < minutes * TOKENS_PER_MINUTE:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 20))).capitalize() + "."
+        sentences.append(sentence)
+        tokens += estimate_tokens(sentence)
+    return sentences
+
+
+def synthetic_transcript(minutes, seed=0):
+    return " ".join(synthetic_sentences(minutes, seed))
+
+
+class StubLLM:
+    def __init__(self, scale):
+        self.scale = scale
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        input_tokens = estimate_tokens(prompt)
+        output_tokens = min(STUB_MAX_OUTPUT_TOKENS, input_tokens // 5)
+        time.sleep(self.scale * (STUB_BASE_SECONDS + input_tokens * STUB_SECONDS_PER_INPUT_TOKEN
+                                 + output_tokens * STUB_SECONDS_PER_OUTPUT_TOKEN))
+        with self._lock:
+            self.in_flight -= 1
+        return " ".join(WORDS[i % len(WORDS)] for i in range(output_tokens))
+
+
+def run(transcript, scale, hierarchical):
+    stub = StubLLM(scale)
+    start = time.perf_counter()
+    summarize_transcript(transcript, hierarchical=hierarchical, generate=stub)
+    return (time.perf_counter() - start) / scale, stub
+
+
+def run_rolling(minutes, scale):
+    """Seconds from the end of the meeting to the final summary, and the stub"""
+    stub = StubLLM(scale)
+    summarizer = RollingSummarizer(generate=stub).start()
+    for sentence in synthetic_sentences(minutes):
+        summarizer.add(sentence)
+        spoken = estimate_tokens(sentence) / TOKENS_PER_MINUTE * 60
+        time.sleep(scale * spoken / MEETING_SPEEDUP)
+    start = time.perf_counter()
+    summarizer.finish()
+    return (time.perf_counter() - start) / scale, stub
+
+
+def main():
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 0.02
+    print(f"Stub LLM: {STUB_BASE_SECONDS} s + {STUB_SECONDS_PER_INPUT_TOKEN * 1000:.1f} s per 1k prompt tokens "
+          f"+ {STUB_SECONDS_PER_OUTPUT_TOKEN * 100:.0f} s per 100 output tokens; "
+          f"chunks of {summarise_module.CHUNK_TOKENS} tokens\n")
+
+    print(f"{'meeting':>8} {'tokens':>7} {'single':>8}   " +
+          "   ".join(f"{f'map-reduce x{p}':>15}" for p in (2, 4, 8, 16)))
+    for minutes in (15, 60, 120, 240, 480):
+        transcript = synthetic_transcript(minutes)
+        single, _ = run(transcript, scale, hierarchical=False)
+        row = f"{minutes:>5} min {estimate_tokens(transcript):>7} {single:>7.1f}s"
+        for parallel in (2, 4, 8, 16):
+            summarise_module.MAX_PARALLEL = parallel
+            elapsed, stub = run(transcript, scale, hierarchical=True)
+            row += f"   {elapsed:>6.1f}s {stub.calls:>3} calls"
+        print(row)
+
+    print(f"\nRolling summary, meeting played {MEETING_SPEEDUP}x faster than real time\n")
+    print(f"{'meeting':>8} {'after end':>10} {'calls':>6}")
+    for minutes in (15, 60, 240):
+        elapsed, stub = run_rolling(minutes, scale)
+        print(f"{minutes:>5} min {elapsed:>9.1f}s {stub.calls:>6}")
+
+
+if __name__ == "__main__":
+    main()
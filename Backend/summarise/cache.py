@@ -0,0 +1,27 @@
+import hashlib
+import logging
+
+from keyed_cache import open_cache
+
+logger = logging.getLogger('summarise')
+
+# Summaries older than this are generated again (SUMMARY_CACHE_TTL)
+CACHE_TTL = 30 * 24 * 3600
+# Least recently used summaries are evicted beyond this total size (SUMMARY_CACHE_MAX_BYTES)
+CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+
+def prompt_version(*parts):
+    """Short hash of the prompt templates (and anything else shaping the prompt)"""
+    return hashlib.sha256("\0".join(str(part) for part in parts).encode()).hexdigest()[:16]
+
+
+def summary_key(transcript, version, model_name):
+    """Cache key: hash of the transcript, the prompt version and the model"""
+    transcript_hash = hashlib.sha256(transcript.encode()).hexdigest()
+    return hashlib.sha256(f"{transcript_hash}:{version}:{model_name}".encode()).hexdigest()
+
+
+def open_summary_cache(backend=None):
+    """The cache selected by SUMMARY_CACHE_BACKEND (see keyed_cache.open_cache), or None if caching is off or unavailable"""
+    return open_cache("SUMMARY", "summaries", "summary", logger, CACHE_MAX_BYTES, ttl=CACHE_TTL, backend=backend)
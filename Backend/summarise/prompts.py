@@ -0,0 +1,44 @@
+import os
+
+# Prompt templates, and the rule for which way a transcript is summarised.
+# Standard library only: ai-api loads this file by path (like cache.py) so
+# that both services key the summary cache the same way.
+
+# Transcripts longer than this (in estimated tokens) are summarised with
+# map-reduce: chunks in parallel, then a summary of the chunk summaries
+HIERARCHICAL_MIN_TOKENS = int(os.getenv('SUMMARY_HIERARCHICAL_MIN_TOKENS', '40000'))
+# Token budget of each chunk, and of each group of summaries in a reduce step
+CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', '8000'))
+
+SUMMARY_PROMPT = """"
+        Summarise {text}
+    """
+
+CHUNK_PROMPT = """
+        This is part {index} of {total} of a meeting transcript.
+        Summarise what was said in it, keeping names, decisions and action items.
+        {text}
+    """
+
+REDUCE_PROMPT = """
+        These are summaries of consecutive parts of one meeting, in order.
+        Combine them into one summary of the meeting, keeping names, decisions and action items.
+        {text}
+    """
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token), without an API call"""
+    return len(text) // 4 + 1
+
+
+def is_hierarchical(text):
+    """Whether summarise.summarise summarises this transcript with map-reduce"""
+    return estimate_tokens(text) > HIERARCHICAL_MIN_TOKENS
+
+
+def version_parts(hierarchical):
+    """What the cached summaries of each way of summarising depend on, for cache.prompt_version"""
+    if hierarchical:
+        return (CHUNK_PROMPT, REDUCE_PROMPT, CHUNK_TOKENS)
+    return (SUMMARY_PROMPT,)
@@ -0,0 +1,172 @@
+import os
+import time
+import logging
+from threading import Thread, Condition
+
+from summarise.summarise import generate_text, stream_text, FinalSummary, pack_units, estimate_tokens
+
+logger = logging.getLogger('summarise')
+
+# New transcript (in estimated tokens) folded into the running summary at a time
+SEGMENT_TOKENS = int(os.getenv('SUMMARY_ROLLING_SEGMENT_TOKENS', '1500'))
+# Length the running summary is asked to stay under
+SUMMARY_WORDS = int(os.getenv('SUMMARY_ROLLING_WORDS', '400'))
+# Longest wait before retrying a fold that failed
+MAX_RETRY_DELAY = 60
+
+FOLD_PROMPT = """
+        This is the summary of a meeting so far, followed by what was said next.
+        Update the summary so it also covers the new part, keeping names, decisions and action items.
+        Keep it under {words} words.
+        Summary so far:
+        {summary}
+        Next part of the transcript:
+        {text}
+    """
+
+FINAL_PROMPT = """
+        This is the summary of a meeting up to its last few minutes, followed by the transcript of those minutes.
+        Write the final summary of the whole meeting, keeping names, decisions and action items.
+        Summary so far:
+        {summary}
+        Last part of the transcript:
+        {text}
+    """
+
+_NO_SUMMARY = "(nothing yet)"
+
+
+class RollingSummarizer:
+    """
+    Summarises a meeting while it is going on.
+
+    add() takes transcript segments as they are recognised, from any
+    thread. Once SEGMENT_TOKENS of new transcript are waiting, a background
+    thread folds them into the running summary (one call to the model with
+    the summary so far and the new part), so every call has about the same
+    size however long the meeting is. finish() folds whatever is left and
+    writes the final summary from that state, which takes one call of the
+    same size after the meeting ends.
+
+    generate(prompt) -> text and stream(prompt) -> iterable of text replace
+    the Gemini calls, as for summarize_transcript.
+    """
+
+    def __init__(self, segment_tokens=SEGMENT_TOKENS, summary_words=SUMMARY_WORDS, generate=None, stream=None):
+        self.segment_tokens = segment_tokens
+        self.summary_words = summary_words
+        self.generate = generate or generate_text
+        self.stream = stream if stream is not None or generate is not None else stream_text
+        self.summary = ""
+        self.folds = 0
+        self.failures = 0
+        self.segments = 0
+        self._pending = []
+        self._pending_tokens = 0
+        self._retry_at = 0.0
+        self._closed = False
+        self._condition = Condition()
+        self._thread = None
+
+    def start(self):
+        self._thread = Thread(target=self._run, name="rolling-summary", daemon=True)
+        self._thread.start()
+        return self
+
+    def add(self, text, start=None):
+        """Queue a transcript segment; start is its time in seconds from the start of the meeting"""
+        text = text.strip()
+        if not text:
+            return
+        if start is not None:
+            text = f"[{int(start) // 60:02d}:{int(start) % 60:02d}] {text}"
+        # A single segment over the budget is split between words
+        units = [text] if estimate_tokens(text) <= self.segment_tokens else pack_units(text.split(), self.segment_tokens)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Rolling summary already finished")
+            self._pending.extend(units)
+            self._pending_tokens += sum(estimate_tokens(unit) for unit in units)
+            self.segments += 1
+            self._condition.notify_all()
+
+    def results_sink(self, results):
+        """add() the final results of a stt.streaming.StreamingTranscriber until it is closed"""
+        for result in results:
+            if result.is_final:
+                self.add(result.text, result.start)
+
+    def _take(self):
+        """Remove up to segment_tokens of pending transcript (at least one unit); caller holds the lock"""
+        batch = []
+        size = 0
+        while self._pending:
+            tokens = estimate_tokens(self._pending[0])
+            if batch and size + tokens > self.segment_tokens:
+                break
+            batch.append(self._pending.pop(0))
+            size += tokens
+        self._pending_tokens -= size
+        return batch
+
+    def _fold(self, batch):
+        """Fold a batch into the summary; on failure it goes back to the front of the queue"""
+        prompt = FOLD_PROMPT.format(words=self.summary_words, summary=self.summary or _NO_SUMMARY,
+                                    text=" ".join(batch))
+        started = time.perf_counter()
+        try:
+            summary = self.generate(prompt)
+        except Exception as e:
+            with self._condition:
+                self._pending[:0] = batch
+                self._pending_tokens += sum(estimate_tokens(unit) for unit in batch)
+                self.failures += 1
+                self._retry_at = time.monotonic() + min(MAX_RETRY_DELAY, 2 ** self.failures)
+            logger.warning(f"Could not update the rolling summary, retrying later: {str(e)}")
+            return False
+        self.summary = summary
+        self.folds += 1
+        self.failures = 0
+        logger.info(f"Rolling summary updated in {time.perf_counter() - started:.2f} s "
+                    f"(fold {self.folds}, {estimate_tokens(prompt)} prompt tokens)")
+        return True
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and (self._pending_tokens < self.segment_tokens
+                                            or time.monotonic() < self._retry_at):
+                    self._condition.wait(max(0.0, self._retry_at - time.monotonic()) or None)
+                if self._closed:
+                    # finish() takes care of the rest
+                    return
+                batch = self._take()
+            self._fold(batch)
+
+    def finish(self, on_chunk=None):
+        """
+        Write the final summary from the running summary and the transcript
+        not folded in yet; on_chunk(text) receives it as it is generated.
+        Returns None if no transcript was ever added.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            # Let a fold in progress complete
+            self._thread.join()
+        if not self.segments:
+            return None
+
+        started = time.perf_counter()
+        # Catch up if the folds fell behind, so the last call stays the usual size
+        while self._pending_tokens > self.segment_tokens:
+            if not self._fold(self._take()):
+                raise RuntimeError("Rolling summary could not be updated")
+        rest = " ".join(self._take())
+
+        final = FinalSummary(self.generate, on_chunk, self.stream)
+        summary = final(FINAL_PROMPT.format(summary=self.summary or _NO_SUMMARY, text=rest))
+        logger.info(f"Final summary from rolling state in {time.perf_counter() - started:.2f} s "
+                    f"({self.segments} segments, {self.folds} folds)")
+        return summary
@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import logging
+from threading import Lock
+from urllib.parse import quote
+
+logger = logging.getLogger('summarise')
+
+# "disk", "mongo" or "none". The joiner (or scheduler) writes and the Django
+# app reads, so on separate hosts this has to be "mongo".
+STREAM_BACKEND = os.getenv('SUMMARY_STREAM_BACKEND', 'disk')
+STREAM_DIR = os.getenv('SUMMARY_STREAM_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'summary_streams'))
+
+# Stream states
+STREAMING = "streaming"
+DONE = "done"
+
+
+def stream_key(event_id):
+    """Key of an event's stream; event_id is {"email", "event_index"} as in stt.operations"""
+    return f"{event_id['email']}/{event_id['event_index']}"
+
+
+class SummaryStreamStore:
+    """
+    Summaries of events as they are generated: the chunks written so far,
+    then the whole summary once it is done. Readers poll read() with the
+    number of chunks they have already seen.
+    """
+
+    def start(self, event_id):
+        """Begin (or restart) the stream of an event, dropping earlier chunks"""
+        raise NotImplementedError
+
+    def append(self, event_id, text):
+        raise NotImplementedError
+
+    def reset(self, event_id):
+        """Discard the chunks so far; readers get None in their place and start over"""
+        raise NotImplementedError
+
+    def finish(self, event_id, summary):
+        """Mark the stream done; summary is the complete text (or why there is none)"""
+        raise NotImplementedError
+
+    def read(self, event_id, offset=0):
+        """
+        (chunks after the first `offset`, state, summary), with state None if
+        the event has no stream yet and summary None until it is done. A
+        None chunk is a reset: the text before it is to be discarded.
+        """
+        raise NotImplementedError
+
+
+class DiskSummaryStreamStore(SummaryStreamStore):
+    """One JSON-lines file per event: a line per chunk (or reset), then one with the summary"""
+
+    def __init__(self, directory=STREAM_DIR):
+        self.directory = directory
+        self._lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, event_id):
+        return os.path.join(self.directory, quote(stream_key(event_id), safe="@.") + ".jsonl")
+
+    def _write(self, event_id, entry, mode="a"):
+        with self._lock, open(self._path(event_id), mode, encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def start(self, event_id):
+        self._write(event_id, {"state": STREAMING, "started": time.time()}, mode="w")
+
+    def append(self, event_id, text):
+        self._write(event_id, {"chunk": text})
+
+    def reset(self, event_id):
+        self._write(event_id, {"reset": True})
+
+    def finish(self, event_id, summary):
+        self._write(event_id, {"state": DONE, "summary": summary})
+
+    def read(self, event_id, offset=0):
+        try:
+            with open(self._path(event_id), encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return [], None, None
+        chunks = []
+        state = summary = None
+        for line in lines:
+            if not line.endswith("\n"):
+                # Still being written
+                break
+            entry = json.loads(line)
+            if "chunk" in entry:
+                chunks.append(entry["chunk"])
+            elif "reset" in entry:
+                chunks.append(None)
+            else:
+                state = entry["state"]
+                summary = entry.get("summary")
+        return chunks[offset:], state, summary
+
+
+class MongoSummaryStreamStore(SummaryStreamStore):
+    """Streams in a MongoDB collection, one document per event"""
+
+    def __init__(self, uri=None, collection="summary_streams"):
+        from pymongo import MongoClient
+
+        self.client = MongoClient(uri or os.getenv('DB_URI'))
+        self.collection = self.client.user[collection]
+
+    def start(self, event_id):
+        self.collection.replace_one(
+            {"_id": stream_key(event_id)},
+            {"chunks": [], "state": STREAMING, "summary": None, "started": time.time()},
+            upsert=True,
+        )
+
+    def append(self, event_id, text):
+        self.collection.update_one({"_id": stream_key(event_id)}, {"$push": {"chunks": text}})
+
+    def reset(self, event_id):
+        self.collection.update_one({"_id": stream_key(event_id)}, {"$push": {"chunks": None}})
+
+    def finish(self, event_id, summary):
+        self.collection.update_one({"_id": stream_key(event_id)},
+                                   {"$set": {"state": DONE, "summary": summary}})
+
+    def read(self, event_id, offset=0):
+        # Only send the chunks the reader has not seen yet
+        document = self.collection.find_one({"_id": stream_key(event_id)},
+                                            {"chunks": {"$slice": [offset, 1 << 30]}, "state": 1, "summary": 1})
+        if document is None:
+            return [], None, None
+        return document["chunks"], document["state"], document["summary"]
+
+
+def open_summary_stream_store(backend=None):
+    """The store selected by SUMMARY_STREAM_BACKEND, or None if streaming is off or unavailable"""
+    backend = backend or STREAM_BACKEND
+    try:
+        if backend == "disk":
+            return DiskSummaryStreamStore()
+        if backend == "mongo":
+            return MongoSummaryStreamStore()
+    except Exception as e:
+        logger.warning(f"Summary stream store not available: {str(e)}")
+        return None
+    if backend != "none":
+        logger.warning(f"Unknown summary stream store: {backend}")
+    return None
+
+
+class SummaryStream:
+    """
+    Writes one event's summary to a store as it is generated. Use append
+    as the on_chunk callback of summarize_transcript, then finish with the
+    result. Store errors are logged, never raised, so they cannot stop the
+    summary itself.
+    """
+
+    def __init__(self, store, event_id):
+        self.store = store
+        self.event_id = event_id
+        self.chunks = 0
+        self._call("start")
+
+    def _call(self, method, *args):
+        try:
+            getattr(self.store, method)(self.event_id, *args)
+            return True
+        except Exception as e:
+            logger.warning(f"Could not {method} summary stream of {stream_key(self.event_id)}: {str(e)}")
+            return False
+
+    def append(self, text):
+        if text and self._call("append", text):
+            self.chunks += 1
+
+    def reset(self):
+        """Take back the chunks sent so far, e.g. before writing the summary another way"""
+        if self.chunks and self._call("reset"):
+            self.chunks = 0
+
+    def finish(self, summary):
+        self._call("finish", summary)
+
+
+def start_summary_stream(user_email, event_index, store=None):
+    """A SummaryStream for the event, or None if it has no event or there is no store"""
+    if not (user_email and event_index is not None and event_index >= 0):
+        return None
+    store = store or open_summary_stream_store()
+    if store is None:
+        return None
+    return SummaryStream(store, {"email": user_email, "event_index": event_index})
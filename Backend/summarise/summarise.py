@@ -1,22 +1,232 @@
 import os
-from idlelib.rpc import response_queue
+import re
+import time
+import logging
+import importlib.util
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
 
 from dotenv import load_dotenv
-import google.generativeai as genai
+
+# google.generativeai is imported (and the model created) on first use, as
+# importing it takes most of a second; fail now if it is not installed at all
+if importlib.util.find_spec("google.generativeai") is None:
+    raise ImportError("No module named 'google.generativeai'")
 
 #Load the API key
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
-#initilize the model
-model = genai.GenerativeModel("gemini-1.5-pro")
+logger = logging.getLogger('summarise')
 
-#function to summarize the transcript
-def summarize_transcript(transcript: str) -> str:
-    prompt=f""""
-        Summarise {transcript}
+CACHE_AVAILABLE = False
+try:
+    from summarise.cache import open_summary_cache, prompt_version, summary_key
+    CACHE_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"Summary cache not available: {str(e)}")
+
+from summarise.prompts import (HIERARCHICAL_MIN_TOKENS, CHUNK_TOKENS, SUMMARY_PROMPT, CHUNK_PROMPT,
+                                REDUCE_PROMPT, estimate_tokens, is_hierarchical, version_parts)
+
+MODEL_NAME = "gemini-1.5-pro"
+_model = None
+_model_lock = Lock()
+
+# Requests to the model in flight at once
+MAX_PARALLEL = int(os.getenv('SUMMARY_MAX_PARALLEL', '8'))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Cached summaries are only reused with the same prompts, so editing a
+# template (or how transcripts are chunked) invalidates them
+if CACHE_AVAILABLE:
+    PROMPT_VERSION = prompt_version(*version_parts(False))
+    HIERARCHICAL_PROMPT_VERSION = prompt_version(*version_parts(True))
+
+_NOT_OPENED = object()
+_summary_cache = _NOT_OPENED
+
+
+def get_model():
+    """The Gemini model, configured and created on first use"""
+    global _model
+    with _model_lock:
+        if _model is None:
+            import google.generativeai as genai
+
+            genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+            _model = genai.GenerativeModel(MODEL_NAME)
+        return _model
+
+
+def get_summary_cache():
+    """
+    Summaries of transcripts that were already summarised with the same
+    prompt and model, opened on first use (None if unavailable)
     """
+    global _summary_cache
+    with _model_lock:
+        if _summary_cache is _NOT_OPENED:
+            _summary_cache = open_summary_cache() if CACHE_AVAILABLE else None
+        return _summary_cache
 
-    response = model.generate_content(prompt)
+
+def generate_text(prompt):
+    """The model's answer to prompt"""
+    response = get_model().generate_content(prompt)
     return response.text.strip()
 
+
+def stream_text(prompt):
+    """Yield the answer in pieces as the model writes it"""
+    for chunk in get_model().generate_content(prompt, stream=True):
+        yield chunk.text
+
+
+#function to summarize the transcript
+def summarize_transcript(transcript, hierarchical=None, generate=None, on_chunk=None, stream=None) -> str:
+    """
+    Summarise a transcript (text, or a stt.transcript.Transcript).
+
+    Long transcripts (over HIERARCHICAL_MIN_TOKENS) go through map-reduce,
+    so latency depends on MAX_PARALLEL rather than on the meeting length;
+    hierarchical forces one way or the other. generate(prompt) -> text
+    replaces the Gemini call, e.g. with a stub.
+
+    on_chunk(text) is called with each piece of the summary as it is
+    generated, so it can be shown before the summary is complete (only the
+    final call streams; map-reduce chunk summaries do not). stream(prompt)
+    -> iterable of text replaces the streaming Gemini call; when generate
+    is given without stream, on_chunk gets the whole summary at once.
+
+    Summaries are cached by transcript, prompt version and model, so
+    summarising the same transcript again costs nothing (unless generate
+    or stream is given: the cache only holds what MODEL_NAME wrote).
+    """
+    text = str(transcript)
+    if hierarchical is None:
+        hierarchical = is_hierarchical(text)
+
+    key = None
+    summary_cache = get_summary_cache() if generate is None and stream is None else None
+    if summary_cache is not None:
+        version = HIERARCHICAL_PROMPT_VERSION if hierarchical else PROMPT_VERSION
+        key = summary_key(text, version, MODEL_NAME)
+        started = time.perf_counter()
+        summary = summary_cache.get(key)
+        if summary is not None:
+            logger.info(f"Summary cache hit in {(time.perf_counter() - started) * 1000:.1f} ms ({summary_cache.stats()})")
+            if on_chunk is not None:
+                on_chunk(summary)
+            return summary
+
+    if on_chunk is not None and stream is None and generate is None:
+        stream = stream_text
+    final = FinalSummary(generate or generate_text, on_chunk, stream)
+    summary = _summarize(transcript, text, hierarchical, generate or generate_text, final)
+    if key is not None:
+        summary_cache.put(key, summary, {"model": MODEL_NAME, "prompt_version": version,
+                                         "hierarchical": hierarchical})
+    return summary
+
+
+class FinalSummary:
+    """Generates the answer that is the summary, passing it to on_chunk as it arrives"""
+
+    def __init__(self, generate, on_chunk, stream):
+        self.generate = generate
+        self.on_chunk = on_chunk
+        self.stream = stream
+
+    def __call__(self, prompt):
+        if self.on_chunk is None:
+            return self.generate(prompt)
+        if self.stream is None:
+            summary = self.generate(prompt)
+            self.on_chunk(summary)
+            return summary
+
+        started = time.perf_counter()
+        first = None
+        pieces = []
+        for piece in self.stream(prompt):
+            if not piece:
+                continue
+            if first is None:
+                first = time.perf_counter() - started
+            pieces.append(piece)
+            self.on_chunk(piece)
+        logger.info(f"Summary streamed in {len(pieces)} chunks: first after "
+                    f"{first or 0.0:.2f} s, complete after {time.perf_counter() - started:.2f} s")
+        return "".join(pieces).strip()
+
+    def passed(self, summary):
+        """A summary that did not need a final call (e.g. a single chunk's)"""
+        if self.on_chunk is not None:
+            self.on_chunk(summary)
+        return summary
+
+
+def _summarize(transcript, text, hierarchical, generate, final):
+    if not hierarchical:
+        return final(SUMMARY_PROMPT.format(text=text))
+
+    chunks = split_transcript(transcript, CHUNK_TOKENS)
+    with ThreadPoolExecutor(max_workers=max(1, MAX_PARALLEL)) as pool:
+        summaries = list(pool.map(
+            lambda item: generate(CHUNK_PROMPT.format(index=item[0] + 1, total=len(chunks), text=item[1])),
+            enumerate(chunks),
+        ))
+        return _reduce(summaries, generate, pool, final)
+
+
+def _reduce(summaries, generate, pool, final):
+    """Combine summaries in token-budgeted groups, level by level, until one is left"""
+    if len(summaries) <= 1:
+        return final.passed(summaries[0] if summaries else "")
+    while True:
+        groups = pack_units(summaries, CHUNK_TOKENS, separator="\n\n")
+        if len(groups) == len(summaries):
+            # Every summary fills a group by itself: pair them up so this ends
+            groups = ["\n\n".join(summaries[i:i + 2]) for i in range(0, len(summaries), 2)]
+        if len(groups) == 1:
+            return final(REDUCE_PROMPT.format(text=groups[0]))
+        summaries = list(pool.map(lambda group: generate(REDUCE_PROMPT.format(text=group)), groups))
+
+
+def split_transcript(transcript, max_tokens=CHUNK_TOKENS):
+    """
+    Split a transcript into chunks of at most max_tokens, on sentence
+    boundaries for text or utterance (time) boundaries for a Transcript.
+    A single unit over the budget is split between words.
+    """
+    if hasattr(transcript, "segment_texts"):
+        units = [f"[{int(start) // 60:02d}:{int(start) % 60:02d}] {text}"
+                 for start, _, text in transcript.segment_texts()]
+    else:
+        units = [sentence for sentence in _SENTENCE_END.split(transcript.strip()) if sentence]
+
+    pieces = []
+    for unit in units:
+        if estimate_tokens(unit) <= max_tokens:
+            pieces.append(unit)
+        else:
+            pieces.extend(pack_units(unit.split(), max_tokens))
+    return pack_units(pieces, max_tokens)
+
+
+def pack_units(units, max_tokens, separator=" "):
+    """Greedily join consecutive units into strings of at most max_tokens"""
+    chunks = []
+    current = []
+    size = 0
+    for unit in units:
+        tokens = estimate_tokens(unit)
+        if current and size + tokens > max_tokens:
+            chunks.append(separator.join(current))
+            current, size = [], 0
+        current.append(unit)
+        size += tokens
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
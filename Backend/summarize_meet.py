@@ -19,7 +19,7 @@ try:
 except ImportError as e:
     STT_AVAILABLE = False
     logger.warning(f"STT functionality not available: {str(e)}")
-    def transcribe_audio(file_path):
+    def transcribe_audio(file_path, gcs_uri=None):
         logger.error("Cannot transcribe audio: STT module not available")
         return "Transcription failed: STT module not available"
 
@@ -31,13 +31,18 @@ try:
 except ImportError as e:
     SUMMARIZE_AVAILABLE = False
     logger.warning(f"Summarization functionality not available: {str(e)}")
-    def summarize_transcript(transcript):
+    def summarize_transcript(transcript, on_chunk=None):
         logger.warning("Summarization requested but functionality not available")
         return transcript  # Just return the transcript if summarization is not available
 
-def summarize_meet(audio_file_path):
+def summarize_meet(audio_file_path, gcs_uri=None, transcript=None, on_chunk=None):
     """
-    Transcribe the audio file and generate a summary
+    Transcribe the audio file and generate a summary. gcs_uri is the copy
+    of the audio uploaded during the recording, if there is one; transcript
+    is the result of recognition during the meeting (streaming, or of each
+    segment of a segmented recording), which skips transcribing the file
+    altogether. on_chunk(text) receives the summary in pieces as it is
+    generated.
     """
     try:
         logger.info(f"Starting transcription of {audio_file_path}")
@@ -52,18 +57,24 @@ def summarize_meet(audio_file_path):
             logger.error("Cannot generate summary: STT functionality not available")
             return "Summary unavailable: Speech-to-text functionality not available"
         
-        # Transcribe the audio
-        transcript = transcribe_audio(audio_file_path)
+        # Transcribe the audio (unless it was transcribed while recording)
+        if transcript is not None:
+            logger.info("Using transcript made during the recording")
+        else:
+            transcript = transcribe_audio(audio_file_path, gcs_uri=gcs_uri)
         
         # Check if transcription was successful
         if transcript.startswith("Transcription failed"):
             logger.error(f"Transcription failed: {transcript}")
             return f"Summary unavailable: {transcript}"
+        if not transcript.strip():
+            logger.info("No speech in the recording, nothing to summarize")
+            return "Summary unavailable: No speech in the recording"
         
         # Try to summarize the transcript if the functionality is available
         if SUMMARIZE_AVAILABLE:
             try:
-                summary = summarize_transcript(transcript)
+                summary = summarize_transcript(transcript, on_chunk=on_chunk)
                 logger.info("Summarization successful")
                 return summary
             except Exception as e:
@@ -3,13 +3,51 @@
 import os
 import sys
 import wave
-from google.cloud import speech, storage
-from pydub import AudioSegment
+import logging
+import importlib.util
+from threading import Lock
+
+logger = logging.getLogger('stt')
+
+#"google" or "stub" (the Backend's scripted stub, configured by STT_STUB_*; no credentials needed)
+STT_BACKEND = os.getenv("STT_BACKEND", "google")
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Backend')
+
+_stub_backend = None
+_stub_lock = Lock()
+
+#setting the credentials environment variable, the first time google cloud is used
+def setup_credentials():
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "./keys/dialogon-stt-key.json"   #path to the api key json file
+
+
+#offline stand-in for google cloud speech: Backend/stt/backends.py, loaded by path
+def get_stub_backend():
+    """The Backend's StubSTTBackend, created from the STT_STUB_* variables on first use"""
+    global _stub_backend
+    with _stub_lock:
+        if _stub_backend is None:
+            spec = importlib.util.spec_from_file_location("stt_backends", os.path.join(BACKEND_DIR, 'stt', 'backends.py'))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            _stub_backend = module.StubSTTBackend.from_env()
+        return _stub_backend
+
+
+def stub_transcribe(file_path):
+    transcript = get_stub_backend().transcribe(file_path)
+    if transcript.startswith("Transcription failed"):
+        logger.warning(f"{transcript} for {file_path}")
+        return
+    return transcript
 
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "./keys/dialogon-stt-key.json"   #path to the api key json file #setting the environment variable
 
 #uploading a file to google cloud storage
 def upload_to_gcs(bucket_name, source_file, destination_blob_name):
+    from google.cloud import storage
+
+    setup_credentials()
     client = storage.Client()
     bucket = client.bucket(bucket_name)
     blob = bucket.blob(destination_blob_name)
@@ -18,6 +56,8 @@ def upload_to_gcs(bucket_name, source_file, destination_blob_name):
 
 
 def analyze_and_prepare_audio(file_path):
+    from pydub import AudioSegment
+
     with wave.open(file_path, "rb") as wf:
         channels = wf.getnchannels()
         sample_rate = wf.getframerate()
@@ -39,6 +79,13 @@ def transcribe_audio(file_path: str):
     if not os.path.exists(file_path):
         print(f"file not found: {file_path}")
         return
+
+    if STT_BACKEND == "stub":
+        return stub_transcribe(file_path)
+
+    from google.cloud import speech
+
+    setup_credentials()
     
     file_path, sample_rate = analyze_and_prepare_audio(file_path)
     
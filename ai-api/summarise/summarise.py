@@ -1,22 +1,90 @@
 import os
-from idlelib.rpc import response_queue
+import sys
+import logging
+import importlib.util
 
 from dotenv import load_dotenv
-import google.generativeai as genai
 
 #Load the API key
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
-#initilize the model
-model = genai.GenerativeModel("gemini-1.5-pro")
+logger = logging.getLogger('summarise')
+
+MODEL_NAME = "gemini-1.5-pro"
+_model = None
+
+def get_model():
+    """The Gemini model, configured and created on first use"""
+    global _model
+    if _model is None:
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        _model = genai.GenerativeModel(MODEL_NAME)
+    return _model
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'Backend')
+
+_cache_module = None
+_prompts_module = None
+_summary_cache = None
+_cache_loaded = False
+
+def _load_backend_module(name, *path):
+    """Load a Backend file as module name (registered, so later Backend files can import it by that name)"""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(BACKEND_DIR, *path))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def get_prompts():
+    """Backend/summarise/prompts.py: the prompt, and which way the Backend summarises a transcript"""
+    global _prompts_module
+    if _prompts_module is None:
+        _prompts_module = _load_backend_module("summary_prompts", 'summarise', 'prompts.py')
+    return _prompts_module
+
+def get_summary_cache():
+    """The Backend's summary cache (Backend/summarise/cache.py), opened on first use; None if unavailable"""
+    global _cache_module, _summary_cache, _cache_loaded
+    if not _cache_loaded:
+        _cache_loaded = True
+        try:
+            # The stores it is built on, under the name it imports them by
+            _load_backend_module("keyed_cache", 'keyed_cache.py')
+            _cache_module = _load_backend_module("summary_cache", 'summarise', 'cache.py')
+            _summary_cache = _cache_module.open_summary_cache()
+        except Exception as e:
+            logger.warning(f"Summary cache not available: {str(e)}")
+    return _summary_cache
 
 #function to summarize the transcript
 def summarize_transcript(transcript: str) -> str:
-    prompt=f""""
-        Summarise {transcript}
     """
+    Summarise a transcript with a single prompt. Summaries are shared with
+    the Backend through its summary cache: a long transcript, which the
+    Backend summarises with map-reduce (summarise/prompts.py decides), is
+    looked up under that version first, and what is written here is always
+    keyed by the single-prompt version it was made with.
+    """
+    prompts = get_prompts()
+    key = None
+    summary_cache = get_summary_cache()
+    if summary_cache is not None:
+        version = _cache_module.prompt_version(prompts.SUMMARY_PROMPT)
+        versions = [version]
+        if prompts.is_hierarchical(transcript):
+            versions.insert(0, _cache_module.prompt_version(*prompts.version_parts(True)))
+        for cached_version in versions:
+            summary = summary_cache.get(_cache_module.summary_key(transcript, cached_version, MODEL_NAME))
+            if summary is not None:
+                logger.info(f"Summary cache hit ({summary_cache.stats()})")
+                return summary
+        key = _cache_module.summary_key(transcript, version, MODEL_NAME)
 
-    response = model.generate_content(prompt)
-    return response.text.strip()
+    response = get_model().generate_content(prompts.SUMMARY_PROMPT.format(text=transcript))
+    summary = response.text.strip()
+    if key is not None:
+        summary_cache.put(key, summary, {"model": MODEL_NAME, "prompt_version": version, "hierarchical": False})
+    return summary
 